@@ -6,7 +6,9 @@ Routes are organized in separate blueprint modules in the routes package.
 """
 import os
 from flask import Flask
-from database import init_database, add_sample_data
+from database import prepare_database, close_db_connection
+import instrumentation
+import sharding
 from routes import register_blueprints
 
 
@@ -20,14 +22,22 @@ def create_app():
     app = Flask(__name__)
     app.secret_key = "super secret key"
     
-    # Initialize the database
-    init_database()
+    # Per-request timings and /metrics; installed first so startup queries
+    # already run on instrumented connections
+    instrumentation.init_app(app)
     
-    # Add sample data for testing and demonstration
-    add_sample_data()
+    # Create/upgrade the schema, and add sample data for testing and
+    # demonstration to a new database. A no-op version check when the
+    # database is already set up (e.g. by the gunicorn master, see
+    # gunicorn.conf.py)
+    prepare_database(sample_data=not os.getenv("SKIP_SAMPLE_DATA"))
     
-    if not os.getenv("SKIP_SAMPLE_DATA"):     
-        add_sample_data()
+    # Likewise for each branch shard when LIBRARY_SHARDS is set
+    if sharding.router is not None:
+        sharding.router.prepare()
+    
+    # Hand each request's pooled connection back when its app context ends
+    app.teardown_appcontext(close_db_connection)
     
     # Register all route blueprints
     register_blueprints(app)
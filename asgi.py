@@ -0,0 +1,120 @@
+"""
+ASGI entry point for the Library Management System.
+
+The read-only JSON API (see routes/async_api_routes.py) is served natively on
+the event loop, with database work offloaded to the bounded executor in
+async_database, so one worker can keep many API requests in flight while
+SQLite queries run. Every other request is passed to the Flask app through
+asgiref's WSGI adapter.
+
+Run with:
+    uvicorn --factory asgi:create_asgi_app
+    gunicorn -k uvicorn.workers.UvicornWorker 'asgi:create_asgi_app()'
+"""
+import time
+from typing import Dict, Optional
+from urllib.parse import parse_qsl
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import Flask
+
+import async_database
+import database
+import instrumentation
+import response_cache
+from app import create_app
+from routes.async_api_routes import ROUTES
+
+
+def _query_args(query_string: bytes) -> Dict[str, str]:
+    # First value wins for repeated keys, as with Flask's request.args.get
+    args: Dict[str, str] = {}
+    for key, value in parse_qsl(query_string.decode('latin-1'), keep_blank_values=True):
+        args.setdefault(key, value)
+    return args
+
+
+def create_asgi_app(flask_app: Optional[Flask] = None):
+    """
+    Build the ASGI application.
+
+    Args:
+        flask_app: the Flask app to fall back to (default: create_app())
+
+    Returns:
+        callable: ASGI application
+    """
+    flask_app = flask_app or create_app()
+    fallback = WsgiToAsgi(flask_app)
+
+    async def send_json(send, status: int, payload: Optional[Dict], head: bool,
+                        extra_headers: Optional[Dict[str, str]] = None) -> None:
+        if payload is None:
+            body, headers = b'', []
+        else:
+            body = (flask_app.json.dumps(payload, separators=(',', ':')) + '\n').encode('utf-8')
+            headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+        if status == 503:
+            headers.append((b'retry-after', b'1'))
+        for name, value in (extra_headers or {}).items():
+            headers.append((name.lower().encode('latin-1'), value.encode('latin-1')))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b'' if head else body})
+
+    async def cached(scope, handler, args: Dict[str, str], params: Dict[str, str]):
+        # Same as response_cache.catalog_response, for a native handler
+        validators = await async_database.run(response_cache.current_validators)
+        headers = response_cache.validator_headers(validators)
+        if_none_match = dict(scope['headers']).get(b'if-none-match', b'').decode('latin-1')
+        if response_cache.not_modified(if_none_match, validators):
+            return (304, None), headers
+        values = [args.get(name) for name in handler.cache_key_args]
+        key = ('asgi', *response_cache.cache_key(scope['path'], values))
+        result = response_cache.response_cache.get(key, validators.version)
+        if result is None:
+            result = await handler(args, **params)
+            if result is None or result[0] != 200:
+                return result, None
+            response_cache.response_cache.put(key, validators.version, result)
+        return result, headers
+
+    async def lifespan(receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                async_database.executor.shutdown()
+                database.close_all_connections()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def app(scope, receive, send) -> None:
+        if scope['type'] == 'lifespan':
+            await lifespan(receive, send)
+            return
+        method = scope.get('method')
+        if scope['type'] == 'http' and method in ('GET', 'HEAD'):
+            for pattern, endpoint, handler in ROUTES:
+                match = pattern.fullmatch(scope['path'])
+                if not match:
+                    continue
+                start = time.perf_counter()
+                args = _query_args(scope['query_string'])
+                headers = None
+                try:
+                    if hasattr(handler, 'cache_key_args'):
+                        result, headers = await cached(scope, handler, args, match.groupdict())
+                    else:
+                        result = await handler(args, **match.groupdict())
+                except async_database.ExecutorBusy:
+                    result = 503, {'error': 'Server busy, try again shortly'}
+                if result is None:
+                    break
+                status, payload = result
+                await send_json(send, status, payload, method == 'HEAD', headers)
+                instrumentation.observe_request(endpoint, method, status, time.perf_counter() - start)
+                return
+        await fallback(scope, receive, send)
+
+    return app
@@ -0,0 +1,75 @@
+"""
+Async database access for Library Management System
+Runs the blocking sqlite3 helpers on a bounded thread pool for asyncio code
+
+Each call is executed on one of a fixed set of worker threads, which use the
+same pooled, thread-local connections as the Flask app and hand them back
+after every call (as the app does at request teardown). At most
+ASYNC_DB_MAX_PENDING calls may be running or queued at once; beyond that
+run() raises ExecutorBusy immediately instead of letting the queue grow, so
+an overloaded server sheds load rather than piling up latency.
+
+Configuration (environment variables):
+    ASYNC_DB_THREADS=N        worker threads (default: DB_POOL_SIZE)
+    ASYNC_DB_MAX_PENDING=N    calls running or queued before run() refuses (default 1024)
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+import database
+
+ASYNC_DB_THREADS = int(os.getenv('ASYNC_DB_THREADS', str(database.POOL_SIZE)))
+ASYNC_DB_MAX_PENDING = int(os.getenv('ASYNC_DB_MAX_PENDING', '1024'))
+
+
+class ExecutorBusy(Exception):
+    """Raised when the executor already has max_pending calls in flight."""
+
+
+class AsyncExecutor:
+    """Bounded thread-pool executor for database work awaited from an event loop."""
+
+    def __init__(self, threads: Optional[int] = None, max_pending: Optional[int] = None):
+        self.threads = threads or ASYNC_DB_THREADS
+        self.max_pending = max_pending or ASYNC_DB_MAX_PENDING
+        self.pending = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run `fn(*args, **kwargs)` on a worker thread and await its result."""
+        # Only touched from the event loop thread, so a plain counter is enough
+        if self.pending >= self.max_pending:
+            raise ExecutorBusy(f'{self.pending} database calls already in flight')
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix='async-db')
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(_call, fn, args, kwargs))
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        """Stop the worker threads (they are restarted on the next run())."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+def _call(fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        database.close_db_connection()
+
+
+executor = AsyncExecutor()
+
+
+async def run(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking database/service call on the shared executor."""
+    return await executor.run(fn, *args, **kwargs)
@@ -0,0 +1,41 @@
+"""
+Benchmark: sync gunicorn workers vs the async API under high concurrency.
+
+Seeds a database, then loads /api/search and /api/late_fee through gunicorn
+with sync workers and with uvicorn workers running asgi.py, at the same
+worker count and client concurrency.
+
+Usage:
+    python -m benchmarks.bench_async_api [concurrency] [workers]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+from benchmarks.harness import build_scenarios, gunicorn_driver, run_scenario, seed
+
+BOOKS, PATRONS, HISTORY, REQUESTS = 10000, 1000, 50000, 2000
+ENDPOINTS = ('/api/search', '/api/late_fee')
+
+
+def main(concurrency: int = 256, workers: int = 2):
+    tmp = tempfile.mkdtemp(prefix='library-bench-')
+    try:
+        db_path = os.path.join(tmp, 'bench.db')
+        seed(db_path, BOOKS, PATRONS, HISTORY)
+        scenarios = build_scenarios(BOOKS, PATRONS, REQUESTS)
+        print(f'{workers} workers, {concurrency} concurrent clients, {REQUESTS} requests per endpoint')
+        for label, asgi in (('sync', False), ('async', True)):
+            with gunicorn_driver(db_path, concurrency, workers, asgi=asgi) as send:
+                for name in ENDPOINTS:
+                    r = run_scenario(send, scenarios[name], concurrency)
+                    print(f"{label:>5} {name:>13}: p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  "
+                          f"p99 {r['p99_ms']:8.2f} ms  {r['req_per_s']:9.1f} req/s")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,44 @@
+"""
+Benchmark: five single borrow/return calls vs one kiosk batch.
+
+Each iteration checks out a stack of 5 books for a patron and returns them,
+first with borrow_book_by_patron/return_book_by_patron per book (5
+transactions each way), then with the batch service functions (1 each way).
+
+Usage:
+    python -m benchmarks.bench_batch_checkout [iterations]
+"""
+
+import sys
+
+from benchmarks.common import seed_books, temp_database, time_per_call
+from services.library_service import (
+    borrow_book_by_patron, return_book_by_patron, borrow_books_by_patron, return_books_by_patron
+)
+
+STACK = [1, 2, 3, 4, 5]
+
+
+def _single():
+    for book_id in STACK:
+        borrow_book_by_patron('100001', book_id)
+    for book_id in STACK:
+        return_book_by_patron('100001', book_id)
+
+
+def _batch():
+    borrow_books_by_patron('100001', STACK)
+    return_books_by_patron('100001', STACK)
+
+
+def main(iterations: int = 500):
+    with temp_database():
+        seed_books(1000)
+        single = time_per_call(_single, iterations)
+        batch = time_per_call(_batch, iterations)
+        print(f'checkout + return of {len(STACK)} books: single calls {single:7.3f} ms  '
+              f'batch {batch:7.3f} ms  ({single / batch:.1f}x)')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,57 @@
+"""
+Benchmark: active-loan queries over a large circulation history.
+
+Seeds `rows` historical (returned) borrow records plus a handful of active
+loans, then times the hot borrow_records helpers with the migration indexes
+in place and again after dropping them (the pre-migration schema).
+
+Usage:
+    python -m benchmarks.bench_borrow_history [rows]     # e.g. 10000000
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+import database
+from benchmarks.common import seed_books, seed_history, temp_database, time_per_call
+
+PATRONS = 50000
+BOOKS = 5000
+
+
+def seed_active_loans() -> None:
+    now = datetime.now()
+    for book_id in range(1, 4):
+        database.insert_borrow_record('123456', book_id, now, now + timedelta(days=14))
+
+
+def _run_queries(label: str) -> None:
+    now = datetime.now()
+    count = time_per_call(lambda: database.get_patron_borrow_count('123456'), 50)
+    books = time_per_call(lambda: database.get_patron_borrowed_books('123456'), 50)
+    ret = time_per_call(lambda: database.update_borrow_record_return_date('999999', 1, now), 50)
+    print(f'{label:>12}: borrow_count {count:9.3f} ms  borrowed_books {books:9.3f} ms  '
+          f'return_update {ret:9.3f} ms')
+
+
+def main(rows: int = 1000000):
+    with temp_database():
+        started = time.perf_counter()
+        seed_books(BOOKS)
+        seed_history(rows, PATRONS, BOOKS)
+        seed_active_loans()
+        conn = database.get_db_connection()
+        conn.execute('ANALYZE')
+        print(f'seeded {rows} borrow records in {time.perf_counter() - started:.1f}s')
+
+        _run_queries('indexed')
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                    "AND name LIKE 'idx_borrow_records_%'").fetchall():
+            conn.execute(f'DROP INDEX {name}')
+        conn.commit()
+        _run_queries('no indexes')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,75 @@
+"""
+Benchmark: memory and latency of the in-memory catalog snapshot.
+
+Seeds a synthetic catalog, then reports the Python heap needed to hold it as
+get_all_books() dicts vs the column-oriented snapshot (scaled to bytes per
+book and MB per million titles), plus catalog page and search latency from
+SQLite vs from the snapshot, and the cost of an incremental refresh.
+
+Usage:
+    python -m benchmarks.bench_catalog_snapshot [books]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+
+import database
+from benchmarks.common import seed_books, temp_database, time_per_call
+from catalog_snapshot import CatalogSnapshot
+
+QUERIES = (('gold', ('title',)), ('silent river', ('title',)), ('tanaka', ('author',)))
+
+
+def _heap_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    held = build()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return held, size, elapsed
+
+
+def _report(label, size, elapsed, books):
+    print(f'{label:>10}: {size / 2**20:8.1f} MB  {size / books:6.0f} B/book  '
+          f'{size / books * 1e6 / 2**20:7.0f} MB per 1M titles  (built in {elapsed:.2f}s)')
+
+
+def main(books: int = 1000000):
+    with temp_database():
+        seed_books(books)
+        print(f'catalog size: {books} books')
+
+        rows, size, elapsed = _heap_bytes(database.get_all_books)
+        _report('dicts', size, elapsed, books)
+        del rows
+
+        def load():
+            snapshot = CatalogSnapshot()
+            snapshot.refresh()
+            return snapshot
+        snapshot, size, elapsed = _heap_bytes(load)
+        _report('snapshot', size, elapsed, books)
+
+        middle = snapshot.page(None, books // 2)[-1]
+        after = (middle['title'], middle['id'])
+        print(f'catalog page: sqlite {time_per_call(lambda: database.get_books_page(after, 51), 200):7.3f} ms  '
+              f'snapshot {time_per_call(lambda: snapshot.page(after, 51), 200):7.3f} ms')
+        snapshot.search('warm-up', ('title', 'author'))
+        for term, fields in QUERIES:
+            sql = time_per_call(lambda: database.search_books(term, fields), 5)
+            mem = time_per_call(lambda: snapshot.search(term, fields), 5)
+            print(f'search {term!r:>14}: sqlite {sql:9.2f} ms  snapshot {mem:9.2f} ms')
+
+        def borrow_and_refresh():
+            database.update_book_availability(1, -1)
+            database.update_book_availability(1, 1)
+            snapshot.refresh()
+        print(f'refresh after a borrow/return: {time_per_call(borrow_and_refresh, 200):7.3f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
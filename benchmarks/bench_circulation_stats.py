@@ -0,0 +1,91 @@
+"""
+Benchmark: circulation statistics from the materialised rollups.
+
+Seeds a catalog and a borrowing history (with the rollup triggers dropped,
+as for a bulk load), then reports the time to backfill the rollups, the
+extra cost of the rollup triggers per borrow and return, and the latency of
+the statistics against the same questions answered by aggregating
+borrow_records directly.
+
+Usage:
+    python -m benchmarks.bench_circulation_stats [books] [loans]
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+import database
+from benchmarks.common import seed_books, seed_history, temp_database, time_per_call
+from services import analytics_service
+
+# seed_history spreads loans over the minutes from 2015-01-01
+MONTH = '2015-02'
+MONTH_START = datetime(2015, 2, 1)
+MONTH_END = datetime(2015, 3, 1)
+
+
+def _drop_triggers(conn) -> None:
+    for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'circulation_%'"):
+        conn.execute(f'DROP TRIGGER {name}')
+    conn.commit()
+
+
+def _loans_per_ms(count: int) -> float:
+    # Borrow and return `count` books through the database helpers, in ms per loan
+    now = datetime(2026, 1, 1)
+    start = time.perf_counter()
+    for i in range(count):
+        patron = f'{900000 + i}'
+        database.insert_borrow_record(patron, i % 1000 + 1, now, now + timedelta(days=14))
+        database.update_borrow_record_return_date(patron, i % 1000 + 1, now + timedelta(days=20))
+    return (time.perf_counter() - start) * 1000 / count
+
+
+def main(books: int = 100000, loans: int = 2000000):
+    with temp_database():
+        conn = database.get_db_connection()
+        seed_books(books)
+        _drop_triggers(conn)
+        seed_history(loans, 20000, books)
+        print(f'catalog size: {books} books, {loans} loans')
+
+        plain = _loans_per_ms(2000)
+        start = time.perf_counter()
+        with database.transaction() as conn:
+            database._add_circulation_rollups(conn)
+        print(f'rollup backfill: {time.perf_counter() - start:.2f} s')
+        counted = _loans_per_ms(2000)
+        print(f'borrow + return: {plain:.3f} ms without rollups, {counted:.3f} ms with')
+
+        first, last = database.to_epoch(MONTH_START), database.to_epoch(MONTH_END)
+        scans = {
+            'top books': lambda: conn.execute('''
+                SELECT b.id, b.title, COUNT(*) AS borrows FROM borrow_records r JOIN books b ON b.id = r.book_id
+                WHERE r.borrow_date >= ? AND r.borrow_date < ?
+                GROUP BY b.id ORDER BY borrows DESC LIMIT 10''', (first, last)).fetchall(),
+            'top authors': lambda: conn.execute('''
+                SELECT b.author, COUNT(*) AS borrows FROM borrow_records r JOIN books b ON b.id = r.book_id
+                WHERE r.borrow_date >= ? AND r.borrow_date < ?
+                GROUP BY b.author ORDER BY borrows DESC LIMIT 10''', (first, last)).fetchall(),
+            'title utilisation': lambda: conn.execute('''
+                SELECT COUNT(*), SUM(return_date / 86400 - borrow_date / 86400) FROM borrow_records
+                WHERE book_id = 42''').fetchall(),
+            'daily, 1 month': lambda: conn.execute('''
+                SELECT borrow_date / 86400 AS day, COUNT(*) FROM borrow_records
+                WHERE borrow_date >= ? AND borrow_date < ? GROUP BY day''', (first, last)).fetchall(),
+        }
+        rollups = {
+            'top books': lambda: analytics_service.get_most_borrowed(MONTH),
+            'top authors': lambda: analytics_service.get_most_borrowed(MONTH, by='author'),
+            'title utilisation': lambda: analytics_service.get_title_utilisation(42, MONTH),
+            'daily, 1 month': lambda: analytics_service.get_daily_circulation('2015-02-01', '2015-02-28'),
+        }
+        for name, query in rollups.items():
+            rolled = time_per_call(query, 200)
+            scanned = time_per_call(scans[name], 3)
+            print(f'{name:>18}: rollups {rolled:7.3f} ms   scanning borrow_records {scanned:9.2f} ms')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,89 @@
+"""
+Benchmark: connect-per-call vs pooled connections.
+
+Replays the database work of one borrow (book lookup, borrow count, insert,
+availability update) and reports operations/sec for the old connect-per-call
+pattern and the pooled thread-local connection, followed by requests/sec for
+/catalog through the Flask test client with pooling disabled and enabled.
+
+Usage:
+    python -m benchmarks.bench_connections [iterations]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import database
+
+
+def _connect_per_call(db_path: str, sql: str, params: tuple, write: bool = False):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(sql, params).fetchall()
+    if write:
+        conn.commit()
+    conn.close()
+    return rows
+
+
+def _borrow_unpooled(db_path: str):
+    now = datetime.now()
+    _connect_per_call(db_path, 'SELECT * FROM books WHERE id = ?', (1,))
+    _connect_per_call(db_path, 'SELECT COUNT(*) FROM borrow_records WHERE patron_id = ? AND return_date IS NULL', ('123456',))
+    _connect_per_call(db_path, 'INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) VALUES (?, ?, ?, ?)',
+                      ('123456', 1, database.to_epoch(now), database.to_epoch(now + timedelta(days=14))), write=True)
+    _connect_per_call(db_path, 'UPDATE books SET available_copies = available_copies + ? WHERE id = ?', (0, 1), write=True)
+
+
+def _borrow_pooled():
+    now = datetime.now()
+    database.get_book_by_id(1)
+    database.get_patron_borrow_count('123456')
+    database.insert_borrow_record('123456', 1, now, now + timedelta(days=14))
+    database.update_book_availability(1, 0)
+    database.close_db_connection()
+
+
+def _rate(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def _catalog_rps(pool_size: int, iterations: int) -> float:
+    from app import create_app
+
+    database.close_all_connections()
+    database.POOL_SIZE = pool_size
+    client = create_app().test_client()
+    rps = _rate(lambda: client.get('/catalog'), iterations)
+    database.close_all_connections()
+    return rps
+
+
+def main(iterations: int = 2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        database.init_database()
+        database.add_sample_data()
+        database.close_all_connections()
+
+        before = _rate(lambda: _borrow_unpooled(database.DATABASE), iterations)
+        after = _rate(_borrow_pooled, iterations)
+        print(f'borrow db work   connect-per-call: {before:10.1f} ops/s')
+        print(f'borrow db work   pooled:           {after:10.1f} ops/s  ({after / before:.1f}x)')
+
+        pool_size = database.POOL_SIZE
+        before = _catalog_rps(0, iterations // 4)
+        after = _catalog_rps(pool_size, iterations // 4)
+        print(f'GET /catalog     unpooled:         {before:10.1f} req/s')
+        print(f'GET /catalog     pooled:           {after:10.1f} req/s  ({after / before:.1f}x)')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,119 @@
+"""
+Benchmark: ISO-string dates vs INTEGER epoch seconds.
+
+Builds a database with the old schema (loan dates as ISO strings) and times
+the SQL-side late fee aggregate, a due-date range count, the vacuumed file
+size and reading every open loan's dates back as datetimes. It then runs the
+date backfill (schema migration 7) and repeats the same work against the
+epoch-second columns.
+
+Usage:
+    python -m benchmarks.bench_epoch_dates [loans]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import database
+from services import date_backfill
+from services.fee_engine import fee_schedule
+
+AS_OF = date.today()
+
+# Late fee aggregate as it was written against ISO-string due dates
+_ISO_DAYS_OVERDUE = 'CAST(julianday(:as_of_day) - julianday(substr(due_date, 1, 10)) AS INTEGER)'
+_ISO_FEE_TOTALS = f'''
+    SELECT COUNT(*), COUNT(DISTINCT patron_id), ROUND(SUM({database._late_fee_sql('days')}), 2) FROM (
+        SELECT patron_id, {_ISO_DAYS_OVERDUE} AS days FROM borrow_records
+        WHERE return_date IS NULL AND due_date < :as_of_day
+    ) WHERE days > 0
+'''
+
+
+def seed_legacy(path: str, loans: int, seed: int = 327) -> None:
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, '
+                 'author TEXT NOT NULL, isbn TEXT UNIQUE NOT NULL, total_copies INTEGER NOT NULL, '
+                 'available_copies INTEGER NOT NULL)')
+    conn.execute('CREATE TABLE borrow_records (id INTEGER PRIMARY KEY AUTOINCREMENT, patron_id TEXT NOT NULL, '
+                 'book_id INTEGER NOT NULL, borrow_date TEXT NOT NULL, due_date TEXT NOT NULL, return_date TEXT)')
+    now = datetime.now()
+    rows = []
+    for i in range(loans):
+        borrowed = now - timedelta(days=rng.randint(0, 400), seconds=rng.randint(0, 86399))
+        returned = (borrowed + timedelta(days=rng.randint(1, 30))).isoformat() if rng.random() < 0.8 else None
+        rows.append((f'{100000 + i % 50000}', 1 + i % 1000, borrowed.isoformat(),
+                     (borrowed + timedelta(days=14)).isoformat(), returned))
+    conn.executemany('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date) '
+                     'VALUES (?, ?, ?, ?, ?)', rows)
+    conn.execute('CREATE INDEX idx_legacy_due ON borrow_records (due_date) WHERE return_date IS NULL')
+    conn.commit()
+    conn.close()
+
+
+# Open loans that fell due in the last week
+_DUE_BETWEEN = 'SELECT COUNT(*) FROM borrow_records WHERE return_date IS NULL AND due_date >= ? AND due_date < ?'
+
+
+def _vacuumed_size(conn, path: str) -> float:
+    conn.execute('VACUUM')
+    return os.path.getsize(path) / 1e6
+
+
+def _ms(fn, iterations=5):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        result = fn()
+    return (time.perf_counter() - start) * 1000 / iterations, result
+
+
+def main(loans: int = 1000000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'dates.db')
+        seed_legacy(path, loans)
+        print(f'{loans} loans')
+
+        conn = sqlite3.connect(path)
+        week_ago = AS_OF - timedelta(days=7)
+        iso_params = dict(fee_schedule(), as_of_day=AS_OF.isoformat())
+        iso_fees, iso_total = _ms(lambda: conn.execute(_ISO_FEE_TOTALS, iso_params).fetchone())
+        iso_due, _ = _ms(lambda: conn.execute(_DUE_BETWEEN, (week_ago.isoformat(), AS_OF.isoformat())).fetchone())
+        iso_size = _vacuumed_size(conn, path)
+        iso_read, _ = _ms(lambda: [(datetime.fromisoformat(b), datetime.fromisoformat(d)) for b, d in conn.execute(
+            'SELECT borrow_date, due_date FROM borrow_records WHERE return_date IS NULL')])
+        conn.close()
+
+        original = database.DATABASE
+        database.DATABASE = path
+        try:
+            result = date_backfill.backfill()
+            epoch = database.get_db_connection()
+            epoch_fees, epoch_total = _ms(lambda: database.get_open_loan_fee_totals(
+                database.epoch_day(AS_OF), fee_schedule()))
+            epoch_due, _ = _ms(lambda: epoch.execute(_DUE_BETWEEN, (
+                database.epoch_day(week_ago) * database.SECONDS_PER_DAY,
+                database.epoch_day(AS_OF) * database.SECONDS_PER_DAY)).fetchone())
+            epoch_size = _vacuumed_size(epoch, path)
+            epoch_read, _ = _ms(lambda: [(database.from_epoch(b), database.from_epoch(d)) for b, d in epoch.execute(
+                'SELECT borrow_date, due_date FROM borrow_records WHERE return_date IS NULL')])
+        finally:
+            database.close_all_connections()
+            database.DATABASE = original
+
+        assert (iso_total[0], iso_total[1], iso_total[2] or 0.0) == (
+            epoch_total['overdue_loans'], epoch_total['patrons'], epoch_total['total_fees'])
+        print(f'backfill: {result["seconds"]:.2f}s')
+        print(f'{"fee aggregate":>16}: iso {iso_fees:9.2f} ms  epoch {epoch_fees:9.2f} ms')
+        print(f'{"due last week":>16}: iso {iso_due:9.2f} ms  epoch {epoch_due:9.2f} ms')
+        print(f'{"database size":>16}: iso {iso_size:9.1f} MB  epoch {epoch_size:9.1f} MB')
+        print(f'{"read open loans":>16}: iso {iso_read:9.2f} ms  epoch {epoch_read:9.2f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,73 @@
+"""
+Benchmark: streaming columnar export against a SELECT * dump to CSV.
+
+Seeds a catalog and a borrowing history, then reports the time, peak Python
+memory (tracemalloc) and output size of a full export of borrow_records at
+two chunk sizes and of fetching every row into a CSV file, and the time of
+an incremental export after new loans.
+
+Usage:
+    python -m benchmarks.bench_export [books] [loans]
+"""
+
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+import database
+from benchmarks.common import seed_books, seed_history, temp_database
+from services import export_service
+
+
+def _size_mb(path: str) -> float:
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1e6
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names) / 1e6
+
+
+def _measure(label: str, fn, path: str) -> None:
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    print(f'{label:>26}: {elapsed:6.2f} s   peak {peak:7.1f} MB   output {_size_mb(path):7.1f} MB')
+
+
+def _csv_dump(path: str) -> None:
+    rows = database.get_db_connection().execute('SELECT * FROM borrow_records').fetchall()
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(rows[0].keys())
+        writer.writerows(rows)
+
+
+def main(books: int = 100000, loans: int = 2000000):
+    with temp_database(), tempfile.TemporaryDirectory() as out:
+        seed_books(books)
+        seed_history(loans, 20000, books)
+        print(f'catalog size: {books} books, {loans} loans')
+
+        for chunk_size in (10000, export_service.EXPORT_CHUNK_SIZE):
+            target = os.path.join(out, f'chunks-{chunk_size}')
+            _measure(f'export, {chunk_size} rows/file',
+                     lambda: export_service.export_table(target, 'borrow_records', chunk_size), target)
+        dump = os.path.join(out, 'borrow_records.csv')
+        _measure('SELECT * to CSV', lambda: _csv_dump(dump), dump)
+
+        now = datetime(2026, 1, 1)
+        for i in range(10000):
+            database.insert_borrow_record(f'{900000 + i}', i % books + 1, now, now + timedelta(days=14))
+        target = os.path.join(out, f'chunks-{export_service.EXPORT_CHUNK_SIZE}')
+        start = time.perf_counter()
+        result = export_service.export_table(target, 'borrow_records')
+        print(f'incremental export of {result["rows"]} new loans: {time.perf_counter() - start:.3f} s')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
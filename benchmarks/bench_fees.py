@@ -0,0 +1,69 @@
+"""
+Benchmark: late fees for every open loan.
+
+Seeds `loans` open loans and compares the old per-record calculation
+(a datetime per row and the tier formula) with the batch engine
+over the same rows and with the SQL-side aggregate used for nightly runs.
+Each timing includes reading the loans from the database.
+
+Usage:
+    python -m benchmarks.bench_fees [loans]     # e.g. 5000000
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import database
+from benchmarks.common import temp_database
+from services import fee_engine
+
+
+def seed_open_loans(loans: int, seed: int = 327) -> None:
+    rng = random.Random(seed)
+    conn = database.get_db_connection()
+    now = datetime.now()
+    batch = []
+    for i in range(loans):
+        borrowed = now - timedelta(days=rng.randint(0, 60), minutes=rng.randint(0, 1440))
+        batch.append((f'{100000 + i % 900000}', 1 + i % 1000, database.to_epoch(borrowed),
+                      database.to_epoch(borrowed + timedelta(days=14))))
+        if len(batch) == 50000:
+            conn.executemany('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) '
+                             'VALUES (?, ?, ?, ?)', batch)
+            batch.clear()
+    if batch:
+        conn.executemany('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) '
+                         'VALUES (?, ?, ?, ?)', batch)
+    conn.commit()
+
+
+def _per_record(rows):
+    total = 0.0
+    for (due,) in rows:
+        days_over = (datetime.now().date() - database.from_epoch(due).date()).days
+        if days_over > 0:
+            total += min(min(days_over, 7) * 0.50 + max(0, days_over - 7) * 1.00, 15.00)
+    return total
+
+
+def _timed(label, fn):
+    start = time.perf_counter()
+    total = fn()
+    print(f'{label:>22}: {time.perf_counter() - start:8.2f}s  total ${total:,.2f}')
+
+
+def main(loans: int = 500000):
+    with temp_database():
+        seed_open_loans(loans)
+        conn = database.get_db_connection()
+        print(f'{loans} open loans')
+        fetch = lambda: conn.execute('SELECT due_date FROM borrow_records WHERE return_date IS NULL').fetchall()
+        _timed('per-record (old)', lambda: _per_record(fetch()))
+        _timed('batch engine', lambda: sum(f for _, f in fee_engine.calculate_late_fees([r[0] for r in fetch()])))
+        _timed('SQL-side aggregate', lambda: fee_engine.summarize_open_loan_fees()['total_fees'])
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500000)
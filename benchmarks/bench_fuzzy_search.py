@@ -0,0 +1,99 @@
+"""
+Benchmark: typo-tolerant search with the fuzzy trigram index.
+
+Seeds a catalog whose titles and authors are drawn, Zipf-style, from a large
+vocabulary of generated words (the shared seed_books catalog uses only a few
+dozen words, so every word in it matches a tenth of the books). Reports the
+time and memory to build the index, then the latency of misspelled queries
+against exact substring search for the same queries.
+
+Usage:
+    python -m benchmarks.bench_fuzzy_search [books]
+"""
+
+import gc
+import itertools
+import random
+import sys
+import time
+import tracemalloc
+
+import database
+import fuzzy_index
+from benchmarks.common import temp_database, time_per_call
+from services.library_service import search_books_in_catalog
+
+CONSONANTS = 'bcdfghklmnprstvwz'
+VOWELS = 'aeiouy'
+
+
+def _vocabulary(size: int, rng: random.Random):
+    # Pronounceable words of 3-10 letters, in random frequency order
+    words = set()
+    while len(words) < size:
+        length = rng.randint(3, 10)
+        words.add(''.join(rng.choice(VOWELS if i % 2 else CONSONANTS) for i in range(length)))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words
+
+
+def seed_vocabulary_books(count: int, vocabulary_size: int = 60000, seed: int = 327):
+    """Insert `count` books with titles and authors drawn Zipf-style from generated words."""
+    rng = random.Random(seed)
+    vocabulary = _vocabulary(vocabulary_size, rng)
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+    conn = database.get_db_connection()
+    batch = []
+    for i in range(count):
+        title = ' '.join(rng.choices(vocabulary, cum_weights=weights, k=rng.randint(2, 5))).title()
+        author = ' '.join(rng.choices(vocabulary, cum_weights=weights, k=2)).title()
+        batch.append((title, author, f'{9790000000000 + i}', 1, 1))
+        if len(batch) == 10000:
+            conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) '
+                             'VALUES (?, ?, ?, ?, ?)', batch)
+            batch.clear()
+    if batch:
+        conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) '
+                         'VALUES (?, ?, ?, ?, ?)', batch)
+    conn.commit()
+    return vocabulary
+
+
+def _misspell(word: str, rng: random.Random) -> str:
+    i = rng.randrange(1, len(word))
+    return word[:i] + word[i + 1:] if rng.random() < 0.5 else word[:i] + 'e' + word[i:]
+
+
+def main(books: int = 1000000):
+    rng = random.Random(7)
+    with temp_database():
+        vocabulary = seed_vocabulary_books(books)
+        print(f'catalog size: {books} books, {len(vocabulary)} distinct words')
+
+        gc.collect()
+        tracemalloc.start()
+        fuzzy_index.FuzzyIndex().refresh()
+        size = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        fuzzy_index.index = fuzzy_index.FuzzyIndex()
+        start = time.perf_counter()
+        fuzzy_index.index.refresh()
+        elapsed = time.perf_counter() - start
+        print(f'index build: {elapsed:.2f} s  peak {size / 2**20:.1f} MB  {fuzzy_index.index.stats()}')
+
+        # Rare, mid-frequency and common words, then two-word queries
+        queries = [_misspell(vocabulary[rank], rng) for rank in (40000, 5000, 500, 20)]
+        queries += [f'{_misspell(vocabulary[a], rng)} {vocabulary[b]}' for a, b in ((3000, 700), (100, 30))]
+        for q in queries:
+            hits = search_books_in_catalog(q, 'fuzzy')
+            fuzzy = time_per_call(lambda: search_books_in_catalog(q, 'fuzzy'), 20)
+            exact = time_per_call(lambda: search_books_in_catalog(q, None), 5)
+            exact_hits = len(search_books_in_catalog(q, None))
+            top = f"{hits[0]['similarity']:.2f} {hits[0]['title'][:30]!r}" if hits else '-'
+            print(f'{q!r:>28}: fuzzy {fuzzy:7.2f} ms ({len(hits):2d} hits, best {top})  '
+                  f'exact {exact:7.2f} ms ({exact_hits} hits)')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
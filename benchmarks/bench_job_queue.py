@@ -0,0 +1,68 @@
+"""
+Benchmark: paying late fees inside the request vs queueing a payment job.
+
+Seeds patrons with overdue loans and a fake gateway with fixed latency
+(tests/fake_gateway.py), then times pay_all_late_fees called inline (what a
+synchronous request waits for) against submit_fee_payment (one INSERT), and
+how long the worker pool takes to drain the queued payments.
+
+Usage:
+    python -m benchmarks.bench_job_queue [patrons] [latency_ms] [workers]
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+
+import database
+from benchmarks.common import seed_books, temp_database
+from services import job_queue, payment_client
+from services.library_service import pay_all_late_fees
+from services.payment_client import HttpTransport, PaymentClient
+from tests.fake_gateway import FakeGateway
+
+
+def seed_overdue_patrons(patrons: int, loans_each: int = 3) -> None:
+    now = datetime.now()
+    with database.transaction() as conn:
+        for p in range(patrons):
+            for i in range(loans_each):
+                due = now - timedelta(days=2 + i)
+                conn.execute('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) '
+                             'VALUES (?, ?, ?, ?)', (f'{900000 + p}', 1 + i,
+                                                     database.to_epoch(due - timedelta(days=14)),
+                                                     database.to_epoch(due)))
+
+
+def main(patrons: int = 200, latency_ms: float = 50.0, workers: int = 4):
+    with temp_database(), FakeGateway(latency=latency_ms / 1000) as gateway:
+        seed_books(100)
+        seed_overdue_patrons(patrons)
+        client = PaymentClient(HttpTransport(gateway.url))
+        payment_client._client = client
+
+        start = time.perf_counter()
+        for p in range(patrons // 4):
+            pay_all_late_fees(f'{900000 + p}', client)
+        inline = (time.perf_counter() - start) * 1000 / (patrons // 4)
+
+        job_queue.workers = job_queue.WorkerPool(workers)
+        start = time.perf_counter()
+        for p in range(patrons):
+            job_queue.submit_fee_payment(f'{900000 + p}')
+        queued = (time.perf_counter() - start) * 1000 / patrons
+        job_queue.workers.drain(600)
+        drained = time.perf_counter() - start
+        job_queue.workers.stop()
+        client.close()
+
+        print(f'gateway latency {latency_ms:g} ms, {workers} workers')
+        print(f'request latency: inline payment {inline:8.2f} ms  queued job {queued:6.3f} ms')
+        print(f'{patrons} queued payments processed in {drained:.2f}s '
+              f'({patrons / drained:.0f}/s, max {gateway.max_in_flight} gateway calls at once)')
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 200, float(args[1]) if len(args) > 1 else 50.0,
+         int(args[2]) if len(args) > 2 else 4)
@@ -0,0 +1,43 @@
+"""
+Benchmark: listing overdue loans from history vs the overdue sweep.
+
+Seeds a long borrowing history plus a set of open loans, then compares
+finding every overdue loan by scanning borrow_records and checking due dates
+in Python (as get_patron_borrowed_books did per patron) with the nightly
+sweep, and with reading totals and a page from the materialised
+overdue_loans table.
+
+Usage:
+    python -m benchmarks.bench_overdue [history] [open_loans]
+"""
+
+import sys
+from datetime import datetime
+
+import database
+from benchmarks.bench_fees import seed_open_loans
+from benchmarks.common import seed_history, temp_database, time_per_call
+from services.library_service import get_overdue_report
+from services.overdue_service import run_overdue_sweep
+
+
+def _scan():
+    now = datetime.now()
+    rows = database.get_db_connection().execute('SELECT * FROM borrow_records').fetchall()
+    return [dict(r) for r in rows if r['return_date'] is None and now > database.from_epoch(r['due_date'])]
+
+
+def main(history: int = 1000000, open_loans: int = 20000):
+    with temp_database():
+        seed_history(history, 10000, 1000)
+        seed_open_loans(open_loans)
+        database.get_db_connection().execute('ANALYZE')
+        print(f'{history} returned loans, {open_loans} open loans')
+        overdue = len(_scan())
+        print(f'{"history scan":>16}: {time_per_call(_scan, 3):9.2f} ms  ({overdue} overdue)')
+        print(f'{"sweep":>16}: {time_per_call(run_overdue_sweep, 3):9.2f} ms')
+        print(f'{"report page":>16}: {time_per_call(lambda: get_overdue_report(None, 100), 50):9.2f} ms')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
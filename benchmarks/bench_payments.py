@@ -0,0 +1,49 @@
+"""
+Benchmark: paying five late fees one call at a time vs one batched settlement.
+
+Runs against the local fake gateway (tests/fake_gateway.py) with a fixed
+per-request latency. Compares five process_payment calls that each open a
+new connection (as a per-call HTTP client would), five calls over the
+client's keep-alive connection, and one settle_fees call.
+
+Usage:
+    python -m benchmarks.bench_payments [iterations] [latency_ms]
+"""
+
+import sys
+
+from benchmarks.common import time_per_call
+from services.payment_client import HttpTransport, PaymentClient
+from tests.fake_gateway import FakeGateway
+
+FEES = [{'loan_id': i, 'book_id': i, 'amount': 2.5} for i in range(1, 6)]
+
+
+def main(iterations: int = 50, latency_ms: float = 20.0):
+    with FakeGateway(latency=latency_ms / 1000) as gateway:
+        def fresh_connections():
+            for fee in FEES:
+                client = PaymentClient(HttpTransport(gateway.url))
+                client.process_payment('123456', fee['amount'])
+                client.close()
+
+        client = PaymentClient(HttpTransport(gateway.url))
+
+        def keep_alive():
+            for fee in FEES:
+                client.process_payment('123456', fee['amount'])
+
+        def batched():
+            client.settle_fees('123456', FEES)
+
+        print(f'{len(FEES)} late fees, gateway latency {latency_ms:g} ms')
+        for name, fn in (('per fee, new connection', fresh_connections),
+                         ('per fee, keep-alive', keep_alive),
+                         ('one settlement', batched)):
+            print(f'{name:>24}: {time_per_call(fn, iterations):8.2f} ms')
+        client.close()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 20.0)
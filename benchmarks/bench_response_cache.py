@@ -0,0 +1,43 @@
+"""
+Benchmark: HTTP response caching of the catalog and search pages.
+
+Seeds a synthetic catalog and times repeated requests to /catalog, /search
+and /api/search through the Flask test client: rendered every time (cache
+off), served from the response cache, and answered with 304 Not Modified to
+a client that sends back the ETag. Bytes sent per request are shown too.
+
+Usage:
+    python -m benchmarks.bench_response_cache [books]
+"""
+
+import os
+import sys
+
+import response_cache
+from app import create_app
+from benchmarks.common import seed_books, temp_database, time_per_call
+
+URLS = ('/catalog', '/search?q=silent+river&type=title', '/api/search?q=tanaka&type=author')
+
+
+def main(books: int = 100000):
+    os.environ.setdefault('SKIP_SAMPLE_DATA', '1')
+    with temp_database():
+        seed_books(books)
+        client = create_app().test_client()
+        print(f'catalog size: {books} books')
+        for url in URLS:
+            etag = client.get(url).headers['ETag']
+            response_cache.response_cache = response_cache.ResponseCache(0)
+            rendered = time_per_call(lambda: client.get(url).get_data(), 50)
+            response_cache.response_cache = response_cache.ResponseCache()
+            size = len(client.get(url).get_data())
+            cached = time_per_call(lambda: client.get(url).get_data(), 200)
+            not_modified = time_per_call(
+                lambda: client.get(url, headers={'If-None-Match': etag}).get_data(), 200)
+            print(f'{url:36} rendered {rendered:7.3f} ms  cached {cached:6.3f} ms  '
+                  f'304 {not_modified:6.3f} ms  ({size} bytes -> 0)')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
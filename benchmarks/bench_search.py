@@ -0,0 +1,46 @@
+"""
+Benchmark: full-table scan search vs the FTS5 trigram index.
+
+Seeds a synthetic catalog and times search_books_in_catalog against the old
+implementation (load every book with get_all_books, then filter in Python).
+
+Usage:
+    python -m benchmarks.bench_search [books]
+"""
+
+import sys
+
+import database
+from benchmarks.common import seed_books, temp_database, time_per_call
+from services.library_service import search_books_in_catalog
+
+QUERIES = (('gold', 'title'), ('silent river', 'title'), ('tanaka', 'author'),
+           ('storm', None), ('9790000000042', 'isbn'))
+
+
+def _scan_search(q: str, t: str):
+    books = database.get_all_books()
+    q = q.lower()
+    if t == 'isbn':
+        return [b for b in books if b['isbn'] == q]
+    if t == 'author':
+        return [b for b in books if q in b['author'].lower()]
+    if t == 'title':
+        return [b for b in books if q in b['title'].lower()]
+    return [b for b in books if q in b['title'].lower() or q in b['author'].lower()]
+
+
+def main(books: int = 100000):
+    with temp_database():
+        seed_books(books)
+        print(f'catalog size: {books} books')
+        for q, t in QUERIES:
+            hits = len(search_books_in_catalog(q, t))
+            scan = time_per_call(lambda: _scan_search(q, t or ''), 3)
+            indexed = time_per_call(lambda: search_books_in_catalog(q, t), 20)
+            print(f'{q!r:>18} ({t or "any"}): {hits:7d} hits  scan {scan:9.2f} ms  '
+                  f'indexed {indexed:8.3f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
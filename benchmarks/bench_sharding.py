@@ -0,0 +1,78 @@
+"""
+Benchmark: one database file against per-branch shards.
+
+Several worker processes (as gunicorn workers would be) borrow and return
+books through the shard router, each at its own branch, first with every
+branch in one shared file and then with one file per branch, and the total
+loans per second are compared (the shards only pay off with a CPU core per
+worker, as the workers otherwise queue for the CPU rather than the file's
+write lock). Then a catalog search over the whole catalog in one file is
+compared with the scatter/gather search over the same books split between
+the shards.
+
+Usage:
+    python -m benchmarks.bench_sharding [shards] [books] [loans per worker]
+"""
+
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+import database
+import sharding
+from benchmarks.common import seed_books, time_per_call
+
+
+def _worker(shards, branch, loans, start):
+    router = sharding.ShardRouter(shards)
+    start.wait()
+    for i in range(loans):
+        patron = f'{100000 + i % 1000}'
+        book_id = i % 1000 + 1
+        router.borrow(branch, patron, book_id)
+        router.return_book(branch, patron, book_id)
+    router.close()
+
+
+def _loans_per_second(shards, branches, loans):
+    start = multiprocessing.Barrier(len(branches) + 1)
+    workers = [multiprocessing.Process(target=_worker, args=(shards, branch, loans, start)) for branch in branches]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    began = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return len(branches) * loans / (time.perf_counter() - began)
+
+
+def main(shard_count: int = 4, books: int = 200000, loans: int = 2000):
+    branches = [f'branch{i}' for i in range(shard_count)]
+    with tempfile.TemporaryDirectory() as tmp:
+        single = os.path.join(tmp, 'single.db')
+        split = {branch: os.path.join(tmp, f'{branch}.db') for branch in branches}
+        for path, count in [(single, books)] + [(path, books // shard_count) for path in split.values()]:
+            with database.use_database(path):
+                database.init_database()
+                seed_books(count)
+        print(f'{shard_count} branches, {books} books, {loans} borrows + returns per worker')
+
+        shared = _loans_per_second({branch: single for branch in branches}, branches, loans)
+        sharded = _loans_per_second(split, branches, loans)
+        print(f'borrow + return, {shard_count} workers: one file {shared:7.0f}/s   '
+              f'one file per branch {sharded:7.0f}/s  ({sharded / shared:.1f}x)')
+
+        router = sharding.ShardRouter(split)
+        for term in ('garden', 'silent river'):
+            with database.use_database(single):
+                one = time_per_call(lambda: database.search_books(term, ('title',)), 20)
+            gathered = time_per_call(lambda: router.search(term), 20)
+            print(f'search {term!r:>15}: one file {one:7.2f} ms   scatter/gather {gathered:7.2f} ms')
+        router.close()
+        database.close_all_connections()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:4]))
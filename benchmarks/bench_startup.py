@@ -0,0 +1,103 @@
+"""
+Benchmark: application and worker startup time.
+
+1. Time for a new worker to serve its first request: a new Python process
+   that imports and builds the app, against a fork of a process that has
+   already built it (what gunicorn's preload_app gives every worker).
+2. With gunicorn installed: time to the first response and total CPU spent
+   booting N workers, with and without preload_app (gunicorn.conf.py).
+
+Usage:
+    python -m benchmarks.bench_startup [workers]
+"""
+
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from urllib.request import urlopen
+
+import database
+from benchmarks.common import seed_books, temp_database
+from benchmarks.harness import PROJECT_ROOT, _free_port
+
+FIRST_REQUEST = '/api/books?limit=1'
+
+_SPAWN_WORKER = f'''
+from app import create_app
+create_app().test_client().get({FIRST_REQUEST!r}).get_data()
+'''
+
+
+def _spawned_worker_ms(db_path: str, runs: int = 5) -> float:
+    env = dict(os.environ, LIBRARY_DB=db_path, SKIP_SAMPLE_DATA='1')
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', _SPAWN_WORKER], cwd=PROJECT_ROOT, env=env, check=True)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def _forked_worker_ms(runs: int = 20) -> float:
+    from app import create_app
+    app = create_app()
+    database.close_all_connections()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            app.test_client().get(FIRST_REQUEST).get_data()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def _gunicorn_boot(db_path: str, workers: int, preload: bool):
+    port = _free_port()
+    env = dict(os.environ, LIBRARY_DB=db_path, SKIP_SAMPLE_DATA='1', GUNICORN_PRELOAD='1' if preload else '0')
+    cpu_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+    start = time.perf_counter()
+    proc = subprocess.Popen(['gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}',
+                             '--log-level', 'warning', 'app:create_app()'], cwd=PROJECT_ROOT, env=env)
+    try:
+        while True:
+            try:
+                urlopen(f'http://127.0.0.1:{port}{FIRST_REQUEST}', timeout=1).read()
+                break
+            except OSError:
+                if proc.poll() is not None:
+                    raise SystemExit('gunicorn exited during startup')
+                time.sleep(0.005)
+        first_response = (time.perf_counter() - start) * 1000
+        time.sleep(2)  # let the remaining workers finish booting
+    finally:
+        proc.terminate()
+        proc.wait()
+    cpu_after = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = (cpu_after.ru_utime + cpu_after.ru_stime) - (cpu_before.ru_utime + cpu_before.ru_stime)
+    return first_response, cpu * 1000
+
+
+def main(workers: int = 8):
+    with temp_database() as db_path:
+        seed_books(1000)
+        database.close_all_connections()
+        spawned = _spawned_worker_ms(db_path)
+        forked = _forked_worker_ms() if hasattr(os, 'fork') else float('nan')
+        print(f'new worker to first response: new process {spawned:7.1f} ms  fork of preloaded app {forked:6.1f} ms')
+
+        if shutil.which('gunicorn'):
+            for preload in (False, True):
+                first, cpu = _gunicorn_boot(db_path, workers, preload)
+                print(f'gunicorn -w {workers} preload_app={str(preload):5}: first response {first:7.1f} ms  '
+                      f'boot CPU {cpu:7.1f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8)
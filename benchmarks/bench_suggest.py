@@ -0,0 +1,83 @@
+"""
+Benchmark: search-as-you-type suggestions from the autocomplete index.
+
+Seeds the generated-vocabulary catalog of the fuzzy search benchmark plus
+borrow records spread Zipf-style over the books, then reports the time to
+build the index and the latency of suggestions for each keystroke of a
+title word, an author + title query and an ISBN, next to the substring
+search the search box would otherwise run. Finally times the refresh that
+picks up a borrow made since the last request.
+
+Usage:
+    python -m benchmarks.bench_suggest [books] [borrows]
+"""
+
+import itertools
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import database
+import suggest_index
+from benchmarks.bench_fuzzy_search import seed_vocabulary_books
+from benchmarks.common import temp_database, time_per_call
+from services.library_service import get_suggestions, search_books_in_catalog
+
+
+def seed_borrows(books: int, count: int, seed: int = 22):
+    """Insert `count` returned loans, the book of each drawn Zipf-style."""
+    rng = random.Random(seed)
+    weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(books)))
+    order = list(range(1, books + 1))
+    rng.shuffle(order)
+    conn = database.get_db_connection()
+    day = database.to_epoch(datetime(2026, 1, 1))
+    for start in range(0, count, 10000):
+        book_ids = rng.choices(order, cum_weights=weights, k=min(10000, count - start))
+        conn.executemany('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date) '
+                         'VALUES (?, ?, ?, ?, ?)',
+                         [(f'{100000 + i % 5000}', book_id, day, day + 14 * 86400, day + 86400)
+                          for i, book_id in enumerate(book_ids)])
+    conn.commit()
+
+
+def main(books: int = 1000000, borrows: int = 500000):
+    with temp_database():
+        vocabulary = seed_vocabulary_books(books)
+        seed_borrows(books, borrows)
+        print(f'catalog size: {books} books, {len(vocabulary)} distinct words, {borrows} borrows')
+
+        suggest_index.index = suggest_index.SuggestIndex()
+        start = time.perf_counter()
+        suggest_index.index.refresh()
+        print(f'index build: {time.perf_counter() - start:.2f} s  {suggest_index.index.stats()}')
+
+        title = database.get_book_by_id(books // 2)
+        queries = [vocabulary[rank] for rank in (10, 2000, 30000)]
+        queries.append(f"{title['author'].split()[0]} {title['title'].split()[0]}".lower())
+        queries.append(f"{title['isbn'][:3]}-{title['isbn'][3:]}")
+        for query in queries:
+            for n in range(1, len(query) + 1):
+                typed = query[:n]
+                # First call may build the kept list of a wide prefix; the rest are steady state
+                start = time.perf_counter()
+                get_suggestions(typed)
+                first = (time.perf_counter() - start) * 1000
+                steady = time_per_call(lambda: get_suggestions(typed), 200)
+                top = get_suggestions(typed)
+                best = f"{top[0]['borrows']:3d} {top[0]['title'][:30]!r}" if top else '-'
+                print(f'{typed!r:>26}: {steady:6.3f} ms (first {first:6.3f} ms, {len(top):2d} hits, best {best})')
+            if ' ' not in query and '-' not in query:
+                exact = time_per_call(lambda: search_books_in_catalog(query, None), 3)
+                print(f'{"":>26}  substring search for {query!r}: {exact:.1f} ms')
+
+        # A borrow since the last request: the next one applies it first
+        database.borrow_book_transaction('999999', books // 3, datetime.now(), datetime.now() + timedelta(days=14), 5)
+        start = time.perf_counter()
+        applied = suggest_index.index.refresh()
+        print(f'refresh after a borrow: {(time.perf_counter() - start) * 1000:.3f} ms ({applied} change)')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,82 @@
+"""
+Shared helpers for the benchmark scripts.
+"""
+
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Iterator
+
+import database
+
+WORDS = ('great', 'silent', 'river', 'shadow', 'garden', 'empire', 'winter', 'night', 'glass',
+         'stone', 'golden', 'last', 'hidden', 'city', 'ocean', 'fire', 'crown', 'secret',
+         'journey', 'house', 'forest', 'storm', 'light', 'dark', 'song', 'memory', 'island')
+SURNAMES = ('Smith', 'Nguyen', 'Garcia', 'Okafor', 'Kowalski', 'Tanaka', 'Dubois', 'Rossi',
+            'Larsen', 'Haddad', 'Murphy', 'Silva', 'Cohen', 'Ivanova', 'Patel', 'Moreau')
+
+
+@contextmanager
+def temp_database() -> Iterator[str]:
+    """Point the database module at a fresh, initialised temporary file."""
+    original = database.DATABASE
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        database.init_database()
+        try:
+            yield database.DATABASE
+        finally:
+            database.close_all_connections()
+            database.DATABASE = original
+
+
+def seed_books(count: int, seed: int = 327) -> None:
+    """Insert `count` synthetic books in large batches."""
+    rng = random.Random(seed)
+    conn = database.get_db_connection()
+    batch = []
+    for i in range(count):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).title()
+        author = f'{rng.choice("ABCDEFGHJKLMNPRSTW")}. {rng.choice(SURNAMES)}'
+        copies = rng.randint(1, 5)
+        batch.append((f'{title} {i}', author, f'{9790000000000 + i}', copies, copies))
+        if len(batch) == 10000:
+            conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) '
+                             'VALUES (?, ?, ?, ?, ?)', batch)
+            batch.clear()
+    if batch:
+        conn.executemany('INSERT INTO books (title, author, isbn, total_copies, available_copies) '
+                         'VALUES (?, ?, ?, ?, ?)', batch)
+    conn.commit()
+
+
+def seed_history(rows: int, patrons: int, books: int, seed: int = 327) -> None:
+    """Insert `rows` returned borrow records spread over patrons 100000.. and books 1..books."""
+    rng = random.Random(seed)
+    conn = database.get_db_connection()
+    start = datetime(2015, 1, 1)
+    batch = []
+    for i in range(rows):
+        borrowed = start + timedelta(minutes=i % 5000000)
+        borrowed = database.to_epoch(borrowed)
+        batch.append((f'{100000 + rng.randrange(patrons)}', rng.randint(1, books), borrowed,
+                      borrowed + 14 * database.SECONDS_PER_DAY, borrowed + 10 * database.SECONDS_PER_DAY))
+        if len(batch) == 50000:
+            conn.executemany('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date) '
+                             'VALUES (?, ?, ?, ?, ?)', batch)
+            batch.clear()
+    if batch:
+        conn.executemany('INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date) '
+                         'VALUES (?, ?, ?, ?, ?)', batch)
+    conn.commit()
+
+
+def time_per_call(fn: Callable[[], object], iterations: int) -> float:
+    """Mean wall-clock milliseconds per call of `fn`."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) * 1000 / iterations
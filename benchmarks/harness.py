@@ -0,0 +1,272 @@
+"""
+Load-testing harness for the Flask app.
+
+Seeds a synthetic catalog, patrons and circulation history at a configurable
+scale, then drives the main endpoints either in-process through the Flask
+test client or over HTTP against a real gunicorn server (sync workers, or
+uvicorn workers running the async API), and reports p50/p95/p99 latency and
+requests/sec per endpoint.
+
+Results can be saved as a baseline and later runs compared against it; the
+run fails (exit status 1) when an endpoint's p95 latency or throughput
+regresses by more than the tolerance.
+
+Usage:
+    python -m benchmarks.harness --books 10000 --patrons 1000 --history 100000
+    python -m benchmarks.harness --driver gunicorn --workers 4 --concurrency 16
+    python -m benchmarks.harness --driver asgi --workers 4 --concurrency 256
+    python -m benchmarks.harness --save-baseline benchmarks/baseline.json
+    python -m benchmarks.harness --baseline benchmarks/baseline.json --tolerance 0.25
+"""
+
+import argparse
+import http.client
+import json
+import os
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import database
+from benchmarks.common import WORDS, SURNAMES, seed_books, seed_history
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (method, path, form data) for one request
+Request = Tuple[str, str, Optional[Dict[str, str]]]
+
+
+def seed(db_path: str, books: int, patrons: int, history: int) -> None:
+    """Create and populate a benchmark database at `db_path`."""
+    database.DATABASE = db_path
+    database.init_database()
+    seed_books(books)
+    seed_history(history, patrons, books)
+    database.get_db_connection().execute('ANALYZE')
+    database.close_all_connections()
+
+
+def build_scenarios(books: int, patrons: int, requests: int) -> Dict[str, List[Request]]:
+    """The request sequence for each benchmarked endpoint."""
+    words = [WORDS[i % len(WORDS)] for i in range(requests)]
+    authors = [SURNAMES[i % len(SURNAMES)] for i in range(requests)]
+    # Borrow and return the same (patron, book) pairs so the run leaves the
+    # database as it found it and never hits the 5-book limit
+    loans = [(f'{100000 + i % patrons}', 1 + (i * 7919) % books) for i in range(requests)]
+    return {
+        '/catalog': [('GET', '/catalog', None)] * requests,
+        '/search': [('GET', '/search?' + urlencode({'q': w, 'type': 'title'}), None) for w in words],
+        '/api/search': [('GET', '/api/search?' + urlencode({'q': a, 'type': 'author'}), None) for a in authors],
+        '/borrow': [('POST', '/borrow', {'patron_id': p, 'book_id': str(b)}) for p, b in loans],
+        '/return': [('POST', '/return', {'patron_id': p, 'book_id': str(b)}) for p, b in loans],
+        '/api/late_fee': [('GET', f'/api/late_fee/{p}/{b}', None) for p, b in loans],
+    }
+
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """Latency percentiles (ms) and throughput for one endpoint."""
+    cuts = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': len(latencies),
+        'p50_ms': round(cuts[49] * 1000, 3),
+        'p95_ms': round(cuts[94] * 1000, 3),
+        'p99_ms': round(cuts[98] * 1000, 3),
+        'req_per_s': round(len(latencies) / elapsed, 1),
+    }
+
+
+def run_scenario(send: Callable[[Request], None], requests: List[Request], concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def timed(request: Request) -> None:
+        start = time.perf_counter()
+        send(request)
+        duration = time.perf_counter() - start
+        with lock:
+            latencies.append(duration)
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        for request in requests:
+            timed(request)
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(timed, requests))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+# Drivers: each yields a send(request) callable
+
+@contextmanager
+def test_client_driver(db_path: str, concurrency: int) -> Iterator[Callable[[Request], None]]:
+    from app import create_app
+
+    database.DATABASE = db_path
+    app = create_app()
+    local = threading.local()
+
+    def send(request: Request) -> None:
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = app.test_client()
+        method, path, form = request
+        response = client.open(path, method=method, data=form)
+        response.close()
+
+    yield send
+    database.close_all_connections()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def gunicorn_driver(db_path: str, concurrency: int, workers: int,
+                    asgi: bool = False) -> Iterator[Callable[[Request], None]]:
+    """
+    Serve the app with gunicorn and send requests over HTTP.
+
+    With `asgi`, workers are uvicorn workers running asgi:create_asgi_app(),
+    so the JSON API is served by the async layer instead of sync workers.
+    """
+    if not shutil.which('gunicorn'):
+        raise SystemExit('gunicorn is not installed (pip install gunicorn)')
+    if asgi:
+        target = ['-k', 'uvicorn.workers.UvicornWorker', 'asgi:create_asgi_app()']
+    else:
+        target = ['app:create_app()']
+    port = _free_port()
+    env = dict(os.environ, LIBRARY_DB=db_path, SKIP_SAMPLE_DATA='1')
+    proc = subprocess.Popen(
+        ['gunicorn', '-w', str(workers), '-b', f'127.0.0.1:{port}', '--log-level', 'warning'] + target,
+        cwd=PROJECT_ROOT, env=env,
+    )
+    try:
+        for _ in range(100):
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+                    break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise SystemExit('gunicorn did not start')
+
+        local = threading.local()
+
+        def send(request: Request) -> None:
+            conn = getattr(local, 'conn', None)
+            if conn is None:
+                conn = local.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            method, path, form = request
+            body = urlencode(form) if form else None
+            headers = {'Content-Type': 'application/x-www-form-urlencoded'} if form else {}
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                conn.getresponse().read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                local.conn = None
+                raise
+
+        yield send
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Describe every endpoint whose p95 or throughput regressed beyond `tolerance`."""
+    regressions = []
+    for endpoint, base in baseline.items():
+        current = results.get(endpoint)
+        if current is None:
+            continue
+        if current['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {current['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if current['req_per_s'] < base['req_per_s'] * (1 - tolerance):
+            regressions.append(f"{endpoint}: {current['req_per_s']} req/s vs baseline {base['req_per_s']} req/s")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Load-test the library app.')
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--patrons', type=int, default=1000)
+    parser.add_argument('--history', type=int, default=100000, help='historical borrow records to seed')
+    parser.add_argument('--requests', type=int, default=500, help='requests per endpoint')
+    parser.add_argument('--driver', choices=('client', 'gunicorn', 'asgi'), default='client')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--concurrency', type=int, default=1, help='concurrent client threads')
+    parser.add_argument('--endpoints', nargs='*', help='only run these endpoints')
+    parser.add_argument('--db', help='reuse (or create) this database instead of a temporary one')
+    parser.add_argument('--output', help='write results as JSON to this file')
+    parser.add_argument('--save-baseline', help='write results as the new baseline to this file')
+    parser.add_argument('--baseline', help='fail if results regress against this baseline file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed regression (fraction)')
+    args = parser.parse_args(argv)
+
+    tmp = None
+    db_path = args.db
+    if not db_path:
+        tmp = tempfile.mkdtemp(prefix='library-bench-')
+        db_path = os.path.join(tmp, 'bench.db')
+    try:
+        if not os.path.exists(db_path):
+            started = time.perf_counter()
+            seed(db_path, args.books, args.patrons, args.history)
+            print(f'seeded {args.books} books, {args.history} borrow records '
+                  f'in {time.perf_counter() - started:.1f}s')
+
+        scenarios = build_scenarios(args.books, args.patrons, args.requests)
+        if args.endpoints:
+            scenarios = {name: reqs for name, reqs in scenarios.items() if name in args.endpoints}
+
+        if args.driver in ('gunicorn', 'asgi'):
+            driver = gunicorn_driver(db_path, args.concurrency, args.workers, asgi=args.driver == 'asgi')
+        else:
+            driver = test_client_driver(db_path, args.concurrency)
+
+        results = {}
+        with driver as send:
+            for name, reqs in scenarios.items():
+                results[name] = run_scenario(send, reqs, args.concurrency)
+                r = results[name]
+                print(f"{name:>14}: p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  "
+                      f"p99 {r['p99_ms']:8.2f} ms  {r['req_per_s']:9.1f} req/s")
+    finally:
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,214 @@
+"""
+In-memory catalog snapshot for Library Management System
+A compact, incrementally refreshed copy of the books table
+
+Books are held column-wise rather than as one dict per row: ids and copy
+counts in typed arrays, titles/ISBNs in plain lists and author names interned
+(many books share an author). The (title, id) catalog order is an array of
+column positions, and substring search scans one lowercased string per
+column, so /catalog pages and searches are answered without reading or
+materialising the whole table; only the books actually returned become dicts.
+
+Before each read the snapshot compares its version with the book_changes
+counter in the database and applies just the books changed since then.
+
+Configuration (environment variables):
+    CATALOG_SNAPSHOT=1    serve the catalog and search from the snapshot
+"""
+
+import os
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Tuple
+
+import database
+
+ENABLED = os.getenv('CATALOG_SNAPSHOT', '0') == '1'
+
+_COLUMNS = ('title', 'author')
+_SEPARATOR = '\x00'
+
+
+class CatalogSnapshot:
+    """Column-oriented copy of the books table for one database file."""
+
+    def __init__(self, database_path: Optional[str] = None):
+        self.database = database_path
+        self.version = 0
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.version = 0
+        # Column storage; position i holds one book, ids are kept ascending
+        self.ids = array('q')
+        self.titles: List[str] = []
+        self.authors: List[str] = []
+        self.isbns: List[str] = []
+        self.total_copies = array('i')
+        self.available_copies = array('i')
+        self.live = bytearray()
+        # Positions of live books in (title, id) order
+        self.order = array('i')
+        # Per searchable column: (lowercased values joined by _SEPARATOR, start offsets)
+        self._search: Dict[str, Tuple[str, array]] = {}
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def _sort_key(self, pos: int) -> Tuple[str, int]:
+        return self.titles[pos], self.ids[pos]
+
+    def _position(self, book_id: int) -> int:
+        pos = bisect_left(self.ids, book_id)
+        return pos if pos < len(self.ids) and self.ids[pos] == book_id else -1
+
+    def _append(self, book_id: int, title: str, author: str, isbn: str, total: int, available: int) -> int:
+        self.ids.append(book_id)
+        self.titles.append(title)
+        self.authors.append(sys.intern(author))
+        self.isbns.append(isbn)
+        self.total_copies.append(total)
+        self.available_copies.append(available)
+        self.live.append(1)
+        return len(self.ids) - 1
+
+    def _unlink(self, pos: int) -> None:
+        # Remove a position from the catalog order, located by its current key
+        i = bisect_left(self.order, self._sort_key(pos), key=self._sort_key)
+        del self.order[i]
+
+    def refresh(self) -> int:
+        """
+        Bring the snapshot up to date with the database.
+
+        Returns:
+            int: the number of changed books applied
+        """
+        with self._lock:
+            if self.database != database.DATABASE:
+                self.database = database.DATABASE
+                self._reset()
+            latest = database.get_catalog_version()
+            if latest == self.version:
+                return 0
+            if self.version == 0 or latest < self.version:
+                return self._load()
+            return self._apply_changes()
+
+    def _load(self) -> int:
+        self._reset()
+        for seq, book_id, title, author, isbn, total, available in database.iter_book_changes(0):
+            self._append(book_id, title, author, isbn, total, available)
+            self.version = max(self.version, seq)
+        self.order = array('i', sorted(range(len(self.ids)), key=self._sort_key))
+        return len(self.ids)
+
+    def _apply_changes(self) -> int:
+        changes = list(database.iter_book_changes(self.version))
+        added = []
+        text_changed = False
+        for seq, book_id, title, author, isbn, total, available in changes:
+            pos = self._position(book_id)
+            if pos < 0:
+                if title is not None:
+                    added.append((book_id, title, author, isbn, total, available))
+                continue
+            if title is None:
+                if self.live[pos]:
+                    self._unlink(pos)
+                    self.live[pos] = 0
+                    text_changed = True
+                continue
+            if not self.live[pos]:
+                return self._load()
+            if title != self.titles[pos] or author != self.authors[pos]:
+                self._unlink(pos)
+                self.titles[pos] = title
+                self.authors[pos] = sys.intern(author)
+                insort(self.order, pos, key=self._sort_key)
+                text_changed = True
+            self.isbns[pos] = isbn
+            self.total_copies[pos] = total
+            self.available_copies[pos] = available
+
+        # New ids are appended in ascending order; anything older than the
+        # newest id held (e.g. an explicit id) needs a full reload
+        added.sort()
+        if added and self.ids and added[0][0] < self.ids[-1]:
+            return self._load()
+        for book in added:
+            insort(self.order, self._append(*book), key=self._sort_key)
+        if added or text_changed:
+            self._search.clear()
+        self.version = changes[-1][0] if changes else self.version
+        return len(changes)
+
+    def _book(self, pos: int) -> Dict:
+        return {
+            'id': self.ids[pos],
+            'title': self.titles[pos],
+            'author': self.authors[pos],
+            'isbn': self.isbns[pos],
+            'total_copies': self.total_copies[pos],
+            'available_copies': self.available_copies[pos],
+        }
+
+    def page(self, after: Optional[Tuple[str, int]] = None, limit: int = 50) -> List[Dict]:
+        """Same as database.get_books_page, served from memory."""
+        with self._lock:
+            start = 0 if after is None else bisect_right(self.order, tuple(after), key=self._sort_key)
+            return [self._book(pos) for pos in self.order[start:start + limit]]
+
+    def _search_column(self, column: str) -> Tuple[str, array]:
+        index = self._search.get(column)
+        if index is None:
+            values = self.titles if column == 'title' else self.authors
+            lowered = [value.lower() if live else '' for value, live in zip(values, self.live)]
+            starts = array('q')
+            offset = 0
+            for value in lowered:
+                starts.append(offset)
+                offset += len(value) + 1
+            index = self._search[column] = (_SEPARATOR.join(lowered), starts)
+        return index
+
+    def search(self, term: str, fields: Tuple[str, ...] = _COLUMNS) -> List[Dict]:
+        """
+        Case-insensitive substring search, like database.search_books.
+
+        Books whose field starts with the term rank first, then by title and
+        id, in the same order as the database search.
+        """
+        needle = term.lower()
+        if not needle or _SEPARATOR in needle:
+            return []
+        with self._lock:
+            prefix_hits: Dict[int, int] = {}
+            for column in fields:
+                blob, starts = self._search_column(column)
+                i = blob.find(needle)
+                while i != -1:
+                    pos = bisect_right(starts, i) - 1
+                    prefix_hits[pos] = prefix_hits.get(pos, 0) + (i == starts[pos])
+                    # Continue with the next value; one hit per book is enough
+                    i = blob.find(needle, starts[pos + 1]) if pos + 1 < len(starts) else -1
+            ranked = sorted(prefix_hits, key=lambda pos: (-prefix_hits[pos], self.titles[pos], self.ids[pos]))
+            return [self._book(pos) for pos in ranked]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'books': len(self.order), 'version': self.version}
+
+
+snapshot = CatalogSnapshot()
+
+
+def get_snapshot() -> Optional[CatalogSnapshot]:
+    """The refreshed snapshot, or None when CATALOG_SNAPSHOT is off."""
+    if not ENABLED:
+        return None
+    snapshot.refresh()
+    return snapshot
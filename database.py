@@ -3,23 +3,316 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import itertools
+import os
+import queue
 import sqlite3
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 # Database configuration
-DATABASE = 'library.db'
+DATABASE = os.getenv('LIBRARY_DB', 'library.db')
+
+# Connection pool configuration
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+CONNECT_TIMEOUT = 30.0
+
+# Per-connection tuning applied to every pooled connection
+CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous = NORMAL',    # Safe with WAL, avoids an fsync per commit
+    'PRAGMA cache_size = -16000',     # 16 MB page cache
+    'PRAGMA mmap_size = 268435456',   # Map up to 256 MB of the file
+    'PRAGMA temp_store = MEMORY',
+)
+
+# Connection class used for new pooled connections. Must be sqlite3.Connection
+# or a subclass; the instrumentation module swaps in a timing subclass.
+connection_factory = sqlite3.Connection
+
+# Book lookup cache configuration
+BOOK_CACHE_SIZE = int(os.getenv('BOOK_CACHE_SIZE', '4096'))
+BOOK_CACHE_TTL = float(os.getenv('BOOK_CACHE_TTL', '5'))
+# Also drop cached books whenever another connection (e.g. another gunicorn
+# worker) has committed, detected through PRAGMA data_version
+BOOK_CACHE_CROSS_WORKER = os.getenv('BOOK_CACHE_CROSS_WORKER', '0') == '1'
+
+class ConnectionPool:
+    """
+    A bounded pool of reusable SQLite connections for one database file.
+
+    Idle connections are kept in a LIFO queue so the most recently used (and
+    therefore warmest) connection is handed out first. Connections that fail
+    the health check are discarded and replaced transparently.
+    """
+
+    def __init__(self, database: str, max_size: Optional[int] = None):
+        self.database = database
+        self.max_size = POOL_SIZE if max_size is None else max_size
+        self._idle = queue.LifoQueue(maxsize=max(self.max_size, 1))
+        self.created = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.database, timeout=CONNECT_TIMEOUT, check_same_thread=False,
+                               factory=connection_factory)
+        conn.row_factory = sqlite3.Row  # This enables column access by name
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        _data_versions.pop(id(conn), None)
+        self.created += 1
+        return conn
+
+    @staticmethod
+    def _is_healthy(conn: sqlite3.Connection) -> bool:
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self) -> sqlite3.Connection:
+        """Check out an idle healthy connection, opening a new one if none is left."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if self._is_healthy(conn):
+                return conn
+            conn.close()
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        """Return a connection to the pool, closing it if the pool is full."""
+        if self.max_size <= 0:
+            conn.close()
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put_nowait(conn)
+        except (queue.Full, sqlite3.Error):
+            conn.close()
+
+    def close_all(self) -> None:
+        """Close every idle connection held by the pool."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+class BookCache:
+    """
+    In-process LRU cache of book rows with a time-to-live.
+
+    Books are cached under both ('id', id) and ('isbn', isbn). Writers call
+    invalidate() after committing so the next read goes back to the database.
+    Only found books are cached, so inserting a new book never needs to evict
+    a negative entry.
+    """
+
+    def __init__(self, max_size: int = BOOK_CACHE_SIZE, ttl: float = BOOK_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: 'OrderedDict[Tuple[str, object], Tuple[float, Dict]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Tuple[str, object]) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, book: Dict) -> None:
+        if self.max_size <= 0:
+            return
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key in (('id', book['id']), ('isbn', book['isbn'])):
+                self._entries[key] = (expires, dict(book))
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, book_id: Optional[int] = None, isbn: Optional[str] = None) -> None:
+        """Drop a book's entries, given its id and/or ISBN."""
+        with self._lock:
+            entry = self._entries.pop(('id', book_id), None) if book_id is not None else None
+            if entry is not None:
+                self._entries.pop(('isbn', entry[1]['isbn']), None)
+            if isbn is not None:
+                entry = self._entries.pop(('isbn', isbn), None)
+                if entry is not None:
+                    self._entries.pop(('id', entry[1]['id']), None)
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+book_cache = BookCache()
+# Last PRAGMA data_version seen on each pooled connection, keyed by id(conn)
+_data_versions: Dict[int, int] = {}
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+_local = threading.local()
+
+def get_pool(database: Optional[str] = None) -> ConnectionPool:
+    """Get (or lazily create) the connection pool for a database file."""
+    database = database or DATABASE
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None:
+            pool = _pools[database] = ConnectionPool(database)
+        return pool
+
+def _current_database() -> str:
+    return getattr(_local, 'override', None) or DATABASE
 
 def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row  # This enables column access by name
+    """
+    Get the database connection bound to the current thread.
+
+    The connection is checked out of the pool on first use and reused by every
+    helper in this thread until close_db_connection() hands it back (the Flask
+    app does this at app-context teardown).
+    """
+    database = _current_database()
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        if _local.database == database:
+            return conn
+        close_db_connection()
+    conn = get_pool(database).acquire()
+    _local.conn = conn
+    _local.database = database
     return conn
 
+def close_db_connection(exc: Optional[BaseException] = None) -> None:
+    """Release the current thread's connection back to its pool."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        return
+    _local.conn = None
+    get_pool(_local.database).release(conn)
+
+@contextmanager
+def use_database(database: str) -> Iterator[None]:
+    """
+    Point this thread's helpers at another database file (e.g. a branch shard,
+    see the sharding module) for the duration of a block.
+
+    The block gets its own pooled connection, handed back when it ends; the
+    thread's previous connection, and any transaction open on it, is left
+    untouched and in use again afterwards. Book lookups inside the block skip
+    the book cache, which is keyed by id and ISBN of DATABASE's books only.
+    """
+    saved = (getattr(_local, 'conn', None), getattr(_local, 'database', None), getattr(_local, 'override', None))
+    _local.conn = None
+    _local.override = database
+    try:
+        yield
+    finally:
+        close_db_connection()
+        _local.conn, _local.database, _local.override = saved
+
+def close_all_connections() -> None:
+    """Release this thread's connection and close all pooled connections."""
+    close_db_connection()
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close_all()
+
+@contextmanager
+def transaction() -> Iterator[sqlite3.Connection]:
+    """
+    Run a block as one atomic unit on the current thread's connection.
+
+    The write lock is taken up front (BEGIN IMMEDIATE) so the reads inside the
+    block cannot be invalidated by another writer before the block commits.
+    Any exception rolls the whole block back.
+
+    Raises:
+        RuntimeError: if the connection already has a transaction open, which
+            this block would otherwise commit or roll back with its own.
+    """
+    conn = get_db_connection()
+    if conn.in_transaction:
+        raise RuntimeError('transaction() cannot start inside an open transaction')
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+# Loan dates are INTEGER seconds since 1970-01-01 (see to_epoch)
+BORROW_RECORDS_SQL = '''
+    CREATE TABLE IF NOT EXISTS borrow_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        patron_id TEXT NOT NULL,
+        book_id INTEGER NOT NULL,
+        borrow_date INTEGER NOT NULL,
+        due_date INTEGER NOT NULL,
+        return_date INTEGER,
+        FOREIGN KEY (book_id) REFERENCES books (id)
+    )
+'''
+
+OVERDUE_LOANS_SQL = '''
+    CREATE TABLE IF NOT EXISTS overdue_loans (
+        loan_id INTEGER PRIMARY KEY,
+        patron_id TEXT NOT NULL,
+        book_id INTEGER NOT NULL,
+        due_date INTEGER NOT NULL,
+        days_overdue INTEGER NOT NULL,
+        fee REAL NOT NULL,
+        swept_on TEXT NOT NULL
+    )
+'''
+
 def init_database():
-    """Initialize the database with required tables."""
+    """Initialize the database with required tables and apply pending migrations."""
     conn = get_db_connection()
     
+    # WAL lets readers run alongside the single writer; the mode is persistent
+    conn.execute('PRAGMA journal_mode = WAL')
+    
     # Create books table
     conn.execute('''
         CREATE TABLE IF NOT EXISTS books (
@@ -33,27 +326,447 @@ def init_database():
     ''')
     
     # Create borrow_records table
+    conn.execute(BORROW_RECORDS_SQL)
+    
+    conn.commit()
+    
+    migrate_database(conn)
+
+@contextmanager
+def _setup_lock() -> Iterator[None]:
+    # An exclusive lock on a file next to the database serialises setup across
+    # processes. Without fcntl (Windows) migrate_database's BEGIN IMMEDIATE
+    # still keeps the migrations themselves from running twice.
+    database = _current_database()
+    if fcntl is None or database == ':memory:':
+        yield
+        return
+    with open(f'{database}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def _needs_setup(conn: sqlite3.Connection, sample_data: bool) -> bool:
+    if get_schema_version(conn) < SCHEMA_VERSION:
+        return True
+    return sample_data and not conn.execute('SELECT EXISTS (SELECT 1 FROM books)').fetchone()[0]
+
+def prepare_database(sample_data: bool = True) -> bool:
+    """
+    Make sure the schema is current (and sample data present), running the
+    setup at most once.
+
+    When the database is already set up (every start after the first, and
+    every worker after the gunicorn master has prepared it) this costs two
+    trivial reads: the schema version and whether any book exists. Otherwise
+    setup runs under a file lock, so processes starting together do not all
+    run the DDL: those that get the lock after the first find nothing to do.
+
+    Args:
+        sample_data: add the sample books when the database has none
+
+    Returns:
+        bool: True if this call ran the setup.
+    """
+    conn = get_db_connection()
+    if not _needs_setup(conn, sample_data):
+        return False
+    with _setup_lock():
+        if not _needs_setup(conn, sample_data):
+            return False
+        init_database()
+        if sample_data:
+            add_sample_data()
+    return True
+
+# Schema migrations
+#
+# Each entry upgrades the schema by one version. The current version is kept in
+# PRAGMA user_version, so every migration runs exactly once per database file.
+# Append new migrations to the end of MIGRATIONS; never reorder or edit them.
+
+def _add_borrow_record_indexes(conn: sqlite3.Connection) -> None:
+    # Active loans per patron: borrow counts, duplicate checks and returns
     conn.execute('''
-        CREATE TABLE IF NOT EXISTS borrow_records (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_active
+        ON borrow_records (patron_id, book_id)
+        WHERE return_date IS NULL
+    ''')
+    # Loans of a book, for per-title lookups and joins from books
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_book
+        ON borrow_records (book_id)
+    ''')
+
+def _add_books_title_index(conn: sqlite3.Connection) -> None:
+    # Keyset pagination of the catalog in (title, id) order
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_books_title_id ON books (title, id)
+    ''')
+
+def _add_borrow_history_index(conn: sqlite3.Connection) -> None:
+    # Returned loans per patron, newest first, for paginated history. Partial
+    # so the planner keeps using idx_borrow_records_active for open loans.
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_history
+        ON borrow_records (patron_id, borrow_date, id)
+        WHERE return_date IS NOT NULL
+    ''')
+
+def _add_book_change_log(conn: sqlite3.Connection) -> None:
+    # One row per book holding the sequence number of its latest insert, update
+    # or delete, so in-memory copies of the catalog can catch up incrementally.
+    # MAX(seq) doubles as a catalog-wide change counter.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS book_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id INTEGER NOT NULL UNIQUE
+        )
+    ''')
+    for event, row in (('insert', 'new'), ('update', 'new'), ('delete', 'old')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS book_changes_{event} AFTER {event.upper()} ON books BEGIN
+                DELETE FROM book_changes WHERE book_id = {row}.id;
+                INSERT INTO book_changes (book_id) VALUES ({row}.id);
+            END
+        ''')
+    conn.execute('''
+        INSERT INTO book_changes (book_id)
+        SELECT id FROM books WHERE id NOT IN (SELECT book_id FROM book_changes) ORDER BY id
+    ''')
+
+def _add_overdue_tracking(conn: sqlite3.Connection) -> None:
+    # Open loans by due date, so overdue loans are found without scanning history
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_due
+        ON borrow_records (due_date)
+        WHERE return_date IS NULL
+    ''')
+    # Materialised by the overdue sweep (services.overdue_service)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS overdue_loans (
+            loan_id INTEGER PRIMARY KEY,
             patron_id TEXT NOT NULL,
             book_id INTEGER NOT NULL,
-            borrow_date TEXT NOT NULL,
             due_date TEXT NOT NULL,
-            return_date TEXT,
-            FOREIGN KEY (book_id) REFERENCES books (id)
+            days_overdue INTEGER NOT NULL,
+            fee REAL NOT NULL,
+            swept_on TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_overdue_loans_patron ON overdue_loans (patron_id)
+    ''')
+    # A returned loan stops being overdue straight away, not at the next sweep
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS overdue_loans_return
+        AFTER UPDATE OF return_date ON borrow_records
+        WHEN new.return_date IS NOT NULL
+        BEGIN
+            DELETE FROM overdue_loans WHERE loan_id = new.id;
+        END
+    ''')
+
+def _column_types(conn: sqlite3.Connection, table: str) -> Dict[str, str]:
+    return {row['name']: row['type'].upper() for row in conn.execute(f'PRAGMA table_info({table})')}
+
+def _rebuild_with_epoch_dates(conn: sqlite3.Connection, table: str, create_sql: str,
+                              date_columns: Tuple[str, ...]) -> None:
+    # SQLite cannot change a column's type, so copy the rows into a new table,
+    # converting ISO strings to epoch seconds, and swap it in
+    columns = list(_column_types(conn, table))
+    select = ', '.join(f"CAST(strftime('%s', {c}) AS INTEGER)" if c in date_columns else c for c in columns)
+    conn.execute(create_sql.replace(f' {table} (', f' {table}_epoch (', 1))
+    conn.execute(f'INSERT INTO {table}_epoch ({", ".join(columns)}) SELECT {select} FROM {table}')
+    conn.execute(f'DROP TABLE {table}')
+    conn.execute(f'ALTER TABLE {table}_epoch RENAME TO {table}')
+
+def _store_dates_as_epoch_seconds(conn: sqlite3.Connection) -> None:
+    # Loan dates become INTEGER seconds since 1970-01-01 so comparisons and
+    # day arithmetic are numeric. Databases created after this change already
+    # have INTEGER columns; older ones are rebuilt and backfilled here.
+    # The overdue return trigger links the two tables, so it is dropped first
+    # and recreated (with the dropped indexes) once both are rebuilt
+    conn.execute('DROP TRIGGER IF EXISTS overdue_loans_return')
+    if _column_types(conn, 'overdue_loans')['due_date'] != 'INTEGER':
+        _rebuild_with_epoch_dates(conn, 'overdue_loans', OVERDUE_LOANS_SQL, ('due_date',))
+    if _column_types(conn, 'borrow_records')['borrow_date'] != 'INTEGER':
+        _rebuild_with_epoch_dates(conn, 'borrow_records', BORROW_RECORDS_SQL,
+                                  ('borrow_date', 'due_date', 'return_date'))
+        _add_borrow_record_indexes(conn)
+        _add_borrow_history_index(conn)
+    _add_overdue_tracking(conn)
+
+def _add_job_queue(conn: sqlite3.Connection) -> None:
+    # Durable background jobs (services.job_queue); times are epoch seconds
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            run_after INTEGER NOT NULL,
+            locked_until INTEGER,
+            transaction_id TEXT,
+            result TEXT,
+            error TEXT,
+            created_at INTEGER NOT NULL,
+            updated_at INTEGER NOT NULL
+        )
+    ''')
+    # Workers only ever look for jobs that are still to run
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jobs_pending
+        ON jobs (run_after, id)
+        WHERE status IN ('queued', 'running')
+    ''')
+
+# Circulation rollups
+#
+# Counters per rollup table key, kept current by triggers on borrow_records
+# (so every write path counts, including batch checkouts): a loan is a borrow
+# on the day of its borrow_date, and a return (overdue if after its due day,
+# with the days it was out) on the day of its return_date. Days are
+# epoch_day() numbers, months YYYYMM. A loan counts under the author its book
+# had at the time; rebuild_circulation_rollups() recounts everything.
+ROLLUP_COUNTERS = ('borrows', 'returns', 'overdue_returns', 'loan_days')
+# Rollup key column -> its SQL in terms of a loan event's book_id, author and day
+_ROLLUP_KEYS = {
+    'day': 'day',
+    'month': "CAST(strftime('%Y%m', day * 86400, 'unixepoch') AS INTEGER)",
+    'book_id': 'book_id',
+    'author': 'author',
+}
+# table -> key columns, which are its primary key in this order
+CIRCULATION_ROLLUPS = {
+    'book_circulation_daily': ('book_id', 'day'),
+    'author_circulation_daily': ('author', 'day'),
+    'circulation_daily': ('day',),
+    'book_circulation_monthly': ('month', 'book_id'),
+    'author_circulation_monthly': ('month', 'author'),
+    'book_circulation_totals': ('book_id',),
+}
+# Rollups recounted from a finer rollup (listed before them) rather than from every loan event
+_ROLLUP_SOURCES = {
+    'circulation_daily': 'book_circulation_daily',
+    'book_circulation_monthly': 'book_circulation_daily',
+    'author_circulation_monthly': 'author_circulation_daily',
+    'book_circulation_totals': 'book_circulation_daily',
+}
+# event -> (date column it is counted on, counter increments)
+_ROLLUP_EVENTS = {
+    'borrow': ('borrow_date', ('1', '0', '0', '0')),
+    'return': ('return_date', ('0', '1', '{loan}.return_date / 86400 > {loan}.due_date / 86400',
+                               '{loan}.return_date / 86400 - {loan}.borrow_date / 86400')),
+}
+
+def _loan_events(event: str, loan: str, author: str) -> str:
+    # SELECT list of one event of loan row `loan` as book_id, author, day and counter increments
+    column, increments = _ROLLUP_EVENTS[event]
+    values = [f'{loan}.book_id AS book_id', f'{author} AS author', f'{loan}.{column} / 86400 AS day']
+    values += [f'{value.format(loan=loan)} AS {counter}' for counter, value in zip(ROLLUP_COUNTERS, increments)]
+    return 'SELECT ' + ', '.join(values)
+
+def _rollup_insert(table: str, events: str) -> str:
+    # Add up the loan events of table or subquery `events` into a rollup table
+    keys = ', '.join(_ROLLUP_KEYS[key] for key in CIRCULATION_ROLLUPS[table])
+    return (f'INSERT INTO {table} ({", ".join((*CIRCULATION_ROLLUPS[table], *ROLLUP_COUNTERS))}) '
+            f'SELECT {keys}, {", ".join(f"SUM({c})" for c in ROLLUP_COUNTERS)} FROM {events} GROUP BY {keys}')
+
+def _add_circulation_rollups(conn: sqlite3.Connection) -> None:
+    for table, keys in CIRCULATION_ROLLUPS.items():
+        key_columns = ', '.join(f'{key} {"TEXT" if key == "author" else "INTEGER"} NOT NULL' for key in keys)
+        counters = ', '.join(f'{c} INTEGER NOT NULL DEFAULT 0' for c in ROLLUP_COUNTERS)
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                {key_columns}, {counters}, PRIMARY KEY ({", ".join(keys)})
+            ) WITHOUT ROWID
+        ''')
+    # Most borrowed books/authors of a month, read straight off the index
+    for table, key in (('book_circulation_monthly', 'book_id'), ('author_circulation_monthly', 'author')):
+        conn.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{table}_borrows ON {table} (month, borrows DESC, {key})
+        ''')
+    # A loan inserted already returned (e.g. imported history) counts both ways
+    author = "COALESCE((SELECT author FROM books WHERE id = new.book_id), '')"
+    counters = ', '.join(f'{c} = {c} + excluded.{c}' for c in ROLLUP_COUNTERS)
+    for name, event, action, when in (
+            ('borrow', 'borrow', 'INSERT', '1'),
+            ('return', 'return', 'UPDATE OF return_date', 'old.return_date IS NULL AND new.return_date IS NOT NULL'),
+            ('insert_returned', 'return', 'INSERT', 'new.return_date IS NOT NULL')):
+        events = f'({_loan_events(event, "new", author)})'
+        upserts = '\n'.join(f'{_rollup_insert(table, events)} '
+                            f'ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {counters};'
+                            for table, keys in CIRCULATION_ROLLUPS.items())
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS circulation_{name} AFTER {action} ON borrow_records
+            WHEN {when}
+            BEGIN
+                {upserts}
+            END
+        ''')
+    rebuild_circulation_rollups(conn)
+
+def rebuild_circulation_rollups(conn: Optional[sqlite3.Connection] = None) -> int:
+    """
+    Recount every circulation rollup table from the whole of borrow_records,
+    in the caller's transaction.
+
+    The events of all loans are written to a temporary table once, with each
+    book's current author; the daily book and author rollups are added up
+    from there and the coarser ones from those.
+
+    Returns:
+        int: the number of loans counted
+    """
+    conn = conn or get_db_connection()
+    loans = "FROM borrow_records r LEFT JOIN books b ON b.id = r.book_id"
+    author = "COALESCE(b.author, '')"
+    conn.execute('DROP TABLE IF EXISTS temp.circulation_events')
+    conn.execute(f'''
+        CREATE TEMP TABLE circulation_events AS
+        {_loan_events('borrow', 'r', author)} {loans}
+        UNION ALL
+        {_loan_events('return', 'r', author)} {loans} WHERE r.return_date IS NOT NULL
+    ''')
+    try:
+        for table in CIRCULATION_ROLLUPS:
+            conn.execute(f'DELETE FROM {table}')
+            conn.execute(_rollup_insert(table, _ROLLUP_SOURCES.get(table, 'temp.circulation_events')))
+    finally:
+        conn.execute('DROP TABLE temp.circulation_events')
+    return conn.execute('SELECT COUNT(*) FROM borrow_records').fetchone()[0]
+
+def _add_fee_payments(conn: sqlite3.Connection) -> None:
+    # Late fee amounts already settled per loan, so paying "all fees" again
+    # (on a later day, when the fees have grown) only charges what is left
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fee_payments (
+            loan_id INTEGER NOT NULL,
+            transaction_id TEXT NOT NULL,
+            amount REAL NOT NULL,
+            paid_at INTEGER NOT NULL,
+            PRIMARY KEY (loan_id, transaction_id)
         )
     ''')
+
+def _add_book_change_times(conn: sqlite3.Connection) -> None:
+    # When each change was made, for the catalog's Last-Modified header. Real
+    # UTC epoch seconds (not to_epoch's local time) since HTTP dates are UTC;
+    # changes logged before this migration have none.
+    conn.execute('ALTER TABLE book_changes ADD COLUMN changed_at INTEGER')
+    for event, row in (('insert', 'new'), ('update', 'new'), ('delete', 'old')):
+        conn.execute(f'DROP TRIGGER IF EXISTS book_changes_{event}')
+        conn.execute(f'''
+            CREATE TRIGGER book_changes_{event} AFTER {event.upper()} ON books BEGIN
+                DELETE FROM book_changes WHERE book_id = {row}.id;
+                INSERT INTO book_changes (book_id, changed_at)
+                VALUES ({row}.id, CAST(strftime('%s', 'now') AS INTEGER));
+            END
+        ''')
+
+def get_schema_version(conn: Optional[sqlite3.Connection] = None) -> int:
+    """Get the migration version the database is currently at."""
+    conn = conn or get_db_connection()
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate_database(conn: Optional[sqlite3.Connection] = None) -> int:
+    """
+    Apply every pending migration, each in its own transaction.
+
+    Safe to call from several processes at once: the version is re-read after
+    taking the write lock, so a migration another process already applied is
+    skipped. Returns the resulting schema version.
+
+    Raises:
+        RuntimeError: if the connection already has a transaction open.
+    """
+    conn = conn or get_db_connection()
+    if conn.in_transaction:
+        raise RuntimeError('Migrations cannot run inside an open transaction')
+    while get_schema_version(conn) < SCHEMA_VERSION:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = get_schema_version(conn)
+            if version < SCHEMA_VERSION:
+                MIGRATIONS[version](conn)
+                conn.execute(f'PRAGMA user_version = {version + 1}')
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+    return get_schema_version(conn)
+
+def create_search_index(conn: sqlite3.Connection) -> bool:
+    """
+    Create the FTS5 search index over book titles/authors and the triggers
+    that keep it in sync with the books table.
+
+    The trigram tokenizer makes MATCH behave like a case-insensitive substring
+    search, so indexed lookups return the same books as the old in-Python scan.
+    Returns False when this SQLite build has no FTS5 support; searches then
+    fall back to scanning the books table.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'books_fts'"
+    ).fetchone()
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+                title, author, content='books', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError:
+        return False
     
-    conn.commit()
-    conn.close()
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author)
+            VALUES ('delete', old.id, old.title, old.author);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author)
+            VALUES ('delete', old.id, old.title, old.author);
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
+    
+    # Index any books that were added before the index existed
+    if not exists:
+        conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+    return True
+
+MIGRATIONS = [
+    create_search_index,          # 1: FTS5 index over titles/authors
+    _add_borrow_record_indexes,   # 2: borrow_records lookups by patron/book
+    _add_books_title_index,       # 3: catalog pagination by (title, id)
+    _add_borrow_history_index,    # 4: patron borrowing history
+    _add_book_change_log,         # 5: change log for the catalog snapshot
+    _add_overdue_tracking,        # 6: overdue index and overdue_loans table
+    _store_dates_as_epoch_seconds,  # 7: loan dates as INTEGER epoch seconds
+    _add_job_queue,               # 8: jobs table for background payments/refunds
+    _add_circulation_rollups,     # 9: daily/monthly circulation counters
+    _add_fee_payments,            # 10: late fees already paid per loan
+    _add_book_change_times,       # 11: time of each catalog change
+]
+SCHEMA_VERSION = len(MIGRATIONS)
 
 def add_sample_data():
     """Add sample data to the database if it's empty."""
     conn = get_db_connection()
-    book_count = conn.execute('SELECT COUNT(*) as count FROM books').fetchone()['count']
+    has_books = conn.execute('SELECT EXISTS (SELECT 1 FROM books)').fetchone()[0]
     
-    if book_count == 0:
+    if not has_books:
         # Add sample books
         sample_books = [
             ('The Great Gatsby', 'F. Scott Fitzgerald', '9780743273565', 3),
@@ -72,15 +785,38 @@ def add_sample_data():
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
         ''', ('123456', 3, 
-              (datetime.now() - timedelta(days=5)).isoformat(),
-              (datetime.now() + timedelta(days=9)).isoformat()))
+              to_epoch(datetime.now() - timedelta(days=5)),
+              to_epoch(datetime.now() + timedelta(days=9))))
         
         # Update available copies for 1984
         conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
         
         conn.commit()
     
-    conn.close()
+
+# Loan dates
+#
+# Stored as whole seconds since 1970-01-01. Naive datetimes (the app's local
+# wall-clock time) are converted as if they were UTC, so seconds // 86400 is
+# the calendar day the datetime shows and day arithmetic stays in SQL.
+
+SECONDS_PER_DAY = 86400
+_EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = _EPOCH.toordinal()
+
+def to_epoch(value: datetime) -> int:
+    """Convert a datetime to stored epoch seconds."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // timedelta(seconds=1)
+
+def from_epoch(seconds: int) -> datetime:
+    """Convert stored epoch seconds back to a naive datetime."""
+    return _EPOCH + timedelta(0, seconds)
+
+def epoch_day(value: date) -> int:
+    """Day number (days since 1970-01-01) of a date, as used in SQL day arithmetic."""
+    return value.toordinal() - EPOCH_ORDINAL
 
 # Helper Functions for Database Operations
 
@@ -88,34 +824,177 @@ def get_all_books() -> List[Dict]:
     """Get all books from the database."""
     conn = get_db_connection()
     books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
-    conn.close()
     return [dict(book) for book in books]
 
-def get_book_by_id(book_id: int) -> Optional[Dict]:
-    """Get a specific book by ID."""
+def get_books_page(after: Optional[Tuple[str, int]] = None, limit: int = 50) -> List[Dict]:
+    """
+    Get one page of the catalog in (title, id) order.
+
+    Uses keyset pagination: `after` is the (title, id) of the last book on the
+    previous page, so each page is an index seek rather than an OFFSET scan.
+    """
+    conn = get_db_connection()
+    if after is None:
+        books = conn.execute('SELECT * FROM books ORDER BY title, id LIMIT ?', (limit,)).fetchall()
+    else:
+        books = conn.execute('''
+            SELECT * FROM books WHERE (title, id) > (?, ?)
+            ORDER BY title, id LIMIT ?
+        ''', (after[0], after[1], limit)).fetchall()
+    return [dict(book) for book in books]
+
+def iter_books(after: Optional[Tuple[str, int]] = None, batch_size: int = 500) -> Iterator[Dict]:
+    """Yield every book in (title, id) order without loading the whole table."""
+    conn = get_db_connection()
+    after = after or ('', 0)
+    cursor = conn.execute('''
+        SELECT * FROM books WHERE (title, id) > (?, ?) ORDER BY title, id
+    ''', after)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+    finally:
+        cursor.close()
+
+def get_catalog_version() -> int:
+    """Sequence number of the latest change to the books table (0 if none)."""
+    conn = get_db_connection()
+    return conn.execute('SELECT COALESCE(MAX(seq), 0) FROM book_changes').fetchone()[0]
+
+def get_catalog_change() -> Tuple[int, Optional[int]]:
+    """
+    The latest change to the books table: its sequence number (0 if none) and
+    when it was made, in UTC epoch seconds (None if unknown).
+    """
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
-    conn.close()
-    return dict(book) if book else None
+    row = conn.execute('SELECT seq, changed_at FROM book_changes ORDER BY seq DESC LIMIT 1').fetchone()
+    return (row[0], row[1]) if row else (0, None)
+
+def iter_book_changes(since: int = 0, batch_size: int = 5000) -> Iterator[Tuple]:
+    """
+    Yield (seq, id, title, author, isbn, total_copies, available_copies) for
+    every book changed after change `since`, in change order.
+
+    Deleted books come back with None in every column after the id. With
+    since=0 every current book is returned, in id order.
+    """
+    conn = get_db_connection()
+    if since:
+        cursor = conn.execute('''
+            SELECT c.seq, c.book_id, b.title, b.author, b.isbn, b.total_copies, b.available_copies
+            FROM book_changes c LEFT JOIN books b ON b.id = c.book_id
+            WHERE c.seq > ? ORDER BY c.seq
+        ''', (since,))
+    else:
+        cursor = conn.execute('''
+            SELECT c.seq, b.id, b.title, b.author, b.isbn, b.total_copies, b.available_copies
+            FROM books b JOIN book_changes c ON c.book_id = b.id
+            ORDER BY b.id
+        ''')
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield tuple(row)
+    finally:
+        cursor.close()
+
+def _check_external_writes(conn: sqlite3.Connection) -> None:
+    """Clear the book cache if another connection committed since we last looked."""
+    version = conn.execute('PRAGMA data_version').fetchone()[0]
+    if _data_versions.get(id(conn)) != version:
+        _data_versions[id(conn)] = version
+        book_cache.clear()
+
+def _get_book(column: str, value) -> Optional[Dict]:
+    conn = get_db_connection()
+    if getattr(_local, 'override', None):
+        book = conn.execute(f'SELECT * FROM books WHERE {column} = ?', (value,)).fetchone()
+        return dict(book) if book else None
+    if BOOK_CACHE_CROSS_WORKER:
+        _check_external_writes(conn)
+    book = book_cache.get((column, value))
+    if book is not None:
+        return book
+    book = conn.execute(f'SELECT * FROM books WHERE {column} = ?', (value,)).fetchone()
+    if not book:
+        return None
+    book = dict(book)
+    book_cache.put(book)
+    return book
+
+def get_book_by_id(book_id: int) -> Optional[Dict]:
+    """Get a specific book by ID (served from the book cache when possible)."""
+    return _get_book('id', book_id)
 
 def get_book_by_isbn(isbn: str) -> Optional[Dict]:
-    """Get a specific book by ISBN."""
+    """Get a specific book by ISBN (served from the book cache when possible)."""
+    return _get_book('isbn', isbn)
+
+def get_books_by_ids(book_ids: List[int]) -> List[Dict]:
+    """Get the books with the given IDs, in the order given (missing ones are skipped)."""
+    if not book_ids:
+        return []
     conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
-    conn.close()
-    return dict(book) if book else None
+    placeholders = ','.join('?' * len(book_ids))
+    rows = conn.execute(f'SELECT * FROM books WHERE id IN ({placeholders})', list(book_ids)).fetchall()
+    books = {row['id']: dict(row) for row in rows}
+    return [books[book_id] for book_id in book_ids if book_id in books]
+
+def get_book_cache_stats() -> Dict[str, int]:
+    """Hit/miss/eviction/invalidation counters for the book cache."""
+    return book_cache.stats()
+
+def search_books(term: str, fields: Tuple[str, ...] = ('title', 'author')) -> List[Dict]:
+    """
+    Case-insensitive substring search over the given book columns.
+
+    Uses the FTS5 trigram index when the term is long enough to be indexed
+    (3+ characters). Books whose field starts with the term (in more of the
+    fields) rank first, then by title and id, as in CatalogSnapshot.search.
+    """
+    conn = get_db_connection()
+    needle = term.lower()
+    prefix_rank = ' + '.join(f'(instr(lower(b.{f}), ?) = 1)' for f in fields)
+    prefix_params = (needle,) * len(fields)
+    
+    if len(term) >= 3:
+        match = '{%s} : "%s"' % (' '.join(fields), term.replace('"', '""'))
+        try:
+            rows = conn.execute(f'''
+                SELECT b.* FROM books_fts f
+                JOIN books b ON b.id = f.rowid
+                WHERE books_fts MATCH ?
+                ORDER BY {prefix_rank} DESC, b.title, b.id
+            ''', (match,) + prefix_params).fetchall()
+            return [dict(row) for row in rows]
+        except sqlite3.OperationalError:
+            pass  # No FTS5 index on this database, scan instead
+    
+    where = ' OR '.join(f'instr(lower(b.{f}), ?) > 0' for f in fields)
+    rows = conn.execute(f'''
+        SELECT b.* FROM books b
+        WHERE {where}
+        ORDER BY {prefix_rank} DESC, b.title, b.id
+    ''', (needle,) * len(fields) + prefix_params).fetchall()
+    return [dict(row) for row in rows]
 
 def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     """Get currently borrowed books for a patron."""
     conn = get_db_connection()
     records = conn.execute('''
-        SELECT br.*, b.title, b.author 
+        SELECT br.*, b.title, b.author, br.due_date < ? AS is_overdue
         FROM borrow_records br 
         JOIN books b ON br.book_id = b.id 
         WHERE br.patron_id = ? AND br.return_date IS NULL
         ORDER BY br.borrow_date
-    ''', (patron_id,)).fetchall()
-    conn.close()
+    ''', (to_epoch(datetime.now()), patron_id)).fetchall()
     
     borrowed_books = []
     for record in records:
@@ -123,13 +1002,292 @@ def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
             'book_id': record['book_id'],
             'title': record['title'],
             'author': record['author'],
-            'borrow_date': datetime.fromisoformat(record['borrow_date']),
-            'due_date': datetime.fromisoformat(record['due_date']),
-            'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
+            'borrow_date': from_epoch(record['borrow_date']),
+            'due_date': from_epoch(record['due_date']),
+            'is_overdue': bool(record['is_overdue'])
         })
     
     return borrowed_books
 
+def get_active_borrow(patron_id: str, book_id: int) -> Optional[Dict]:
+    """Get the patron's open borrow record for a book, if any."""
+    conn = get_db_connection()
+    record = conn.execute('''
+        SELECT * FROM borrow_records
+        WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+        ORDER BY borrow_date LIMIT 1
+    ''', (patron_id, book_id)).fetchone()
+    return dict(record) if record else None
+
+def get_last_borrow(patron_id: str, book_id: int) -> Optional[Dict]:
+    """Get the patron's most recent borrow record for a book, open or returned."""
+    conn = get_db_connection()
+    record = conn.execute('''
+        SELECT * FROM borrow_records
+        WHERE patron_id = ? AND book_id = ?
+        ORDER BY borrow_date DESC, id DESC LIMIT 1
+    ''', (patron_id, book_id)).fetchone()
+    return dict(record) if record else None
+
+# Late fee SQL. Named parameters: as_of_day (epoch_day() of the day fees are
+# charged up to) and the fee schedule (first_days, first_rate, daily_rate, max_fee).
+
+_DAYS_OVERDUE_SQL = f'(:as_of_day - due_date / {SECONDS_PER_DAY})'
+
+def _late_fee_sql(days: str) -> str:
+    return (f'ROUND(MIN(:max_fee, :first_rate * MIN({days}, :first_days)'
+            f' + :daily_rate * MAX({days} - :first_days, 0)), 2)')
+
+# Every open loan that is overdue on as_of_day, with its fee
+_OPEN_LOAN_FEES_SQL = f'''
+    SELECT id, patron_id, book_id, due_date, days_overdue, {_late_fee_sql('days_overdue')} AS fee
+    FROM (
+        SELECT id, patron_id, book_id, due_date, {_DAYS_OVERDUE_SQL} AS days_overdue
+        FROM borrow_records
+        WHERE return_date IS NULL AND due_date < :as_of_day * {SECONDS_PER_DAY}
+    )
+    WHERE days_overdue > 0
+'''
+
+def iter_open_loan_fees(as_of_day: int, schedule: Dict[str, float], batch_size: int = 5000) -> Iterator[Dict]:
+    """Yield every open loan that is overdue on `as_of_day` with its late fee."""
+    conn = get_db_connection()
+    cursor = conn.execute(_OPEN_LOAN_FEES_SQL, dict(schedule, as_of_day=as_of_day))
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for row in rows:
+                yield dict(row)
+    finally:
+        cursor.close()
+
+def get_open_loan_fee_totals(as_of_day: int, schedule: Dict[str, float]) -> Dict:
+    """Count overdue open loans and patrons, and total their late fees, in one query."""
+    conn = get_db_connection()
+    row = conn.execute(f'''
+        SELECT COUNT(*) AS overdue_loans, COUNT(DISTINCT patron_id) AS patrons,
+               ROUND(COALESCE(SUM(fee), 0), 2) AS total_fees
+        FROM ({_OPEN_LOAN_FEES_SQL})
+    ''', dict(schedule, as_of_day=as_of_day)).fetchone()
+    return dict(row)
+
+def replace_overdue_loans(loans: Iterable[Dict], swept_on: str, chunk_size: int = 5000) -> int:
+    """
+    Replace the overdue_loans table with `loans` in one transaction.
+
+    Loans are written in chunks of `chunk_size` as they are consumed, so the
+    input can be a stream. Readers keep seeing the previous sweep until the
+    transaction commits. Returns the number of loans written.
+    """
+    written = 0
+    with transaction() as conn:
+        conn.execute('DELETE FROM overdue_loans')
+        loans = iter(loans)
+        while True:
+            chunk = [(loan['id'], loan['patron_id'], loan['book_id'], loan['due_date'],
+                      loan['days_overdue'], loan['fee'], swept_on)
+                     for loan in itertools.islice(loans, chunk_size)]
+            if not chunk:
+                break
+            conn.executemany('''
+                INSERT INTO overdue_loans
+                    (loan_id, patron_id, book_id, due_date, days_overdue, fee, swept_on)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', chunk)
+            written += len(chunk)
+    return written
+
+def get_overdue_loans(after: int = 0, limit: int = 100, patron_id: Optional[str] = None) -> List[Dict]:
+    """Get a page of the last sweep's overdue loans with titles, in loan id order."""
+    conn = get_db_connection()
+    rows = conn.execute('''
+        SELECT o.loan_id, o.patron_id, o.book_id, b.title, o.due_date, o.days_overdue, o.fee
+        FROM overdue_loans o
+        JOIN books b ON b.id = o.book_id
+        WHERE o.loan_id > ? AND (? IS NULL OR o.patron_id = ?)
+        ORDER BY o.loan_id
+        LIMIT ?
+    ''', (after, patron_id, patron_id, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+def get_overdue_summary() -> Dict:
+    """Totals over the last sweep's overdue loans."""
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT COUNT(*) AS overdue_loans, COUNT(DISTINCT patron_id) AS patrons,
+               ROUND(COALESCE(SUM(fee), 0), 2) AS total_fees, MAX(swept_on) AS swept_on
+        FROM overdue_loans
+    ''').fetchone()
+    return dict(row)
+
+def get_circulation_days(first_day: int, last_day: int, book_id: Optional[int] = None,
+                         author: Optional[str] = None) -> List[Dict]:
+    """
+    Daily circulation counters for the epoch days first_day..last_day, library-wide
+    or for one book or author. Days without any activity are left out.
+    """
+    conn = get_db_connection()
+    if book_id is not None:
+        table, where, params = 'book_circulation_daily', 'AND book_id = ?', (book_id,)
+    elif author is not None:
+        table, where, params = 'author_circulation_daily', 'AND author = ?', (author,)
+    else:
+        table, where, params = 'circulation_daily', '', ()
+    rows = conn.execute(f'''
+        SELECT day, {", ".join(ROLLUP_COUNTERS)} FROM {table}
+        WHERE day BETWEEN ? AND ? {where}
+        ORDER BY day
+    ''', (first_day, last_day, *params)).fetchall()
+    return [dict(row) for row in rows]
+
+def get_top_borrowed_books(month: int, limit: int = 10) -> List[Dict]:
+    """The books borrowed most in a month (YYYYMM), with their counters that month."""
+    conn = get_db_connection()
+    rows = conn.execute(f'''
+        SELECT m.book_id, b.title, b.author, {", ".join(f"m.{c}" for c in ROLLUP_COUNTERS)}
+        FROM book_circulation_monthly m
+        JOIN books b ON b.id = m.book_id
+        WHERE m.month = ?
+        ORDER BY m.borrows DESC, m.book_id
+        LIMIT ?
+    ''', (month, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+def get_top_borrowed_authors(month: int, limit: int = 10) -> List[Dict]:
+    """The authors borrowed most in a month (YYYYMM), with their counters that month."""
+    conn = get_db_connection()
+    rows = conn.execute(f'''
+        SELECT author, {", ".join(ROLLUP_COUNTERS)}
+        FROM author_circulation_monthly
+        WHERE month = ?
+        ORDER BY borrows DESC, author
+        LIMIT ?
+    ''', (month, limit)).fetchall()
+    return [dict(row) for row in rows]
+
+def get_book_circulation(book_id: int, month: int) -> Optional[Dict]:
+    """A book's copy counts, all-time circulation counters and borrows in a month (YYYYMM)."""
+    conn = get_db_connection()
+    row = conn.execute(f'''
+        SELECT b.id AS book_id, b.title, b.author, b.total_copies, b.available_copies,
+               {", ".join(f"COALESCE(t.{c}, 0) AS {c}" for c in ROLLUP_COUNTERS)},
+               COALESCE(m.borrows, 0) AS month_borrows
+        FROM books b
+        LEFT JOIN book_circulation_totals t ON t.book_id = b.id
+        LEFT JOIN book_circulation_monthly m ON m.month = ? AND m.book_id = b.id
+        WHERE b.id = ?
+    ''', (month, book_id)).fetchone()
+    return dict(row) if row else None
+
+def get_patron_active_loans(patron_id: str, as_of_day: int,
+                            schedule: Dict[str, float]) -> Tuple[List[Dict], float]:
+    """
+    Get a patron's open loans with titles, days overdue and late fees, plus
+    the patron's total fees owed, in a single query.
+
+    Returns:
+        tuple: (loans ordered by due date, total_fees)
+    """
+    conn = get_db_connection()
+    rows = conn.execute(f'''
+        SELECT br.id, br.book_id, b.title, b.author, br.borrow_date, br.due_date,
+               br.days_overdue, {_late_fee_sql('br.days_overdue')} AS fee,
+               SUM({_late_fee_sql('br.days_overdue')}) OVER () AS total_fees
+        FROM (
+            SELECT *, MAX({_DAYS_OVERDUE_SQL}, 0) AS days_overdue
+            FROM borrow_records
+            WHERE patron_id = :patron_id AND return_date IS NULL
+        ) br
+        JOIN books b ON b.id = br.book_id
+        ORDER BY br.due_date, br.id
+    ''', dict(schedule, as_of_day=as_of_day, patron_id=patron_id)).fetchall()
+    loans = [dict(row) for row in rows]
+    total_fees = loans[0]['total_fees'] if loans else 0.0
+    for loan in loans:
+        del loan['total_fees']
+    return loans, round(total_fees, 2)
+
+def get_patron_borrow_history(patron_id: str, limit: int,
+                              before: Optional[Tuple[int, int]] = None) -> List[Dict]:
+    """
+    Get one page of a patron's borrowing history, newest first.
+
+    Keyset paginated: `before` is the (borrow_date, id) of the last record on
+    the previous page. Returned loans come from idx_borrow_records_history
+    and open loans from idx_borrow_records_active, so the cost of a page does
+    not grow with the length of the patron's history.
+    """
+    conn = get_db_connection()
+    params = {'patron_id': patron_id, 'limit': limit}
+    seek = ''
+    if before is not None:
+        seek = 'AND (borrow_date, id) < (:before_date, :before_id)'
+        params.update(before_date=before[0], before_id=before[1])
+    rows = conn.execute(f'''
+        SELECT h.id, h.book_id, b.title, b.author, h.borrow_date, h.due_date, h.return_date
+        FROM (
+            SELECT * FROM (
+                SELECT * FROM borrow_records
+                WHERE patron_id = :patron_id AND return_date IS NOT NULL {seek}
+                ORDER BY borrow_date DESC, id DESC LIMIT :limit
+            )
+            UNION ALL
+            SELECT * FROM borrow_records
+            WHERE patron_id = :patron_id AND return_date IS NULL {seek}
+            ORDER BY borrow_date DESC, id DESC LIMIT :limit
+        ) h
+        JOIN books b ON b.id = h.book_id
+        ORDER BY h.borrow_date DESC, h.id DESC
+    ''', params).fetchall()
+    return [dict(row) for row in rows]
+
+def get_patron_loan_fees(patron_id: str, as_of_day: int, schedule: Dict[str, float]) -> List[Dict]:
+    """
+    Every loan of a patron that has incurred a late fee, with the fee: open
+    loans charged up to `as_of_day`, returned loans up to their return day.
+    Ordered by due date.
+    """
+    conn = get_db_connection()
+    rows = conn.execute(f'''
+        SELECT id, book_id, due_date, return_date, days_overdue, {_late_fee_sql('days_overdue')} AS fee
+        FROM (
+            SELECT id, book_id, due_date, return_date,
+                   COALESCE(return_date / {SECONDS_PER_DAY}, :as_of_day) - due_date / {SECONDS_PER_DAY}
+                       AS days_overdue
+            FROM borrow_records
+            WHERE patron_id = :patron_id
+        )
+        WHERE days_overdue > 0
+        ORDER BY due_date, id
+    ''', dict(schedule, as_of_day=as_of_day, patron_id=patron_id)).fetchall()
+    return [dict(row) for row in rows]
+
+def get_paid_fees(loan_ids: List[int]) -> Dict[int, float]:
+    """Late fees already paid per loan, for those of the given loans with payments."""
+    if not loan_ids:
+        return {}
+    conn = get_db_connection()
+    placeholders = ','.join('?' * len(loan_ids))
+    rows = conn.execute(f'''
+        SELECT loan_id, SUM(amount) FROM fee_payments
+        WHERE loan_id IN ({placeholders}) GROUP BY loan_id
+    ''', list(loan_ids))
+    return {loan_id: amount for loan_id, amount in rows}
+
+def record_fee_payments(items: List[Dict], transaction_id: str, paid_at: datetime) -> None:
+    """
+    Record the per-loan amounts ({"loan_id", "amount"}) of a settled payment.
+    Recording the same transaction again changes nothing.
+    """
+    conn = get_db_connection()
+    conn.executemany('''
+        INSERT OR IGNORE INTO fee_payments (loan_id, transaction_id, amount, paid_at)
+        VALUES (?, ?, ?, ?)
+    ''', [(item['loan_id'], transaction_id, item['amount'], to_epoch(paid_at)) for item in items])
+    conn.commit()
+
 def get_patron_borrow_count(patron_id: str) -> int:
     """Get the number of books currently borrowed by a patron."""
     conn = get_db_connection()
@@ -137,9 +1295,58 @@ def get_patron_borrow_count(patron_id: str) -> int:
         SELECT COUNT(*) as count FROM borrow_records 
         WHERE patron_id = ? AND return_date IS NULL
     ''', (patron_id,)).fetchone()['count']
-    conn.close()
     return count
 
+def get_borrow_counts(after: int = 0) -> Tuple[int, Dict[int, int]]:
+    """
+    Count borrows per book among the borrow records with id above `after`.
+
+    Returns:
+        tuple: (highest borrow record id, {book_id: borrows}); pass the id
+               back as `after` to count only the borrows made since
+    """
+    conn = get_db_connection()
+    last = conn.execute('SELECT COALESCE(MAX(id), 0) FROM borrow_records').fetchone()[0]
+    if last <= after:
+        return last, {}
+    rows = conn.execute('''
+        SELECT book_id, COUNT(*) FROM borrow_records
+        WHERE id > ? AND id <= ? GROUP BY book_id
+    ''', (after, last))
+    return last, {book_id: count for book_id, count in rows}
+
+# Tables services.export_service can export; each has an INTEGER id primary key
+EXPORT_TABLES = ('books', 'borrow_records')
+
+def get_table_columns(table: str) -> List[Tuple[str, str, bool]]:
+    """(name, declared type, nullable) of each column of an exportable table, in order."""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f'Cannot export table: {table}')
+    conn = get_db_connection()
+    return [(row['name'], row['type'].upper(), not row['notnull'] and not row['pk'])
+            for row in conn.execute(f'PRAGMA table_info({table})')]
+
+def iter_table_chunks(table: str, after: int = 0, chunk_size: int = 50000) -> Iterator[List[sqlite3.Row]]:
+    """
+    Yield the rows of an exportable table with id above `after`, in id order,
+    as lists of at most `chunk_size` rows (columns as in get_table_columns).
+
+    Rows added after the call starts are left for the next export. Every chunk
+    is its own short query that seeks past the previous chunk's last id, so no
+    read transaction stays open across chunks to hold back WAL checkpoints.
+    """
+    columns = ', '.join(name for name, _, _ in get_table_columns(table))
+    conn = get_db_connection()
+    last = conn.execute(f'SELECT COALESCE(MAX(id), 0) FROM {table}').fetchone()[0]
+    while after < last:
+        rows = conn.execute(f'''
+            SELECT {columns} FROM {table} WHERE id > ? AND id <= ? ORDER BY id LIMIT ?
+        ''', (after, last, chunk_size)).fetchall()
+        if not rows:
+            return
+        yield rows
+        after = rows[-1]['id']
+
 def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
     """Insert a new book into the database."""
     conn = get_db_connection()
@@ -149,12 +1356,34 @@ def insert_book(title: str, author: str, isbn: str, total_copies: int, available
             VALUES (?, ?, ?, ?, ?)
         ''', (title, author, isbn, total_copies, available_copies))
         conn.commit()
-        conn.close()
+        book_cache.invalidate(isbn=isbn)
         return True
     except Exception as e:
-        conn.close()
+        conn.rollback()
         return False
 
+def insert_books_batch(books: List[Tuple[str, str, str, int, int]]) -> List[str]:
+    """
+    Insert many books in one transaction.
+
+    Args:
+        books: (title, author, isbn, total_copies, available_copies) tuples
+
+    Returns:
+        list: ISBNs that were skipped because they are already in the catalog
+    """
+    isbns = [book[2] for book in books]
+    with transaction() as conn:
+        placeholders = ', '.join('?' * len(isbns))
+        existing = {row['isbn'] for row in conn.execute(
+            f'SELECT isbn FROM books WHERE isbn IN ({placeholders})', isbns
+        )} if isbns else set()
+        conn.executemany('''
+            INSERT INTO books (title, author, isbn, total_copies, available_copies)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [book for book in books if book[2] not in existing])
+    return [isbn for isbn in isbns if isbn in existing]
+
 def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
     """Insert a new borrow record into the database."""
     conn = get_db_connection()
@@ -162,12 +1391,11 @@ def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, du
         conn.execute('''
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
-        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
+        ''', (patron_id, book_id, to_epoch(borrow_date), to_epoch(due_date)))
         conn.commit()
-        conn.close()
         return True
     except Exception as e:
-        conn.close()
+        conn.rollback()
         return False
 
 def update_book_availability(book_id: int, change: int) -> bool:
@@ -178,10 +1406,10 @@ def update_book_availability(book_id: int, change: int) -> bool:
             UPDATE books SET available_copies = available_copies + ? WHERE id = ?
         ''', (change, book_id))
         conn.commit()
-        conn.close()
+        book_cache.invalidate(book_id=book_id)
         return True
     except Exception as e:
-        conn.close()
+        conn.rollback()
         return False
 
 def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime) -> bool:
@@ -192,10 +1420,243 @@ def update_borrow_record_return_date(patron_id: str, book_id: int, return_date:
             UPDATE borrow_records 
             SET return_date = ? 
             WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
-        ''', (return_date.isoformat(), patron_id, book_id))
+        ''', (to_epoch(return_date), patron_id, book_id))
         conn.commit()
-        conn.close()
         return True
     except Exception as e:
-        conn.close()
+        conn.rollback()
         return False
+
+# Transactional borrow/return operations
+
+def borrow_book_transaction(patron_id: str, book_id: int, borrow_date: datetime,
+                            due_date: datetime, max_books: int) -> Tuple[str, Optional[Dict]]:
+    """
+    Atomically check availability and the patron's limit, record the loan and
+    decrement available copies.
+
+    Returns:
+        tuple: (status, book) where status is one of 'ok', 'not_found',
+        'unavailable', 'limit_reached', 'already_borrowed' or 'error'.
+    """
+    try:
+        with transaction() as conn:
+            book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
+            if not book:
+                return 'not_found', None
+            book = dict(book)
+            if book['available_copies'] <= 0:
+                return 'unavailable', book
+
+            active = conn.execute('''
+                SELECT COUNT(*) AS count, COALESCE(SUM(book_id = ?), 0) AS same_book
+                FROM borrow_records
+                WHERE patron_id = ? AND return_date IS NULL
+            ''', (book_id, patron_id)).fetchone()
+            if active['count'] >= max_books:
+                return 'limit_reached', book
+            if active['same_book']:
+                return 'already_borrowed', book
+
+            cursor = conn.execute('''
+                UPDATE books SET available_copies = available_copies - 1
+                WHERE id = ? AND available_copies > 0
+            ''', (book_id,))
+            if cursor.rowcount != 1:
+                return 'unavailable', book
+
+            conn.execute('''
+                INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+                VALUES (?, ?, ?, ?)
+            ''', (patron_id, book_id, to_epoch(borrow_date), to_epoch(due_date)))
+            return 'ok', book
+    except sqlite3.Error:
+        return 'error', None
+    finally:
+        book_cache.invalidate(book_id=book_id)
+
+def return_book_transaction(patron_id: str, book_id: int, return_date: datetime) -> str:
+    """
+    Atomically close the patron's active loan of a book and give the copy back.
+
+    Returns:
+        str: 'ok', 'not_borrowed' or 'error'.
+    """
+    try:
+        with transaction() as conn:
+            cursor = conn.execute('''
+                UPDATE borrow_records
+                SET return_date = ?
+                WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+            ''', (to_epoch(return_date), patron_id, book_id))
+            returned = cursor.rowcount
+            if returned == 0:
+                return 'not_borrowed'
+
+            conn.execute('''
+                UPDATE books SET available_copies = MIN(total_copies, available_copies + ?)
+                WHERE id = ?
+            ''', (returned, book_id))
+            return 'ok'
+    except sqlite3.Error:
+        return 'error'
+    finally:
+        book_cache.invalidate(book_id=book_id)
+
+def borrow_books_batch_transaction(patron_id: str, book_ids: List[int], borrow_date: datetime,
+                                   due_date: datetime, max_books: int) -> List[Tuple[str, Optional[Dict]]]:
+    """
+    Borrow several books for one patron in a single transaction.
+
+    The books and the patron's open loans are read once for the whole set,
+    then books are taken in order until the patron reaches `max_books`.
+
+    Returns:
+        list: one (status, book) pair per requested id, with the statuses of
+        borrow_book_transaction ('error' for every item if the transaction fails).
+    """
+    try:
+        with transaction() as conn:
+            placeholders = ','.join('?' * len(book_ids))
+            books = {row['id']: dict(row) for row in conn.execute(
+                f'SELECT * FROM books WHERE id IN ({placeholders})', book_ids)}
+            on_loan = {row['book_id'] for row in conn.execute(
+                'SELECT book_id FROM borrow_records WHERE patron_id = ? AND return_date IS NULL',
+                (patron_id,))}
+
+            results: List[Tuple[str, Optional[Dict]]] = []
+            for book_id in book_ids:
+                book = books.get(book_id)
+                if book is None:
+                    results.append(('not_found', None))
+                elif book['available_copies'] <= 0:
+                    results.append(('unavailable', book))
+                elif len(on_loan) >= max_books:
+                    results.append(('limit_reached', book))
+                elif book_id in on_loan:
+                    results.append(('already_borrowed', book))
+                else:
+                    # The write lock is held, so the copies read above are current
+                    book['available_copies'] -= 1
+                    on_loan.add(book_id)
+                    results.append(('ok', dict(book)))
+
+            borrowed = [book_id for book_id, (status, _) in zip(book_ids, results) if status == 'ok']
+            conn.executemany('''
+                UPDATE books SET available_copies = available_copies - 1
+                WHERE id = ?
+            ''', [(book_id,) for book_id in borrowed])
+            conn.executemany('''
+                INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+                VALUES (?, ?, ?, ?)
+            ''', [(patron_id, book_id, to_epoch(borrow_date), to_epoch(due_date)) for book_id in borrowed])
+            return results
+    except sqlite3.Error:
+        return [('error', None)] * len(book_ids)
+    finally:
+        for book_id in set(book_ids):
+            book_cache.invalidate(book_id=book_id)
+
+def return_books_batch_transaction(patron_id: str, book_ids: List[int], return_date: datetime) -> List[str]:
+    """
+    Return several books for one patron in a single transaction.
+
+    Returns:
+        list: 'ok' or 'not_borrowed' per requested id ('error' for every item
+        if the transaction fails).
+    """
+    try:
+        with transaction() as conn:
+            results = []
+            returned = []
+            for book_id in book_ids:
+                cursor = conn.execute('''
+                    UPDATE borrow_records
+                    SET return_date = ?
+                    WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+                ''', (to_epoch(return_date), patron_id, book_id))
+                if cursor.rowcount:
+                    results.append('ok')
+                    returned.append((cursor.rowcount, book_id))
+                else:
+                    results.append('not_borrowed')
+
+            conn.executemany('''
+                UPDATE books SET available_copies = MIN(total_copies, available_copies + ?)
+                WHERE id = ?
+            ''', returned)
+            return results
+    except sqlite3.Error:
+        return ['error'] * len(book_ids)
+    finally:
+        for book_id in set(book_ids):
+            book_cache.invalidate(book_id=book_id)
+
+# Background jobs (services.job_queue); payload and result are JSON text.
+# Job times are epoch seconds (to_epoch), like loan dates.
+
+def insert_job(kind: str, payload: str, run_after: Optional[int] = None) -> int:
+    """Queue a job and return its id."""
+    now = to_epoch(datetime.now())
+    conn = get_db_connection()
+    cursor = conn.execute('''
+        INSERT INTO jobs (kind, payload, run_after, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (kind, payload, run_after or now, now, now))
+    conn.commit()
+    return cursor.lastrowid
+
+def claim_job(lease_seconds: int) -> Optional[Dict]:
+    """
+    Mark the oldest runnable job as running and return it, or None.
+
+    Runnable means queued and due, or running with an expired lease (its
+    worker died). The lease is how long the caller has to finish the job
+    before another worker may take it over.
+    """
+    now = to_epoch(datetime.now())
+    with transaction() as conn:
+        rows = conn.execute('''
+            UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                            locked_until = :lease, updated_at = :now
+            WHERE id = (
+                SELECT id FROM jobs
+                WHERE status IN ('queued', 'running') AND run_after <= :now
+                  AND (status = 'queued' OR locked_until < :now)
+                ORDER BY run_after, id
+                LIMIT 1
+            )
+            RETURNING *
+        ''', {'now': now, 'lease': now + lease_seconds}).fetchall()
+    return dict(rows[0]) if rows else None
+
+def finish_job(job_id: int, status: str, result: Optional[str] = None, error: Optional[str] = None,
+               transaction_id: Optional[str] = None) -> None:
+    """Record a job's final status and outcome."""
+    conn = get_db_connection()
+    conn.execute('''
+        UPDATE jobs SET status = ?, result = ?, error = ?, transaction_id = ?,
+                        locked_until = NULL, updated_at = ?
+        WHERE id = ?
+    ''', (status, result, error, transaction_id, to_epoch(datetime.now()), job_id))
+    conn.commit()
+
+def requeue_job(job_id: int, run_after: int, error: str) -> None:
+    """Put a job that failed transiently back in the queue until `run_after`."""
+    conn = get_db_connection()
+    conn.execute('''
+        UPDATE jobs SET status = 'queued', run_after = ?, error = ?, locked_until = NULL, updated_at = ?
+        WHERE id = ?
+    ''', (run_after, error, to_epoch(datetime.now()), job_id))
+    conn.commit()
+
+def get_job(job_id: int) -> Optional[Dict]:
+    """Get a job by id."""
+    conn = get_db_connection()
+    row = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+    return dict(row) if row else None
+
+def count_pending_jobs() -> int:
+    """Number of jobs queued or running."""
+    conn = get_db_connection()
+    return conn.execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
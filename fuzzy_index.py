@@ -0,0 +1,325 @@
+"""
+Fuzzy search index for Library Management System
+Typo-tolerant title/author search over a trigram index of catalog words
+
+Titles and authors are split into words. Every distinct word is indexed by
+its trigrams (padded as in PostgreSQL's pg_trgm, so "orwell" has "  o",
+" or", "orw", ..., "ll "), and keeps a posting list of the books that
+contain it. A query word is matched against the vocabulary by counting
+shared trigrams, giving the similarity |shared| / |union| of every word it
+resembles ("gatsbey" ~ "gatsby" 0.50, "orwel" ~ "orwell" 0.62). A book
+scores the mean, over the query's words, of its best matching word.
+
+Only the vocabulary is scanned, never the catalog. Books are then taken from
+the posting lists in order of similarity, cheapest query word first, and
+scored exactly. Reading stops as soon as no book not yet seen could beat
+the current top results, so a single common word reads one chunk of its
+posting list rather than all of it. Words without letters (years, volume
+numbers) are left to the exact search.
+
+Like the catalog snapshot, the index is held per process and brought up to
+date before each search from the book_changes counter, applying just the
+books inserted or changed since. A retitled book is re-indexed without
+removing it from its old words' posting lists (it no longer scores for
+them); the index is rebuilt once such stale entries pile up.
+
+Configuration (environment variables):
+    FUZZY_THRESHOLD=F       minimum similarity of a result, 0-1 (default 0.3)
+    FUZZY_SEARCH_LIMIT=N    maximum number of results (default 50)
+"""
+
+import heapq
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import repeat
+from operator import add, itemgetter
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import database
+
+FUZZY_THRESHOLD = float(os.getenv('FUZZY_THRESHOLD', '0.3'))
+FUZZY_SEARCH_LIMIT = int(os.getenv('FUZZY_SEARCH_LIMIT', '50'))
+
+_FIELDS = ('title', 'author')
+# Words with at least one letter
+_WORD = re.compile(r'\w*[^\W\d_]\w*')
+# Posting list entries read between checks for an early stop
+_CHUNK = 256
+# Query words matching at most this many posting list entries are scored by lookup
+_LOOKUP_POSTINGS = 100000
+
+
+def words(text: str) -> List[str]:
+    """Distinct lowercased words of `text` that contain a letter."""
+    return list(dict.fromkeys(_WORD.findall(text.lower())))
+
+
+def trigrams(word: str) -> set:
+    """Trigrams of a lowercased word, padded with two spaces in front and one behind."""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: set, b: set) -> float:
+    """Trigram similarity of two words: shared trigrams over all their trigrams."""
+    shared = len(a & b)
+    return shared / (len(a) + len(b) - shared) if shared else 0.0
+
+
+class FuzzyIndex:
+    """Trigram index over the words of book titles and authors, for one database file."""
+
+    def __init__(self, database_path: Optional[str] = None):
+        self.database = database_path
+        self.version = 0
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.version = 0
+        # Books by position, ids ascending; text_hash tells title/author changes from copy count changes
+        self.ids = array('q')
+        self.text_hash = array('q')
+        self.live = bytearray()
+        # Positions re-indexed after a title/author change (still in their old words' posting lists)
+        self.retitled: Set[int] = set()
+        # Per position, its slice of book_words: word id << 1 | field index
+        self.word_start = array('q')
+        self.word_count = array('H')
+        self.book_words = array('i')
+        # Vocabulary: word -> word id, and per word id its trigram count
+        self.word_ids: Dict[str, int] = {}
+        self.vocabulary: List[str] = []
+        self.trigram_counts = array('H')
+        # trigram -> ids of the words containing it
+        self.trigram_words: Dict[str, array] = {}
+        # field -> per word id, positions of the books with that word in the field
+        self.postings: Dict[str, List[array]] = {field: [] for field in _FIELDS}
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.live.count(0)
+
+    def _add_word(self, word: str) -> int:
+        word_id = self.word_ids[word] = len(self.vocabulary)
+        self.vocabulary.append(word)
+        grams = trigrams(word)
+        self.trigram_counts.append(len(grams))
+        for gram in grams:
+            self.trigram_words.setdefault(gram, array('i')).append(word_id)
+        for postings in self.postings.values():
+            postings.append(array('i'))
+        return word_id
+
+    def _index(self, pos: int, title: str, author: str) -> None:
+        start = len(self.book_words)
+        for field, text in enumerate((title, author)):
+            postings = self.postings[_FIELDS[field]]
+            for word in words(text):
+                word_id = self.word_ids.get(word)
+                if word_id is None:
+                    word_id = self._add_word(word)
+                postings[word_id].append(pos)
+                self.book_words.append(word_id << 1 | field)
+        count = min(len(self.book_words) - start, 0xFFFF)
+        if pos == len(self.word_start):
+            self.word_start.append(start)
+            self.word_count.append(count)
+        else:
+            self.word_start[pos] = start
+            self.word_count[pos] = count
+
+    def _append(self, book_id: int, title: str, author: str) -> None:
+        self.ids.append(book_id)
+        self.text_hash.append(hash((title, author)))
+        self.live.append(1)
+        self._index(len(self.ids) - 1, title, author)
+
+    def refresh(self) -> int:
+        """
+        Bring the index up to date with the database.
+
+        Returns:
+            int: the number of changed books applied
+        """
+        with self._lock:
+            if self.database != database.DATABASE:
+                self.database = database.DATABASE
+                self._reset()
+            latest = database.get_catalog_version()
+            if latest == self.version:
+                return 0
+            if self.version == 0 or latest < self.version:
+                return self._load()
+            return self._apply_changes()
+
+    def _load(self) -> int:
+        self._reset()
+        for seq, book_id, title, author, isbn, total, available in database.iter_book_changes(0):
+            self._append(book_id, title, author)
+            self.version = max(self.version, seq)
+        return len(self.ids)
+
+    def _apply_changes(self) -> int:
+        changes = list(database.iter_book_changes(self.version))
+        for seq, book_id, title, author, isbn, total, available in changes:
+            pos = bisect_left(self.ids, book_id)
+            if pos < len(self.ids) and self.ids[pos] == book_id:
+                if title is None:
+                    self.live[pos] = 0
+                elif hash((title, author)) != self.text_hash[pos] or not self.live[pos]:
+                    self.text_hash[pos] = hash((title, author))
+                    self.live[pos] = 1
+                    self._index(pos, title, author)
+                    self.retitled.add(pos)
+            elif title is not None:
+                if self.ids and book_id < self.ids[-1]:
+                    # New ids are appended in ascending order; an older one needs a full reload
+                    return self._load()
+                self._append(book_id, title, author)
+        if len(self.retitled) > max(1000, len(self.ids) // 10):
+            return self._load()
+        self.version = changes[-1][0] if changes else self.version
+        return len(changes)
+
+    def similar_words(self, word: str, threshold: float) -> Dict[int, float]:
+        """Word id -> similarity of every indexed word at least `threshold` similar to `word`."""
+        grams = trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            word_ids = self.trigram_words.get(gram)
+            if word_ids is not None:
+                shared.update(word_ids)
+        counts = self.trigram_counts
+        matches = {}
+        for word_id, n in shared.items():
+            score = n / (len(grams) + counts[word_id] - n)
+            if score >= threshold:
+                matches[word_id] = score
+        return matches
+
+    def search(self, term: str, fields: Tuple[str, ...] = _FIELDS, threshold: float = FUZZY_THRESHOLD,
+               limit: int = FUZZY_SEARCH_LIMIT) -> List[Tuple[int, float]]:
+        """
+        (book id, similarity) of the (up to) `limit` best matches for `term`,
+        best first. Books of equal similarity come in index order.
+        """
+        query = words(term)
+        if not query or limit <= 0:
+            return []
+        with self._lock:
+            matches = [self.similar_words(word, threshold) for word in query]
+            # Per query word, matching words best first; cheapest query word first
+            streams = [sorted(((score, word_id) for word_id, score in m.items()), reverse=True) for m in matches]
+            postings = [self.postings[field] for field in fields]
+            costs = [sum(len(p[word_id]) for _, word_id in stream for p in postings) for stream in streams]
+            order = sorted(range(len(query)), key=costs.__getitem__)
+            score_books = self._scorer(matches, streams, costs, fields)
+            # Similarity of the next unread word per query word: bounds the score of any unseen book
+            frontier = [stream[0][0] if stream else 0.0 for stream in streams]
+            scores: Dict[int, float] = {}
+            top: List[float] = []
+            live = self.live
+
+            def add(positions: Iterable[int]) -> None:
+                new = list(dict.fromkeys(pos for pos in positions if pos not in scores and live[pos]))
+                values = score_books(new)
+                scores.update(zip(new, values))
+                for value in values:
+                    if len(top) < limit:
+                        heapq.heappush(top, value)
+                    elif value > top[0]:
+                        heapq.heapreplace(top, value)
+
+            # Books with every query word's best match score the most possible: score them first
+            if len(query) > 1 and all(streams):
+                common = set().union(*(p[streams[order[0]][0][1]] for p in postings))
+                for i in order[1:]:
+                    word_id = streams[i][0][1]
+                    common = set().union(*(common.intersection(p[word_id]) for p in postings))
+                add(sorted(common))
+            for i in order:
+                for score, word_id in streams[i]:
+                    frontier[i] = score
+                    for field_postings in postings:
+                        posting = field_postings[word_id]
+                        for chunk in range(0, len(posting), _CHUNK):
+                            add(posting[chunk:chunk + _CHUNK])
+                            bound = sum(frontier) / len(query)
+                            if bound < threshold or (len(top) == limit and top[0] >= bound):
+                                return self._ranked(scores, threshold, limit)
+                frontier[i] = 0.0
+            return self._ranked(scores, threshold, limit)
+
+    def _scorer(self, matches: List[Dict[int, float]], streams: List[List[Tuple[float, int]]],
+                costs: List[int], fields: Tuple[str, ...]) -> Callable[[List[int]], List[float]]:
+        # Exact scores of the books at a list of positions: mean best similarity per query word.
+        # A query word whose matching words have short posting lists is scored by a lookup in
+        # position -> best similarity; others, and retitled books, from the book's own words.
+        n = len(matches)
+        zeros = repeat(0.0)
+        field_mask = sum(1 << _FIELDS.index(field) for field in fields)
+        lookups, by_words = [], []
+        for m, stream, cost in zip(matches, streams, costs):
+            if cost > _LOOKUP_POSTINGS:
+                by_words.append(m)
+                continue
+            best: Dict[int, float] = {}
+            for score, word_id in reversed(stream):
+                for field in fields:
+                    best.update(dict.fromkeys(self.postings[field][word_id], score))
+            lookups.append(best)
+
+        def from_words(pos: int, word_matches: List[Dict[int, float]]) -> float:
+            start = self.word_start[pos]
+            entries = self.book_words[start:start + self.word_count[pos]]
+            word_ids = [entry >> 1 for entry in entries if field_mask >> (entry & 1) & 1]
+            if not word_ids:
+                return 0.0
+            return sum([max(map(m.get, word_ids, zeros)) for m in word_matches])
+
+        def score(positions: List[int]) -> List[float]:
+            totals = [0.0] * len(positions)
+            for best in lookups:
+                totals = list(map(add, totals, map(best.get, positions, zeros)))
+            if by_words:
+                totals = [total + from_words(pos, by_words) for total, pos in zip(totals, positions)]
+            if self.retitled and not self.retitled.isdisjoint(positions):
+                totals = [from_words(pos, matches) if pos in self.retitled else total
+                          for total, pos in zip(totals, positions)]
+            return [total / n for total in totals]
+        return score
+
+    def _ranked(self, scores: Dict[int, float], threshold: float, limit: int) -> List[Tuple[int, float]]:
+        best = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+        return [(self.ids[pos], score) for pos, score in best if score >= threshold]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'books': len(self), 'words': len(self.vocabulary), 'version': self.version}
+
+
+index = FuzzyIndex()
+
+
+def fuzzy_search(term: str, fields: Tuple[str, ...] = _FIELDS, threshold: Optional[float] = None,
+                 limit: Optional[int] = None) -> List[Dict]:
+    """
+    Typo-tolerant search over titles and authors.
+
+    Returns:
+        list: up to `limit` books at least `threshold` similar to the term,
+              best match first (then title), each with its 'similarity'
+    """
+    threshold = FUZZY_THRESHOLD if threshold is None else threshold
+    limit = FUZZY_SEARCH_LIMIT if limit is None else limit
+    index.refresh()
+    matches = dict(index.search(term, fields, threshold, limit))
+    books = database.get_books_by_ids(list(matches))
+    for book in books:
+        book['similarity'] = round(matches[book['id']], 3)
+    books.sort(key=lambda book: (-book['similarity'], book['title'], book['id']))
+    return books
@@ -0,0 +1,32 @@
+"""
+Gunicorn configuration (read automatically from the working directory)
+
+The master prepares the database once, before any worker is forked, and with
+preload_app (on by default) also imports and builds the app once. Each worker
+then starts as a fork of a ready application instead of importing Flask,
+compiling the URL map and checking the schema itself, so adding workers
+during a traffic spike (more -w, or `kill -TTIN <master>`) is fast.
+`python -m benchmarks.bench_startup` measures the difference.
+
+Environment:
+    GUNICORN_PRELOAD=0    build the app separately in every worker
+"""
+
+import os
+
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') != '0'
+
+
+def on_starting(server):
+    # Once, in the master. With preload_app create_app() has already done this
+    # and it is a version check; without it, workers then find nothing to do.
+    import database
+    database.prepare_database(sample_data=not os.getenv('SKIP_SAMPLE_DATA'))
+    database.close_all_connections()
+
+
+def pre_fork(server, worker):
+    # SQLite connections must not be shared across fork(): close the master's
+    # pooled connections so each worker opens its own
+    import database
+    database.close_all_connections()
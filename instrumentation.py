@@ -0,0 +1,362 @@
+"""
+Instrumentation module for Library Management System
+Per-request timings, Prometheus metrics and opt-in profiling of slow requests
+
+Every request is broken down into time spent in SQL statements, in service
+functions (decorated with @timed) and in template rendering. The breakdown is
+returned in a Server-Timing header and aggregated into process-wide metrics
+served as Prometheus text at /metrics. Each thread records into its own
+metric store, so requests never wait for one another to record a timing;
+the stores are merged when /metrics is read.
+
+Configuration (environment variables):
+    METRICS_ENABLED=1             turn instrumentation on (off by default)
+    PROFILE_SLOW_REQUESTS_MS=N    profile requests and keep profiles of those slower than N ms
+    PROFILE_SAMPLE_RATE=F         fraction of requests to profile (default 1.0)
+    PROFILE_DIR=path              where slow-request profiles are written (default profiles/)
+"""
+
+import functools
+import io
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Tuple
+
+from flask import Flask, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+
+import database
+import response_cache
+
+if TYPE_CHECKING:
+    import cProfile
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+MAX_SQL_LABEL_LENGTH = 120
+# A parenthesised list of two or more "?" placeholders, as in "IN (?, ?, ?)"
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+
+_enabled = False
+
+
+class _Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+    def merge(self, other: '_Histogram') -> None:
+        for labels, (buckets, total, count) in other.series.items():
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            series[0] = [a + b for a, b in zip(series[0], buckets)]
+            series[1] += total
+            series[2] += count
+
+
+class _Summary:
+    """Count and sum of observations keyed by a tuple of label values."""
+
+    def __init__(self):
+        self.series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        series = self.series.setdefault(labels, [0.0, 0])
+        series[0] += value
+        series[1] += 1
+
+    def merge(self, other: '_Summary') -> None:
+        for labels, (total, count) in other.series.items():
+            series = self.series.setdefault(labels, [0.0, 0])
+            series[0] += total
+            series[1] += count
+
+
+class _Store:
+    """
+    One thread's metrics.
+
+    Only the owning thread records into a store, so its lock is uncontended
+    except while /metrics merges the stores.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = _Histogram(REQUEST_BUCKETS)
+        self.sql = _Summary()
+        self.services = _Summary()
+        self.templates = _Summary()
+        self.profiled = 0
+
+    def merge(self, other: '_Store') -> None:
+        self.requests.merge(other.requests)
+        self.sql.merge(other.sql)
+        self.services.merge(other.services)
+        self.templates.merge(other.templates)
+        self.profiled += other.profiled
+
+
+class Metrics:
+    """Process-wide metrics, kept in one store per thread and merged when read."""
+
+    def __init__(self):
+        self._lock = threading.Lock()  # guards the list of stores
+        self._local = threading.local()
+        self._stores: List[Tuple[threading.Thread, _Store]] = []
+        # Totals of threads that have exited
+        self._retired = _Store()
+
+    def thread_store(self) -> _Store:
+        """The calling thread's store."""
+        store = getattr(self._local, 'store', None)
+        if store is None:
+            store = self._local.store = _Store()
+            with self._lock:
+                self._stores.append((threading.current_thread(), store))
+        return store
+
+    def snapshot(self) -> _Store:
+        """All threads' metrics merged into one store."""
+        merged = _Store()
+        with self._lock:
+            live = []
+            for thread, store in self._stores:
+                if thread.is_alive():
+                    live.append((thread, store))
+                else:
+                    self._retired.merge(store)
+            self._stores = live
+            merged.merge(self._retired)
+            for _, store in live:
+                with store.lock:
+                    merged.merge(store)
+        return merged
+
+    def reset(self) -> None:
+        self.__init__()
+
+
+metrics = Metrics()
+
+
+def _normalize_sql(sql: str) -> str:
+    # One label per statement shape, however many values an IN list binds
+    sql = _PLACEHOLDER_LIST.sub('(?, ...)', ' '.join(sql.split()))
+    return sql if len(sql) <= MAX_SQL_LABEL_LENGTH else sql[:MAX_SQL_LABEL_LENGTH - 3] + '...'
+
+
+def _observe(kind: str, labels: Tuple[str, ...], seconds: float) -> None:
+    store = metrics.thread_store()
+    with store.lock:
+        getattr(store, kind).observe(labels, seconds)
+
+
+def _record(kind: str, label: str, seconds: float) -> None:
+    """Add a timing to the current request's breakdown and to the process metrics."""
+    _observe(kind, (label,), seconds)
+    if has_request_context():
+        breakdown = g.get('_timings')
+        if breakdown is not None:
+            breakdown[kind][0] += seconds
+            breakdown[kind][1] += 1
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Connection that times every execute/executemany call.
+
+    SQLite's trace callback reports statements as they start but exposes no
+    duration, so statements are timed around the call instead.
+    """
+
+    def execute(self, sql, *args):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            if _enabled:
+                _record('sql', _normalize_sql(sql), time.perf_counter() - start)
+
+    def executemany(self, sql, *args):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            if _enabled:
+                _record('sql', _normalize_sql(sql), time.perf_counter() - start)
+
+
+def timed(fn: Callable) -> Callable:
+    """Record the duration of each call to a service function."""
+    label = f'{fn.__module__}.{fn.__qualname__}'
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return fn(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _record('services', label, time.perf_counter() - start)
+
+    return wrapper
+
+
+# Request hooks
+
+def _before_request() -> None:
+    g._timings = {'sql': [0.0, 0], 'services': [0.0, 0], 'templates': [0.0, 0]}
+    g._request_start = time.perf_counter()
+    threshold = os.getenv('PROFILE_SLOW_REQUESTS_MS')
+    if threshold and random.random() < float(os.getenv('PROFILE_SAMPLE_RATE', '1.0')):
+        # Imported on first use: profiling is off unless configured, and
+        # every worker process would otherwise pay for the import at startup
+        import cProfile
+        g._profiler = cProfile.Profile()
+        g._profiler.enable()
+
+
+def _after_request(response):
+    start = g.get('_request_start')
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    profiler = g.pop('_profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _save_profile_if_slow(profiler, elapsed)
+
+    endpoint = request.endpoint or 'unknown'
+    _observe('requests', (endpoint, request.method, str(response.status_code)), elapsed)
+
+    timings = g._timings
+    response.headers['Server-Timing'] = ', '.join([
+        f'db;dur={timings["sql"][0] * 1000:.3f};desc="{timings["sql"][1]} statements"',
+        f'svc;dur={timings["services"][0] * 1000:.3f}',
+        f'tpl;dur={timings["templates"][0] * 1000:.3f}',
+        f'total;dur={elapsed * 1000:.3f}',
+    ])
+    return response
+
+
+def observe_request(endpoint: str, method: str, status: int, seconds: float) -> None:
+    """Record a request served outside Flask (the async API) in the request metrics."""
+    if _enabled:
+        _observe('requests', (endpoint, method, str(status)), seconds)
+
+
+def _save_profile_if_slow(profiler: 'cProfile.Profile', elapsed: float) -> None:
+    if elapsed * 1000 < float(os.getenv('PROFILE_SLOW_REQUESTS_MS', '0')):
+        return
+    directory = os.getenv('PROFILE_DIR', 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    name = re.sub(r'[^A-Za-z0-9_.-]', '_', request.endpoint or 'unknown')
+    path = os.path.join(directory, f'{time.strftime("%Y%m%d-%H%M%S")}-{int(elapsed * 1000)}ms-{name}.prof')
+    profiler.dump_stats(path)
+    store = metrics.thread_store()
+    with store.lock:
+        store.profiled += 1
+
+    import pstats
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(15)
+    from flask import current_app
+    current_app.logger.warning('Slow request %s %s took %.1f ms, profile saved to %s\n%s',
+                               request.method, request.path, elapsed * 1000, path, out.getvalue())
+
+
+def _on_before_render(sender, template, context, **extra) -> None:
+    if has_request_context():
+        g.setdefault('_template_starts', []).append(time.perf_counter())
+
+
+def _on_rendered(sender, template, context, **extra) -> None:
+    if has_request_context() and g.get('_template_starts'):
+        _record('templates', template.name or 'unknown', time.perf_counter() - g._template_starts.pop())
+
+
+def init_app(app: Flask) -> None:
+    """Install the instrumentation hooks on an app (no-op unless METRICS_ENABLED=1)."""
+    global _enabled
+    _enabled = os.getenv('METRICS_ENABLED', '0') == '1'
+    if not _enabled:
+        return
+    if database.connection_factory is not InstrumentedConnection:
+        # Pooled connections opened from now on are timed
+        database.connection_factory = InstrumentedConnection
+        database.close_all_connections()
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    before_render_template.connect(_on_before_render, app)
+    template_rendered.connect(_on_rendered, app)
+
+
+# Prometheus text exposition
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}'
+
+
+def _summary_lines(name: str, help_text: str, label: str, summary: _Summary) -> List[str]:
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} summary']
+    for labels, (total, count) in sorted(summary.series.items()):
+        lines.append(f'{name}_sum{_labels((label,), labels)} {total:.6f}')
+        lines.append(f'{name}_count{_labels((label,), labels)} {count}')
+    return lines
+
+
+def render_prometheus() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    names = ('endpoint', 'method', 'status')
+    name = 'library_request_duration_seconds'
+    merged = metrics.snapshot()
+    lines = [f'# HELP {name} Request latency by endpoint.', f'# TYPE {name} histogram']
+    for labels, (buckets, total, count) in sorted(merged.requests.series.items()):
+        for bound, value in zip(merged.requests.buckets, buckets):
+            le = f'le="{bound}"'
+            lines.append(f'{name}_bucket{_labels(names, labels, le)} {value}')
+        le = 'le="+Inf"'
+        lines.append(f'{name}_bucket{_labels(names, labels, le)} {count}')
+        lines.append(f'{name}_sum{_labels(names, labels)} {total:.6f}')
+        lines.append(f'{name}_count{_labels(names, labels)} {count}')
+    lines += _summary_lines('library_sql_statement_duration_seconds',
+                            'Time spent executing SQL statements.', 'statement', merged.sql)
+    lines += _summary_lines('library_service_call_duration_seconds',
+                            'Time spent in service functions.', 'function', merged.services)
+    lines += _summary_lines('library_template_render_duration_seconds',
+                            'Time spent rendering templates.', 'template', merged.templates)
+    lines += ['# HELP library_slow_request_profiles_total Slow-request profiles written.',
+              '# TYPE library_slow_request_profiles_total counter',
+              f'library_slow_request_profiles_total {merged.profiled}']
+
+    for cache, stats in (('book', database.get_book_cache_stats()),
+                         ('response', response_cache.get_response_cache_stats())):
+        for key, value in stats.items():
+            kind = 'gauge' if key == 'size' else 'counter'
+            metric = f'library_{cache}_cache_{key}' + ('' if kind == 'gauge' else '_total')
+            lines += [f'# TYPE {metric} {kind}', f'{metric} {value}']
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,183 @@
+"""
+HTTP response caching for Library Management System
+Catalog validators, conditional GET and a cache of rendered responses
+
+The catalog and search pages depend on nothing but the books table (and
+their query arguments), so the book_changes counter, which every insert,
+update and delete of a book advances across all processes, serves as their
+version. Responses carry an ETag derived from it and a Last-Modified of when
+that change was made (book_changes.changed_at); a request whose If-None-Match still matches gets
+an empty 304, so browsers and CDNs revalidate instead of downloading again.
+
+Rendered responses are also kept in a bounded LRU, keyed by path and the
+query arguments the view reads. Each entry records the catalog version it
+was rendered at and is a miss once the catalog has changed, so a write in
+any worker invalidates it without any coordination.
+
+Pages that show flashed messages are only cached when no message is pending
+for the session, and are marked private so shared caches do not keep them.
+
+Configuration (environment variables):
+    RESPONSE_CACHE_SIZE=N        rendered responses kept per process (default 512, 0: off)
+    RESPONSE_CACHE_MAX_AGE=N     seconds clients may reuse a response unchecked (default 0: always revalidate)
+    ETAG_SALT=text               mixed into every ETag; change it on deploys that change responses
+"""
+
+import functools
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional, Sequence, Tuple
+
+from flask import Response, current_app, make_response, request, session
+from werkzeug.http import http_date, parse_etags
+
+import database
+
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '512'))
+RESPONSE_CACHE_MAX_AGE = int(os.getenv('RESPONSE_CACHE_MAX_AGE', '0'))
+ETAG_SALT = os.getenv('ETAG_SALT', '')
+
+
+class Validators(NamedTuple):
+    version: int
+    etag: str
+    last_modified: Optional[int]
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of rendered responses.
+
+    Every entry is stored with the catalog version it was rendered at; a
+    lookup with any other version is a miss and drops the entry.
+    """
+
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: 'OrderedDict[Tuple, Tuple[int, object]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Tuple, version: int) -> Optional[object]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    del self._entries[key]
+                    self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Tuple, version: int, value: object) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+response_cache = ResponseCache()
+
+
+def current_validators() -> Validators:
+    """ETag and Last-Modified for the catalog as it is now."""
+    version, changed_at = database.get_catalog_change()
+    tag = f'{database.SCHEMA_VERSION}-{version}' + (f'-{ETAG_SALT}' if ETAG_SALT else '')
+    return Validators(version, tag, changed_at)
+
+
+def not_modified(if_none_match: Optional[str], validators: Validators) -> bool:
+    """True if an If-None-Match header value matches the current ETag."""
+    return bool(if_none_match) and parse_etags(if_none_match).contains_weak(validators.etag)
+
+
+def validator_headers(validators: Validators, public: bool = True) -> Dict[str, str]:
+    """ETag, Cache-Control and (when the change time is known) Last-Modified headers for a cacheable response."""
+    freshness = f'max-age={RESPONSE_CACHE_MAX_AGE}' if RESPONSE_CACHE_MAX_AGE > 0 else 'no-cache'
+    headers = {
+        'ETag': f'"{validators.etag}"',
+        'Cache-Control': f"{'public' if public else 'private'}, {freshness}",
+    }
+    if validators.last_modified is not None:
+        headers['Last-Modified'] = http_date(validators.last_modified)
+    return headers
+
+
+def cache_key(path: str, values: Sequence[Optional[str]]) -> Tuple:
+    """Response cache key for a path and the query argument values its view reads."""
+    return (database.DATABASE, path, *values)
+
+
+def _flashes_pending() -> bool:
+    # Only look at the session when the client sent one: reading it adds Vary: Cookie
+    cookie = current_app.config['SESSION_COOKIE_NAME']
+    return cookie in request.cookies and bool(session.get('_flashes'))
+
+
+def catalog_response(*key_args: str, public: bool = True) -> Callable:
+    """
+    Decorate a GET view whose response depends only on the books table and
+    the query arguments `key_args`.
+
+    Adds catalog validators, answers a matching If-None-Match with 304 and
+    serves repeat requests from the response cache. Responses other than
+    200, and requests that flash a message or have one pending, bypass both.
+
+    Args:
+        key_args: query arguments that select the response
+        public: whether shared caches (CDNs) may store the response
+    """
+    def decorate(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if _flashes_pending():
+                return view(*args, **kwargs)
+            validators = current_validators()
+            headers = validator_headers(validators, public)
+            if not_modified(request.headers.get('If-None-Match'), validators):
+                return Response(status=304, headers=headers)
+
+            key = cache_key(request.path, [request.args.get(name) for name in key_args])
+            cached = response_cache.get(key, validators.version)
+            if cached is not None:
+                body, content_type = cached
+                return Response(body, content_type=content_type, headers=headers)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.is_streamed or session.modified:
+                return response
+            response_cache.put(key, validators.version, (response.get_data(), response.content_type))
+            response.headers.update(headers)
+            return response
+        return wrapper
+    return decorate
+
+
+def get_response_cache_stats() -> Dict[str, int]:
+    """Hit/miss/eviction/invalidation counters for the response cache."""
+    return response_cache.stats()
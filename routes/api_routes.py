@@ -2,8 +2,25 @@
 API Routes - JSON API endpoints
 """
 
-from flask import Blueprint, jsonify, request
-from services.library_service import calculate_late_fee_for_book, search_books_in_catalog
+import io
+import json
+from flask import Blueprint, Response, jsonify, request, stream_with_context, url_for
+import sharding
+from database import iter_books
+from response_cache import catalog_response
+from services.library_service import (
+    calculate_late_fee_for_book, search_books_in_catalog,
+    borrow_books_by_patron, return_books_by_patron,
+    get_catalog_page, decode_catalog_cursor, CATALOG_PAGE_SIZE,
+    get_patron_status_report, PATRON_HISTORY_PAGE_SIZE,
+    get_overdue_report, OVERDUE_PAGE_SIZE,
+    get_suggestions, SUGGEST_LIMIT
+)
+from services.job_queue import submit_fee_payment, submit_refund, get_job_status
+from services.analytics_service import (
+    get_daily_circulation, get_most_borrowed, get_title_utilisation, STATS_TOP_LIMIT
+)
+from services.import_service import import_books, read_book_rows, FORMATS as IMPORT_FORMATS
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -16,7 +33,44 @@ def get_late_fee(patron_id, book_id):
     result = calculate_late_fee_for_book(patron_id, book_id)
     return jsonify(result), 501 if 'not implemented' in result.get('status', '') else 200
 
+def _batch_request():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object with patron_id and book_ids')
+    return str(data.get('patron_id') or ''), data.get('book_ids')
+
+@api_bp.route('/borrow/batch', methods=['POST'])
+def borrow_batch_api():
+    """
+    Borrow a stack of books for one patron in one transaction.
+    Batch interface for R3: Book Borrowing (self-checkout kiosks)
+
+    Body: {"patron_id": "123456", "book_ids": [1, 2, 3]}
+    Returns the number borrowed and a result per book.
+    """
+    try:
+        patron_id, book_ids = _batch_request()
+        return jsonify(borrow_books_by_patron(patron_id, book_ids))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@api_bp.route('/return/batch', methods=['POST'])
+def return_batch_api():
+    """
+    Return a stack of books for one patron in one transaction.
+    Batch interface for R4: Book Return Processing (self-checkout kiosks)
+
+    Body: {"patron_id": "123456", "book_ids": [1, 2, 3]}
+    Returns the number returned and a result per book.
+    """
+    try:
+        patron_id, book_ids = _batch_request()
+        return jsonify(return_books_by_patron(patron_id, book_ids))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 @api_bp.route('/search')
+@catalog_response('q', 'type')
 def search_books_api():
     """
     Search for books via API endpoint.
@@ -37,3 +91,307 @@ def search_books_api():
         'results': books,
         'count': len(books)
     })
+
+@api_bp.route('/suggest')
+@catalog_response('q', 'limit')
+def suggest_api():
+    """
+    Autocomplete suggestions as a patron types into the search box.
+
+    Query parameters:
+        q: text typed so far (title/author words or ISBN digits)
+        limit: number of suggestions, at most SUGGEST_LIMIT
+    """
+    text = request.args.get('q', '')
+    limit = request.args.get('limit', SUGGEST_LIMIT, type=int)
+    suggestions = get_suggestions(text, limit)
+    return jsonify({'query': text, 'suggestions': suggestions, 'count': len(suggestions)})
+
+@api_bp.route('/books')
+def list_books_api():
+    """
+    Page through the catalog in title order.
+    API interface for R2: Book Catalog Display
+
+    Query parameters:
+        cursor: next_cursor from the previous page (omit for the first page)
+        limit: page size
+        stream: if set, stream every book from the cursor on as JSON lines
+    """
+    cursor = request.args.get('cursor', '').strip() or None
+    try:
+        if request.args.get('stream'):
+            after = decode_catalog_cursor(cursor)
+            rows = (json.dumps(book) + '\n' for book in iter_books(after))
+            return Response(stream_with_context(rows), mimetype='application/x-ndjson')
+        limit = request.args.get('limit', CATALOG_PAGE_SIZE, type=int)
+        page = get_catalog_page(cursor, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'books': page['books'],
+        'count': len(page['books']),
+        'next_cursor': page['next_cursor']
+    })
+
+@api_bp.route('/books/bulk', methods=['POST'])
+def bulk_import_books_api():
+    """
+    Bulk import books from a JSON array, CSV or JSON Lines request body.
+    Batch interface for R1: Add Book To Catalog
+
+    The body format comes from the `format` query parameter (csv/jsonl) or the
+    Content-Type (application/json, text/csv, application/x-ndjson).
+    Returns the per-row import report.
+    """
+    if request.is_json:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            return jsonify({'error': 'Expected a JSON array of books'}), 400
+        report = import_books(enumerate(rows, start=1))
+        return jsonify(report)
+
+    fmt = request.args.get('format') or {
+        'text/csv': 'csv',
+        'application/x-ndjson': 'jsonl',
+        'application/jsonl': 'jsonl',
+    }.get(request.mimetype)
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({'error': 'Unsupported import format'}), 415
+
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+    return jsonify(import_books(read_book_rows(stream, fmt)))
+
+@api_bp.route('/patron/<patron_id>/status')
+def patron_status_api(patron_id):
+    """
+    Get a patron's open loans, late fees owed and a page of borrowing history.
+    API interface for R7: Patron Status Report
+
+    Query parameters:
+        cursor: next_history_cursor from the previous response
+        limit: history page size
+    """
+    cursor = request.args.get('cursor', '').strip() or None
+    limit = request.args.get('limit', PATRON_HISTORY_PAGE_SIZE, type=int)
+    try:
+        report = get_patron_status_report(patron_id, cursor, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(report)
+
+def _job_accepted(job_id):
+    response = jsonify({'job_id': job_id, 'status': 'queued'})
+    response.status_code = 202
+    response.headers['Location'] = url_for('api.job_status_api', job_id=job_id)
+    return response
+
+@api_bp.route('/patron/<patron_id>/fees/pay', methods=['POST'])
+def pay_fees_api(patron_id):
+    """
+    Queue payment of all of a patron's outstanding late fees.
+
+    Returns 202 with the job id at once; poll /api/jobs/<job_id> for the
+    outcome and transaction id.
+    """
+    try:
+        return _job_accepted(submit_fee_payment(patron_id))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@api_bp.route('/refunds', methods=['POST'])
+def refund_api():
+    """
+    Queue a late fee refund.
+
+    Body: {"transaction_id": "TX000001", "amount": 5.0}
+    Returns 202 with the job id; poll /api/jobs/<job_id> for the outcome.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object with transaction_id and amount'}), 400
+    try:
+        return _job_accepted(submit_refund(data.get('transaction_id'), data.get('amount')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@api_bp.route('/jobs/<int:job_id>')
+def job_status_api(job_id):
+    """Get a background job's status, outcome and transaction id."""
+    job = get_job_status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@api_bp.route('/overdue')
+def overdue_loans_api():
+    """
+    Get overdue totals and a page of overdue loans from the last overdue sweep.
+
+    Query parameters:
+        cursor: next_cursor from the previous response
+        limit: page size
+        patron_id: only this patron's overdue loans
+    """
+    cursor = request.args.get('cursor', '').strip() or None
+    limit = request.args.get('limit', OVERDUE_PAGE_SIZE, type=int)
+    patron_id = request.args.get('patron_id', '').strip() or None
+    try:
+        report = get_overdue_report(cursor, limit, patron_id)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(report)
+
+@api_bp.route('/stats/daily')
+def daily_circulation_api():
+    """
+    Borrows, returns and overdue returns per day, from the circulation rollups.
+
+    Query parameters:
+        from, to: first and last day, YYYY-MM-DD (default: the last 30 days)
+        book_id: only this book's loans
+        author: only loans of this author's books
+    """
+    book_id = request.args.get('book_id', type=int)
+    author = request.args.get('author', '').strip() or None
+    try:
+        report = get_daily_circulation(request.args.get('from'), request.args.get('to'), book_id, author)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(report)
+
+def _most_borrowed(by):
+    limit = request.args.get('limit', STATS_TOP_LIMIT, type=int)
+    try:
+        report = get_most_borrowed(request.args.get('month'), limit, by)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(report)
+
+@api_bp.route('/stats/top-books')
+def top_books_api():
+    """
+    The most borrowed books of a month, from the circulation rollups.
+
+    Query parameters:
+        month: YYYY-MM (default: the current month)
+        limit: number of entries
+    """
+    return _most_borrowed(by='book')
+
+@api_bp.route('/stats/top-authors')
+def top_authors_api():
+    """
+    The most borrowed authors of a month, from the circulation rollups.
+
+    Query parameters:
+        month: YYYY-MM (default: the current month)
+        limit: number of entries
+    """
+    return _most_borrowed(by='author')
+
+@api_bp.route('/stats/books/<int:book_id>')
+def title_utilisation_api(book_id):
+    """
+    A title's circulation counters and utilisation, from the circulation rollups.
+
+    Query parameters:
+        month: month to report borrows for, YYYY-MM (default: the current month)
+    """
+    try:
+        stats = get_title_utilisation(book_id, request.args.get('month'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if stats is None:
+        return jsonify({'error': 'Book not found'}), 404
+    return jsonify(stats)
+
+def _branch_request():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object with patron_id and book_id')
+    book_id = data.get('book_id')
+    if not isinstance(book_id, int) or isinstance(book_id, bool):
+        raise ValueError('Book ID must be an integer.')
+    return str(data.get('patron_id') or ''), book_id
+
+def _sharding_disabled():
+    return jsonify({'error': 'Branch sharding is not configured (set LIBRARY_SHARDS)'}), 404
+
+@api_bp.route('/branches')
+def branches_api():
+    """List the branches whose catalogs live in their own database shard."""
+    router = sharding.router
+    return jsonify({'branches': router.branches if router else []})
+
+@api_bp.route('/branches/search')
+def branch_search_api():
+    """
+    Search the catalogs of every branch at once.
+
+    Query parameters:
+        q: search term
+        type: title (default), author, isbn or any other value for both title and author
+    """
+    router = sharding.router
+    if router is None:
+        return _sharding_disabled()
+    search_term = request.args.get('q', '').strip()
+    search_type = request.args.get('type', 'title')
+    if not search_term:
+        return jsonify({'error': 'Search term is required'}), 400
+    try:
+        books = router.search(search_term, search_type)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'search_term': search_term,
+        'search_type': search_type,
+        'results': books,
+        'count': len(books)
+    })
+
+def _branch_loan(branch, mode):
+    router = sharding.router
+    if router is None:
+        return _sharding_disabled()
+    if branch not in router.shards:
+        return jsonify({'error': f'Unknown branch: {branch}'}), 404
+    try:
+        patron_id, book_id = _branch_request()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    action = router.borrow if mode == 'borrow' else router.return_book
+    success, message = action(branch, patron_id, book_id)
+    return jsonify({'branch': branch, 'book_id': book_id, 'success': success, 'message': message}), \
+        200 if success else 400
+
+@api_bp.route('/branches/<branch>/borrow', methods=['POST'])
+def branch_borrow_api(branch):
+    """
+    Borrow a book at a branch; the borrowing limit counts loans at every branch.
+
+    Body: {"patron_id": "123456", "book_id": 1}
+    """
+    return _branch_loan(branch, mode='borrow')
+
+@api_bp.route('/branches/<branch>/return', methods=['POST'])
+def branch_return_api(branch):
+    """
+    Return a book to the branch it was borrowed from.
+
+    Body: {"patron_id": "123456", "book_id": 1}
+    """
+    return _branch_loan(branch, mode='return')
+
+@api_bp.route('/branches/patron/<patron_id>/loans')
+def branch_patron_loans_api(patron_id):
+    """A patron's open loans and late fees at every branch."""
+    router = sharding.router
+    if router is None:
+        return _sharding_disabled()
+    try:
+        return jsonify(router.patron_loans(patron_id))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
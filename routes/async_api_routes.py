@@ -0,0 +1,97 @@
+"""
+Async API Routes - asyncio-native versions of the read-only JSON endpoints
+
+Served by the ASGI app in asgi.py. Each handler takes the query arguments and
+the path parameters, awaits the same service functions as api_routes on the
+async database executor and returns (status code, JSON payload), or None to
+leave the request to the Flask app. Handlers marked with @catalog_keyed get
+the same ETags, 304s and response cache as response_cache.catalog_response.
+"""
+
+import re
+from typing import Awaitable, Callable, Dict, List, Optional, Pattern, Tuple
+
+from async_database import run
+from services.library_service import (
+    calculate_late_fee_for_book, search_books_in_catalog,
+    get_catalog_page, CATALOG_PAGE_SIZE,
+    get_patron_status_report, PATRON_HISTORY_PAGE_SIZE
+)
+
+Handler = Callable[..., Awaitable[Optional[Tuple[int, Dict]]]]
+
+
+def _int_arg(args: Dict[str, str], name: str, default: int) -> int:
+    # Same as Flask's request.args.get(name, default, type=int)
+    try:
+        return int(args[name])
+    except (KeyError, ValueError):
+        return default
+
+
+def catalog_keyed(*key_args: str) -> Callable[[Handler], Handler]:
+    """Mark a handler whose response depends only on the books table and the query arguments `key_args`."""
+    def mark(handler: Handler) -> Handler:
+        handler.cache_key_args = key_args
+        return handler
+    return mark
+
+
+async def get_late_fee(args: Dict[str, str], patron_id: str, book_id: str) -> Tuple[int, Dict]:
+    """Async version of GET /api/late_fee/<patron_id>/<book_id>."""
+    result = await run(calculate_late_fee_for_book, patron_id, int(book_id))
+    return 501 if 'not implemented' in result.get('status', '') else 200, result
+
+
+@catalog_keyed('q', 'type')
+async def search_books_api(args: Dict[str, str]) -> Tuple[int, Dict]:
+    """Async version of GET /api/search."""
+    search_term = args.get('q', '').strip()
+    search_type = args.get('type', 'title')
+    if not search_term:
+        return 400, {'error': 'Search term is required'}
+
+    books = await run(search_books_in_catalog, search_term, search_type)
+    return 200, {
+        'search_term': search_term,
+        'search_type': search_type,
+        'results': books,
+        'count': len(books)
+    }
+
+
+async def list_books_api(args: Dict[str, str]) -> Optional[Tuple[int, Dict]]:
+    """Async version of GET /api/books (paged; streaming stays on the sync API)."""
+    if args.get('stream'):
+        return None
+    cursor = args.get('cursor', '').strip() or None
+    limit = _int_arg(args, 'limit', CATALOG_PAGE_SIZE)
+    try:
+        page = await run(get_catalog_page, cursor, limit)
+    except ValueError as e:
+        return 400, {'error': str(e)}
+    return 200, {
+        'books': page['books'],
+        'count': len(page['books']),
+        'next_cursor': page['next_cursor']
+    }
+
+
+async def patron_status_api(args: Dict[str, str], patron_id: str) -> Tuple[int, Dict]:
+    """Async version of GET /api/patron/<patron_id>/status."""
+    cursor = args.get('cursor', '').strip() or None
+    limit = _int_arg(args, 'limit', PATRON_HISTORY_PAGE_SIZE)
+    try:
+        report = await run(get_patron_status_report, patron_id, cursor, limit)
+    except ValueError as e:
+        return 400, {'error': str(e)}
+    return 200, report
+
+
+# (path pattern, endpoint name, handler); unmatched requests go to the Flask app
+ROUTES: List[Tuple[Pattern, str, Handler]] = [
+    (re.compile(r'/api/late_fee/(?P<patron_id>[^/]+)/(?P<book_id>\d+)'), 'async_api.get_late_fee', get_late_fee),
+    (re.compile(r'/api/search'), 'async_api.search_books_api', search_books_api),
+    (re.compile(r'/api/books'), 'async_api.list_books_api', list_books_api),
+    (re.compile(r'/api/patron/(?P<patron_id>[^/]+)/status'), 'async_api.patron_status_api', patron_status_api),
+]
@@ -3,8 +3,8 @@ Catalog Routes - Book catalog related endpoints
 """
 
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import get_all_books
-from services.library_service import add_book_to_catalog
+from response_cache import catalog_response
+from services.library_service import add_book_to_catalog, get_catalog_page
 
 catalog_bp = Blueprint('catalog', __name__)
 
@@ -14,13 +14,21 @@ def index():
     return redirect(url_for('catalog.catalog'))
 
 @catalog_bp.route('/catalog')
+@catalog_response('cursor', public=False)
 def catalog():
     """
-    Display all books in the catalog.
+    Display the catalog one page at a time.
     Implements R2: Book Catalog Display
     """
-    books = get_all_books()
-    return render_template('catalog.html', books=books)
+    cursor = request.args.get('cursor', '').strip() or None
+    try:
+        page = get_catalog_page(cursor)
+    except ValueError:
+        flash('Invalid catalog page.', 'error')
+        cursor = None
+        page = get_catalog_page()
+    return render_template('catalog.html', books=page['books'],
+                           next_cursor=page['next_cursor'], is_first_page=cursor is None)
 
 
 @catalog_bp.route("/add_book", methods=["GET", "POST"])
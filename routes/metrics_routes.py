@@ -0,0 +1,13 @@
+"""
+Metrics Routes - Prometheus metrics endpoint
+"""
+
+from flask import Blueprint, Response
+from instrumentation import render_prometheus
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Expose request, SQL, service and template timings in Prometheus text format."""
+    return Response(render_prometheus(), mimetype='text/plain; version=0.0.4')
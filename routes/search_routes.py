@@ -2,12 +2,14 @@
 Search Routes - Book search functionality
 """
 
-from flask import Blueprint, render_template, request, flash
+from flask import Blueprint, render_template, request
+from response_cache import catalog_response
 from services.library_service import search_books_in_catalog
 
 search_bp = Blueprint('search', __name__)
 
 @search_bp.route('/search')
+@catalog_response('q', 'type', public=False)
 def search_books():
     """
     Search for books in the catalog.
@@ -22,7 +24,4 @@ def search_books():
     # Use business logic function
     books = search_books_in_catalog(search_term, search_type)
     
-    if not books:
-        flash('Search functionality is not yet implemented.', 'error')
-    
     return render_template('search.html', books=books, search_term=search_term, search_type=search_type)
@@ -0,0 +1,106 @@
+"""
+Date Backfill - Convert an existing database's loan dates to epoch seconds
+
+Older databases store borrow/due/return dates as ISO strings. Schema
+migration 7 rebuilds borrow_records and overdue_loans with INTEGER epoch
+seconds; it runs automatically when the app starts, but on a large database
+it is better run ahead of a deploy with this tool, which first checks that
+every stored date can be converted, then migrates and verifies the row count.
+
+Command line usage:
+    python -m services.date_backfill [PATH] [--check]
+"""
+
+import argparse
+import sys
+import time
+from typing import Dict, List, Optional
+
+import database
+
+DATE_COLUMNS = {
+    "borrow_records": ("borrow_date", "due_date", "return_date"),
+    "overdue_loans": ("due_date",),
+}
+
+
+def _table_exists(conn, table: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+def _count_loans(conn) -> int:
+    return conn.execute("SELECT COUNT(*) FROM borrow_records").fetchone()[0] if _table_exists(conn, "borrow_records") else 0
+
+
+def find_unconvertible_dates(limit: int = 20) -> List[Dict]:
+    """
+    Find stored dates that are not epoch seconds and cannot be parsed as ISO dates.
+
+    Returns:
+        list: up to `limit` of {"table", "id", "column", "value"}
+    """
+    conn = database.get_db_connection()
+    problems: List[Dict] = []
+    for table, columns in DATE_COLUMNS.items():
+        if not _table_exists(conn, table):
+            continue
+        for column in columns:
+            rows = conn.execute(f'''
+                SELECT rowid AS id, {column} AS value FROM {table}
+                WHERE {column} IS NOT NULL AND typeof({column}) != 'integer'
+                  AND strftime('%s', {column}) IS NULL
+                LIMIT ?
+            ''', (limit - len(problems),)).fetchall()
+            problems += [{"table": table, "id": row["id"], "column": column, "value": row["value"]} for row in rows]
+            if len(problems) >= limit:
+                return problems
+    return problems
+
+
+def backfill() -> Dict:
+    """
+    Migrate the current database to epoch-second dates.
+
+    Returns:
+        dict: schema version before/after, loans converted and seconds taken
+
+    Raises:
+        ValueError: if some stored dates cannot be converted (nothing is changed).
+    """
+    problems = find_unconvertible_dates()
+    if problems:
+        raise ValueError(f"{len(problems)}+ dates cannot be converted, e.g. {problems[0]}")
+    conn = database.get_db_connection()
+    before = database.get_schema_version(conn)
+    loans = _count_loans(conn)
+    started = time.perf_counter()
+    database.init_database()
+    after = database.get_schema_version(conn)
+    if _count_loans(conn) != loans:
+        raise RuntimeError("borrow_records row count changed during the backfill")
+    return {"from_version": before, "to_version": after, "loans": loans,
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Convert stored loan dates to epoch seconds.")
+    parser.add_argument("path", nargs="?", help="database file (default: LIBRARY_DB or library.db)")
+    parser.add_argument("--check", action="store_true", help="only report dates that cannot be converted")
+    args = parser.parse_args(argv)
+
+    if args.path:
+        database.DATABASE = args.path
+    problems = find_unconvertible_dates()
+    for problem in problems:
+        print(f"{problem['table']} row {problem['id']}: {problem['column']} = {problem['value']!r}", file=sys.stderr)
+    if problems or args.check:
+        return 1 if problems else 0
+
+    result = backfill()
+    print(f"Schema v{result['from_version']} -> v{result['to_version']}: "
+          f"{result['loans']} loans stored as epoch seconds in {result['seconds']}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+"""
+Export Service - Streaming columnar export of the catalog and borrowing history
+
+Each exportable table (database.EXPORT_TABLES) is read in id order, one
+chunk of rows at a time, and every chunk is written as a compressed NumPy
+.npz archive: one .npy array per column, so memory use is bounded by the
+chunk size however large the table is. Integer columns are little-endian
+int64 ("<i8"), REAL columns float64 ("<f8"). Text columns are stored as in
+Arrow: "<column>.data" holds the UTF-8 bytes of every value and
+"<column>.offsets" (int64, one longer than the chunk) where each value
+starts. Nullable columns add a "<column>.valid" boolean mask; NULLs are 0
+(or "") in the values. With NumPy:
+
+    part = numpy.load("export/borrow_records/000000000001-000000050000.npz")
+    returned = part["return_date"][part["return_date.valid"]]
+
+read_export_file() reads a part without NumPy.
+
+The export directory's manifest.json records each table's columns, files
+and the highest id exported, and is rewritten after every file, so the next
+run only exports rows added since (an "id watermark"). Rows are never
+re-exported when they change: a loan exported while open keeps a NULL
+return_date in its file. Pass --full for a fresh copy of a table.
+
+Command line usage (the database is LIBRARY_DB or library.db):
+    python -m services.export_service OUT_DIR [--table NAME] [--chunk-size N] [--full]
+"""
+
+import argparse
+import ast
+import json
+import os
+import struct
+import sys
+import time
+import zipfile
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from database import EXPORT_TABLES, get_table_columns, init_database, iter_table_chunks
+
+EXPORT_CHUNK_SIZE = 50000
+# zlib level 1: seven times faster than the default for about 10% larger files
+COMPRESS_LEVEL = 1
+MANIFEST = "manifest.json"
+FORMAT_VERSION = 1
+
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+# array typecode of each fixed-width .npy dtype written here
+_TYPECODES = {"<i8": "q", "<f8": "d"}
+
+
+def _kind(declared: str) -> str:
+    # SQLite type affinity rules, reduced to the three kinds exported
+    if "INT" in declared:
+        return "int"
+    if any(name in declared for name in ("REAL", "FLOA", "DOUB")):
+        return "float"
+    return "text"
+
+
+def _npy(descr: str, length: int, data: bytes) -> bytes:
+    # A version 1.0 .npy file holding a one-dimensional array; the header is
+    # padded so the data starts on a 64-byte boundary, as NumPy writes it
+    header = repr({"descr": descr, "fortran_order": False, "shape": (length,)})
+    header += " " * (63 - (len(_NPY_MAGIC) + 2 + len(header)) % 64) + "\n"
+    return _NPY_MAGIC + struct.pack("<H", len(header)) + header.encode("latin1") + data
+
+
+def _pack(descr: str, values) -> bytes:
+    numbers = array(_TYPECODES[descr], values)
+    if sys.byteorder == "big":
+        numbers.byteswap()
+    return numbers.tobytes()
+
+
+def _unpack(descr: str, data: bytes) -> array:
+    numbers = array(_TYPECODES[descr], data)
+    if sys.byteorder == "big":
+        numbers.byteswap()
+    return numbers
+
+
+def _column_arrays(name: str, kind: str, nullable: bool, values: Sequence) -> List[Tuple[str, str, int, bytes]]:
+    # The (member name, dtype, length, bytes) arrays one column of a chunk is stored as
+    arrays = []
+    if nullable:
+        valid = bytes(value is not None for value in values)
+        arrays.append((f"{name}.valid", "|b1", len(values), valid))
+        if not all(valid):
+            empty = "" if kind == "text" else 0
+            values = [empty if value is None else value for value in values]
+    if kind == "text":
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = [0] * (len(encoded) + 1)
+        end = 0
+        for i, value in enumerate(encoded, start=1):
+            end += len(value)
+            offsets[i] = end
+        arrays.append((f"{name}.offsets", "<i8", len(offsets), _pack("<i8", offsets)))
+        arrays.append((f"{name}.data", "|u1", end, b"".join(encoded)))
+    else:
+        descr = "<i8" if kind == "int" else "<f8"
+        arrays.append((name, descr, len(values), _pack(descr, values)))
+    return arrays
+
+
+def write_export_file(path: str, columns: List[Tuple[str, str, bool]], rows: List[Tuple]) -> None:
+    """Write one chunk of rows as a compressed .npz file, replacing `path` atomically."""
+    partial = path + ".partial"
+    with zipfile.ZipFile(partial, "w", zipfile.ZIP_DEFLATED, allowZip64=True,
+                         compresslevel=COMPRESS_LEVEL) as archive:
+        for (name, declared, nullable), values in zip(columns, zip(*rows)):
+            for member, descr, length, data in _column_arrays(name, _kind(declared), nullable, values):
+                archive.writestr(member + ".npy", _npy(descr, length, data))
+    os.replace(partial, path)
+
+
+def _read_npy(data: bytes) -> Tuple[str, bytes]:
+    if not data.startswith(_NPY_MAGIC):
+        raise ValueError("Not a version 1.0 .npy array")
+    (size,) = struct.unpack_from("<H", data, len(_NPY_MAGIC))
+    start = len(_NPY_MAGIC) + 2
+    header = ast.literal_eval(data[start:start + size].decode("latin1"))
+    return header["descr"], data[start + size:]
+
+
+def read_export_file(path: str, columns: List[Tuple[str, str, bool]]) -> Dict[str, list]:
+    """
+    Read an exported chunk back without NumPy.
+
+    Args:
+        path: the .npz file
+        columns: the table's columns, as listed in the manifest
+
+    Returns:
+        dict: column name -> list of values (None for NULLs)
+    """
+    result = {}
+    with zipfile.ZipFile(path) as archive:
+        def member(name: str) -> Tuple[str, bytes]:
+            return _read_npy(archive.read(name + ".npy"))
+
+        for name, declared, nullable in columns:
+            if _kind(declared) == "text":
+                offsets = _unpack(*member(f"{name}.offsets"))
+                data = member(f"{name}.data")[1]
+                values = [data[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+            else:
+                values = _unpack(*member(name)).tolist()
+            if nullable:
+                valid = member(f"{name}.valid")[1]
+                values = [value if ok else None for value, ok in zip(values, valid)]
+            result[name] = values
+    return result
+
+
+def load_manifest(out_dir: str) -> Dict:
+    """The export directory's manifest (an empty one if nothing was exported yet)."""
+    try:
+        with open(os.path.join(out_dir, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"format": FORMAT_VERSION, "tables": {}}
+
+
+def _save_manifest(out_dir: str, manifest: Dict) -> None:
+    path = os.path.join(out_dir, MANIFEST)
+    with open(path + ".partial", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".partial", path)
+
+
+def export_table(out_dir: str, table: str, chunk_size: int = EXPORT_CHUNK_SIZE, full: bool = False) -> Dict:
+    """
+    Export the rows of a table added since its last export into `out_dir`.
+
+    Args:
+        out_dir: export directory (created if missing)
+        table: one of database.EXPORT_TABLES
+        chunk_size: rows read and written per .npz file
+        full: discard the table's earlier export and export every row
+
+    Returns:
+        dict: table, rows and files exported, last_id (the new watermark) and seconds taken
+
+    Raises:
+        ValueError: if the table cannot be exported or its columns changed since the last export.
+    """
+    started = time.perf_counter()
+    columns = get_table_columns(table)
+    os.makedirs(os.path.join(out_dir, table), exist_ok=True)
+    manifest = load_manifest(out_dir)
+    entry = manifest["tables"].get(table)
+    if entry and full:
+        for name in entry["files"]:
+            try:
+                os.remove(os.path.join(out_dir, name))
+            except FileNotFoundError:
+                pass
+        entry = None
+    if entry is None:
+        entry = {"columns": [list(column) for column in columns], "last_id": 0, "rows": 0, "files": []}
+    elif [tuple(column) for column in entry["columns"]] != columns:
+        raise ValueError(f"The columns of {table} changed since the last export; export it again with --full.")
+    manifest["tables"][table] = entry
+
+    rows = files = 0
+    for chunk in iter_table_chunks(table, entry["last_id"], chunk_size):
+        first, last = chunk[0][0], chunk[-1][0]
+        name = f"{table}/{first:012d}-{last:012d}.npz"
+        write_export_file(os.path.join(out_dir, name), columns, chunk)
+        entry["files"].append(name)
+        entry["last_id"] = last
+        entry["rows"] += len(chunk)
+        _save_manifest(out_dir, manifest)
+        rows += len(chunk)
+        files += 1
+    if not files:
+        _save_manifest(out_dir, manifest)
+    return {"table": table, "rows": rows, "files": files, "last_id": entry["last_id"],
+            "seconds": round(time.perf_counter() - started, 3)}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export tables as compressed columnar .npz files.")
+    parser.add_argument("out_dir", help="export directory")
+    parser.add_argument("--table", action="append", choices=EXPORT_TABLES,
+                        help="table to export (repeatable, default: all)")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="rows per file")
+    parser.add_argument("--full", action="store_true", help="re-export every row instead of only new ones")
+    args = parser.parse_args(argv)
+
+    init_database()
+    for table in args.table or EXPORT_TABLES:
+        result = export_table(args.out_dir, table, max(args.chunk_size, 1), args.full)
+        print(f"{table}: exported {result['rows']} rows in {result['files']} files "
+              f"(up to id {result['last_id']}) in {result['seconds']}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Late Fee Engine - Batch late fee calculation
+Implements the R5 fee schedule once, for single loans and for whole batches
+
+Fees are computed over arrays of due/end dates in one pass (dates are parsed
+once per distinct value), or SQL-side for every open loan in the database.
+
+Command line usage (nightly run):
+    python -m services.fee_engine [--as-of YYYY-MM-DD]
+"""
+
+import argparse
+import sys
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from database import (
+    EPOCH_ORDINAL, SECONDS_PER_DAY, init_database, get_open_loan_fee_totals,
+    iter_open_loan_fees as _iter_open_loan_fees
+)
+
+# R5 fee schedule
+FIRST_TIER_DAYS = 7
+FIRST_TIER_RATE = 0.50
+DAILY_RATE = 1.00
+MAX_FEE_PER_BOOK = 15.00
+
+# date, datetime, ISO string, or epoch seconds as stored in borrow_records
+DateLike = Union[date, datetime, str, int]
+
+
+def fee_schedule() -> Dict[str, float]:
+    """The fee schedule as named parameters for SQL-side calculation."""
+    return {
+        "first_days": FIRST_TIER_DAYS,
+        "first_rate": FIRST_TIER_RATE,
+        "daily_rate": DAILY_RATE,
+        "max_fee": MAX_FEE_PER_BOOK,
+    }
+
+
+def _day_number(value: DateLike) -> int:
+    if isinstance(value, int):
+        return EPOCH_ORDINAL + value // SECONDS_PER_DAY
+    if isinstance(value, str):
+        return date.fromisoformat(value[:10]).toordinal()
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.toordinal()
+
+
+def _day_numbers(values: Sequence[Optional[DateLike]], default: int) -> List[int]:
+    """Convert a column of dates to day numbers, parsing each distinct day once."""
+    cache: Dict[object, int] = {}
+    out = []
+    for value in values:
+        if value is None:
+            out.append(default)
+            continue
+        if isinstance(value, int):
+            out.append(EPOCH_ORDINAL + value // SECONDS_PER_DAY)
+            continue
+        key = value[:10] if isinstance(value, str) else value
+        day = cache.get(key)
+        if day is None:
+            day = cache[key] = _day_number(key)
+        out.append(day)
+    return out
+
+
+def late_fee_for_days(days_overdue: int) -> float:
+    """Fee owed for a single loan that is `days_overdue` days late."""
+    if days_overdue <= 0:
+        return 0.0
+    first = min(days_overdue, FIRST_TIER_DAYS) * FIRST_TIER_RATE
+    rest = max(0, days_overdue - FIRST_TIER_DAYS) * DAILY_RATE
+    return round(min(first + rest, MAX_FEE_PER_BOOK), 2)
+
+
+@lru_cache(maxsize=1)
+def _fee_table() -> Tuple[float, ...]:
+    """Fee for 0, 1, 2, ... days overdue, up to the first day the cap applies."""
+    table = [0.0]
+    while table[-1] < MAX_FEE_PER_BOOK:
+        table.append(late_fee_for_days(len(table)))
+    return tuple(table)
+
+
+def calculate_late_fees(due_dates: Sequence[DateLike],
+                        end_dates: Optional[Sequence[Optional[DateLike]]] = None,
+                        as_of: Optional[DateLike] = None) -> List[Tuple[int, float]]:
+    """
+    Calculate (days_overdue, fee) for many loans in one pass.
+
+    Args:
+        due_dates: due date of each loan (date, datetime, ISO string or epoch seconds)
+        end_dates: return date of each loan; None entries (or no list at all)
+            mean the loan is still open and is charged up to `as_of`
+        as_of: the day open loans are charged up to (default: today)
+
+    Returns:
+        list: one (days_overdue, fee) pair per loan, in input order
+    """
+    today = _day_number(as_of or date.today())
+    dues = _day_numbers(due_dates, today)
+    ends = _day_numbers(end_dates, today) if end_dates is not None else [today] * len(dues)
+    table = _fee_table()
+    cap_day = len(table) - 1
+    days = [end - due if end > due else 0 for due, end in zip(dues, ends)]
+    return [(d, table[d if d < cap_day else cap_day]) for d in days]
+
+
+def as_of_day(as_of: Optional[DateLike] = None) -> str:
+    """The ISO day fees are charged up to (default: today)."""
+    return date.fromordinal(_day_number(as_of or date.today())).isoformat()
+
+
+def _epoch_day(as_of: Optional[DateLike]) -> int:
+    return _day_number(as_of or date.today()) - EPOCH_ORDINAL
+
+
+def iter_open_loan_fees(as_of: Optional[DateLike] = None, batch_size: int = 5000) -> Iterator[Dict]:
+    """Stream every overdue open loan with its fee, computed SQL-side."""
+    return _iter_open_loan_fees(_epoch_day(as_of), fee_schedule(), batch_size)
+
+
+def summarize_open_loan_fees(as_of: Optional[DateLike] = None) -> Dict:
+    """Totals over every overdue open loan: loan count, patron count and fees owed."""
+    return get_open_loan_fee_totals(_epoch_day(as_of), fee_schedule())
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Calculate late fees for every open loan.")
+    parser.add_argument("--as-of", help="charge fees up to this day (YYYY-MM-DD, default today)")
+    args = parser.parse_args(argv)
+
+    init_database()
+    summary = summarize_open_loan_fees(args.as_of)
+    print(f"{summary['overdue_loans']} overdue loans across {summary['patrons']} patrons, "
+          f"${summary['total_fees']:.2f} in late fees")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
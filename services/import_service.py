@@ -0,0 +1,159 @@
+"""
+Bulk Import Service - Batched catalog loading from CSV/JSONL feeds
+
+Rows are validated with the same R1 rules as add_book_to_catalog, duplicate
+ISBNs are dropped in memory and against the database, and valid books are
+written with executemany in chunked transactions.
+
+Command line usage:
+    python -m services.import_service FEED.csv [--format csv|jsonl] [--chunk-size N]
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from typing import Dict, IO, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from database import init_database, insert_books_batch
+from services.library_service import validate_book_fields
+
+IMPORT_CHUNK_SIZE = 1000
+FORMATS = ("csv", "jsonl")
+
+
+class UnreadableRow(NamedTuple):
+    """A feed row that could not be read as a book, and why."""
+    error: str
+
+
+def read_book_rows(stream: IO[str], fmt: str) -> Iterator[Tuple[int, Dict]]:
+    """
+    Stream (line number, row) pairs from a CSV or JSON Lines feed.
+
+    CSV feeds need a header row with title, author, isbn and total_copies
+    columns. JSON lines that do not parse, or are not objects, are yielded
+    as an UnreadableRow so they are reported rather than aborting the import.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield line_no, UnreadableRow("Invalid JSON on this line.")
+                continue
+            yield line_no, row if isinstance(row, dict) else UnreadableRow("Expected a JSON object.")
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _parse_row(row: Dict) -> Tuple[Optional[Tuple[str, str, str, int, int]], Optional[str]]:
+    if isinstance(row, UnreadableRow):
+        return None, row.error
+    if not isinstance(row, dict):
+        return None, "Expected a JSON object."
+    title = str(row.get("title") or "")
+    author = str(row.get("author") or "")
+    isbn = str(row.get("isbn") or "").strip()
+    try:
+        total_copies = int(str(row.get("total_copies", "")).strip())
+    except ValueError:
+        return None, "Total copies must be a positive integer."
+
+    error = validate_book_fields(title, author, isbn, total_copies)
+    if error:
+        return None, error
+    return (title.strip(), author.strip(), isbn, total_copies, total_copies), None
+
+
+def import_books(rows: Iterable[Tuple[int, Dict]], chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict:
+    """
+    Import books from (line number, row) pairs.
+
+    Returns:
+        dict: imported/rejected counts, a per-row error list and throughput
+    """
+    started = time.perf_counter()
+    seen = set()
+    errors: List[Dict] = []
+    chunk: List[Tuple[str, str, str, int, int]] = []
+    chunk_lines: Dict[str, int] = {}
+    imported = 0
+    total = 0
+
+    def flush():
+        nonlocal imported
+        skipped = set(insert_books_batch(chunk))
+        imported += len(chunk) - len(skipped)
+        for isbn in skipped:
+            errors.append({"line": chunk_lines[isbn], "isbn": isbn,
+                           "error": "A book with this ISBN already exists."})
+        chunk.clear()
+        chunk_lines.clear()
+
+    for line_no, row in rows:
+        total += 1
+        book, error = _parse_row(row)
+        if error:
+            errors.append({"line": line_no, "isbn": row.get("isbn") if isinstance(row, dict) else None,
+                           "error": error})
+            continue
+        isbn = book[2]
+        if isbn in seen:
+            errors.append({"line": line_no, "isbn": isbn, "error": "Duplicate ISBN in import feed."})
+            continue
+        seen.add(isbn)
+        chunk.append(book)
+        chunk_lines[isbn] = line_no
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    elapsed = time.perf_counter() - started
+    errors.sort(key=lambda e: e["line"])
+    return {
+        "total_rows": total,
+        "imported": imported,
+        "rejected": len(errors),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(total / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def import_books_from_file(path: str, fmt: Optional[str] = None,
+                           chunk_size: int = IMPORT_CHUNK_SIZE) -> Dict:
+    """Import a CSV/JSONL file, inferring the format from its extension if not given."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson")) else "csv")
+    with open(path, newline="", encoding="utf-8") as stream:
+        return import_books(read_book_rows(stream, fmt), chunk_size)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk import books into the library catalog.")
+    parser.add_argument("path", help="CSV or JSON Lines feed")
+    parser.add_argument("--format", choices=FORMATS, help="feed format (default: from file extension)")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE,
+                        help="books written per transaction")
+    args = parser.parse_args(argv)
+
+    init_database()
+    report = import_books_from_file(args.path, args.format, args.chunk_size)
+    for error in report["errors"]:
+        print(f"line {error['line']}: {error['isbn']}: {error['error']}", file=sys.stderr)
+    print(f"Imported {report['imported']} of {report['total_rows']} rows "
+          f"({report['rejected']} rejected) in {report['seconds']}s, "
+          f"{report['rows_per_second']} rows/s")
+    return 0 if not report["rejected"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
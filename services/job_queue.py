@@ -0,0 +1,256 @@
+"""
+Job Queue - Durable background jobs for gateway payments and refunds
+
+Requests that would wait on the payment gateway queue a job instead: one
+INSERT into the jobs table, after which the client polls /api/jobs/<id>.
+Worker threads claim jobs one at a time, so at most JOB_WORKERS gateway
+calls are in flight per process, run the handler for the job's kind and
+store its outcome and transaction id on the job row.
+
+Jobs survive restarts. A job left running by a dead worker is taken over
+once its lease expires. Payments send an idempotency key derived from the
+job id, which stays the same when a job is retried or taken over (even on a
+later day, with higher fees), so the patron is still charged at most once. Handlers raise RetryJob for transient
+failures (gateway unreachable after the client's own retries), which
+requeues the job with backoff until JOB_MAX_ATTEMPTS.
+
+Workers start in-process with the first queued job. To process jobs in a
+separate process instead, set JOB_WORKERS=0 for the app and run:
+    python -m services.job_queue [--workers N]
+
+Configuration (environment variables):
+    JOB_WORKERS=N              worker threads per process (default 4, 0: none)
+    JOB_MAX_ATTEMPTS=N         attempts before a job fails (default 5)
+    JOB_LEASE_SECONDS=N        time a worker has to finish a job (default 60)
+    JOB_RETRY_DELAY=SECONDS    first retry delay, doubled per attempt (default 5)
+    JOB_POLL_INTERVAL=SECONDS  idle poll for jobs queued by other processes (default 1)
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import database
+from database import (insert_job, claim_job, finish_job, requeue_job, get_job, count_pending_jobs,
+                      from_epoch, to_epoch)
+from instrumentation import timed
+from services.library_service import pay_all_late_fees
+from services.payment_client import TransientPaymentError, get_payment_client
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '5'))
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '60'))
+JOB_RETRY_DELAY = float(os.getenv('JOB_RETRY_DELAY', '5'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '1'))
+MAX_RETRY_DELAY = 300
+
+logger = logging.getLogger(__name__)
+
+
+class RetryJob(Exception):
+    """Raised by a handler when the job should be tried again later."""
+
+
+# kind -> handler(payload, job_id) returning the job's result dict
+HANDLERS: Dict[str, Callable[[Dict, int], Dict]] = {}
+
+
+def handler(kind: str):
+    """Register the function that runs jobs of `kind`."""
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+@handler('fee_payment')
+def _pay_fees(payload: Dict, job_id: int) -> Dict:
+    result = pay_all_late_fees(payload['patron_id'], get_payment_client(), idempotency_key=f'fee-job-{job_id}')
+    if result['status'] == 'unavailable':
+        raise RetryJob(result['message'])
+    if result['status'] == 'error':
+        raise RuntimeError(result['message'])
+    return result
+
+
+@handler('refund')
+def _refund(payload: Dict, job_id: int) -> Dict:
+    try:
+        result = get_payment_client().refund_payment(
+            payload['transaction_id'], payload['amount'], idempotency_key=f'refund-job-{job_id}')
+    except TransientPaymentError as e:
+        raise RetryJob(str(e))
+    refunded = result.get('status') == 'refund_success'
+    return {'status': 'refunded' if refunded else 'declined',
+            'message': 'Refund successful.' if refunded else 'Refund declined.',
+            'transaction_id': payload['transaction_id'], 'amount': payload['amount']}
+
+
+def run_job(job: Dict) -> str:
+    """Run a claimed job and record its outcome; returns the job's new status."""
+    fn = HANDLERS.get(job['kind'])
+    try:
+        if fn is None:
+            raise ValueError(f"Unknown job kind {job['kind']!r}")
+        result = fn(json.loads(job['payload']), job['id'])
+    except RetryJob as e:
+        if job['attempts'] < JOB_MAX_ATTEMPTS:
+            delay = min(MAX_RETRY_DELAY, JOB_RETRY_DELAY * 2 ** (job['attempts'] - 1))
+            requeue_job(job['id'], to_epoch(datetime.now() + timedelta(seconds=delay)), str(e))
+            return 'queued'
+        finish_job(job['id'], 'failed', error=str(e))
+        return 'failed'
+    except Exception as e:
+        finish_job(job['id'], 'failed', error=str(e) or type(e).__name__)
+        return 'failed'
+    finish_job(job['id'], 'done', json.dumps(result), transaction_id=result.get('transaction_id'))
+    return 'done'
+
+
+class WorkerPool:
+    """Worker threads that claim and run queued jobs."""
+
+    def __init__(self, workers: Optional[int] = None, poll_interval: Optional[float] = None):
+        self.workers = JOB_WORKERS if workers is None else workers
+        self.poll_interval = poll_interval or JOB_POLL_INTERVAL
+        self._threads: List[threading.Thread] = []
+        self._wake = threading.Event()
+        self._stopping = False
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        """Start the worker threads (no-op if running or configured with 0 workers)."""
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def notify(self) -> None:
+        """Wake an idle worker: a job has just been queued."""
+        self._wake.set()
+
+    def stop(self) -> None:
+        """Stop the workers after their current jobs."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+            self._stopping = True
+        self._wake.set()
+        for thread in threads:
+            thread.join()
+
+    def drain(self, timeout: float = 30.0) -> bool:
+        """Wait until no job is queued or running; False on timeout."""
+        give_up_at = time.monotonic() + timeout
+        while count_pending_jobs():
+            if time.monotonic() >= give_up_at:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _run(self) -> None:
+        try:
+            while not self._stopping:
+                try:
+                    job = claim_job(JOB_LEASE_SECONDS)
+                    if job is not None:
+                        run_job(job)
+                        continue
+                except Exception:
+                    # e.g. the database is locked; a claimed job is retaken when its lease expires
+                    logger.exception('Job worker error')
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+        finally:
+            database.close_db_connection()
+
+
+workers = WorkerPool()
+
+
+def enqueue(kind: str, payload: Dict) -> int:
+    """Queue a job of a registered kind and wake a worker; returns the job id."""
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind {kind!r}')
+    job_id = insert_job(kind, json.dumps(payload))
+    workers.start()
+    workers.notify()
+    return job_id
+
+
+@timed
+def submit_fee_payment(patron_id: str) -> int:
+    """
+    Queue payment of all of a patron's late fees; returns the job id.
+
+    Raises:
+        ValueError: if the patron ID is malformed.
+    """
+    if not re.fullmatch(r"\d{6}", str(patron_id or "")):
+        raise ValueError("Invalid patron ID (must be exactly 6 digits).")
+    return enqueue('fee_payment', {'patron_id': patron_id})
+
+
+@timed
+def submit_refund(transaction_id: str, amount: float) -> int:
+    """
+    Queue a late fee refund; returns the job id.
+
+    Raises:
+        ValueError: if the transaction ID or amount is invalid.
+    """
+    if not transaction_id or not isinstance(transaction_id, str):
+        raise ValueError("Invalid transaction ID.")
+    if not isinstance(amount, (int, float)) or isinstance(amount, bool) or amount <= 0 or amount > 15:
+        raise ValueError("Invalid refund amount.")
+    return enqueue('refund', {'transaction_id': transaction_id, 'amount': amount})
+
+
+@timed
+def get_job_status(job_id: int) -> Optional[Dict]:
+    """A job's status, attempts, outcome and transaction id, or None if there is no such job."""
+    job = get_job(job_id)
+    if job is None:
+        return None
+    return {
+        'id': job['id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'transaction_id': job['transaction_id'],
+        'result': json.loads(job['result']) if job['result'] else None,
+        'error': job['error'],
+        'created_at': from_epoch(job['created_at']).isoformat(),
+        'updated_at': from_epoch(job['updated_at']).isoformat(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Process queued payment and refund jobs.")
+    parser.add_argument("--workers", type=int, default=max(JOB_WORKERS, 1), help="worker threads")
+    args = parser.parse_args(argv)
+
+    database.init_database()
+    pool = WorkerPool(args.workers)
+    pool.start()
+    print(f"Processing jobs with {args.workers} workers (Ctrl-C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pool.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
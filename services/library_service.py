@@ -3,47 +3,95 @@ Library Service Module - Business Logic Functions
 Contains all the core business logic for the Library Management System
 """
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from database import (
-    get_book_by_id, get_book_by_isbn, get_patron_borrow_count,
-    insert_book, insert_borrow_record, update_book_availability,
-    update_borrow_record_return_date, get_all_books
+    get_book_by_isbn, insert_book, search_books, get_books_page,
+    get_active_borrow, get_last_borrow, get_patron_active_loans, get_patron_borrow_history,
+    get_patron_loan_fees, get_overdue_loans, get_overdue_summary, get_paid_fees, record_fee_payments,
+    SECONDS_PER_DAY, epoch_day, from_epoch,
+    borrow_book_transaction, return_book_transaction,
+    borrow_books_batch_transaction, return_books_batch_transaction
 )
+from services.fee_engine import calculate_late_fees, fee_schedule
+from services.payment_client import TransientPaymentError
+from instrumentation import timed
+from catalog_snapshot import get_snapshot
+from fuzzy_index import fuzzy_search
+from suggest_index import suggest_books, SUGGEST_LIMIT
+import base64
+import hashlib
+import json
 import re
 
-def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
+MAX_BORROWED_BOOKS = 5
+LOAN_PERIOD_DAYS = 14
+CATALOG_PAGE_SIZE = 50
+MAX_CATALOG_PAGE_SIZE = 200
+PATRON_HISTORY_PAGE_SIZE = 20
+MAX_PATRON_HISTORY_PAGE_SIZE = 100
+MAX_BATCH_SIZE = 20
+OVERDUE_PAGE_SIZE = 100
+MAX_OVERDUE_PAGE_SIZE = 1000
+
+_BORROW_ERRORS = {
+    "not_found": "Book not found.",
+    "unavailable": "This book is currently not available.",
+    "limit_reached": f"You have reached the maximum borrowing limit of {MAX_BORROWED_BOOKS} books.",
+    "already_borrowed": "You already have this book borrowed.",
+    "error": "Database error occurred while creating borrow record.",
+}
+
+_RETURN_ERRORS = {
+    "not_borrowed": "No active borrow record for this patron/book.",
+    "error": "Failed to update borrow record with return date.",
+}
+
+def validate_book_fields(title: str, author: str, isbn: str, total_copies: int) -> Optional[str]:
     """
-    Add a new book to the catalog.
-    Implements R1: Book Catalog Management
-    
-    Args:
-        title: Book title (max 200 chars)
-        author: Book author (max 100 chars)
-        isbn: 13-digit ISBN
-        total_copies: Number of copies (positive integer)
-        
+    Check a book against the R1 field rules.
+
     Returns:
-        tuple: (success: bool, message: str)
+        str: the first validation error message, or None if the book is valid
     """
     if not title or not title.strip():
-        return False, "Title is required."
+        return "Title is required."
     
     if len(title.strip()) > 200:
-        return False, "Title must be less than 200 characters."
+        return "Title must be less than 200 characters."
     
     if not author or not author.strip():
-        return False, "Author is required."
+        return "Author is required."
     
     if len(author.strip()) > 100:
-        return False, "Author must be less than 100 characters."
+        return "Author must be less than 100 characters."
     
     if len(isbn) != 13:
-        return False, "ISBN must be exactly 13 digits."
+        return "ISBN must be exactly 13 digits."
     
     if not isinstance(total_copies, int) or total_copies <= 0:
-        return False, "Total copies must be a positive integer."
+        return "Total copies must be a positive integer."
+    
+    return None
+
+@timed
+def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
+    """
+    Add a new book to the catalog.
+    Implements R1: Book Catalog Management
     
+    Args:
+        title: Book title (max 200 chars)
+        author: Book author (max 100 chars)
+        isbn: 13-digit ISBN
+        total_copies: Number of copies (positive integer)
+        
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    error = validate_book_fields(title, author, isbn, total_copies)
+    if error:
+        return False, error
 
     existing = get_book_by_isbn(isbn)
     if existing:
@@ -55,161 +103,302 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
     else:
         return False, "Database error occurred while adding the book."
 
-def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
-
+@timed
+def borrow_book_by_patron(patron_id: str, book_id: int, open_elsewhere: int = 0) -> Tuple[bool, str]:
+    """
+    Borrow a book.
+    Implements R3: Book Borrowing
 
+    Args:
+        open_elsewhere: loans the patron has open in other databases (other
+                        branch shards, see sharding), counted against the limit
+    """
     if not re.fullmatch(r"\d{6}", str(patron_id or "")):
         return False, "Invalid patron ID (must be exactly 6 digits)."
 
-    
-    book = get_book_by_id(book_id)
-    if not book:
-        return False, "Book not found."
-    if book.get("available_copies", 0) <= 0:
-        return False, "This book is currently not available."
+    # Availability, limit and duplicate checks run inside the same
+    # transaction as the insert and decrement so concurrent borrows
+    # cannot oversell copies.
+    borrow_date = datetime.now()
+    due_date = borrow_date + timedelta(days=LOAN_PERIOD_DAYS)
+    status, book = borrow_book_transaction(patron_id, book_id, borrow_date, due_date,
+                                           MAX_BORROWED_BOOKS - open_elsewhere)
+    if status != "ok":
+        return False, _BORROW_ERRORS[status]
 
-  
-    current_count = get_patron_borrow_count(patron_id) or 0
-    if current_count >= 5:
-        return False, "You have reached the maximum borrowing limit of 5 books."
+    return True, f'Successfully borrowed "{book.get("title","")}". Due date: {due_date.strftime("%Y-%m-%d")}.'
 
-    
-    try:
-        from database import patron_has_active_borrow  
-        if patron_has_active_borrow(patron_id, book_id):
-            return False, "You already have this book borrowed."
-    except Exception:
-        pass  
+@timed
+def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
 
-    
+    status = return_book_transaction(patron_id, book_id, datetime.now())
+    if status != "ok":
+        return False, _RETURN_ERRORS[status]
+
+    return True, "Return successful."
+
+
+def _validate_batch(patron_id: str, book_ids: List) -> List[int]:
+    if not re.fullmatch(r"\d{6}", str(patron_id or "")):
+        raise ValueError("Invalid patron ID (must be exactly 6 digits).")
+    if not isinstance(book_ids, list) or not book_ids:
+        raise ValueError("At least one book ID is required.")
+    if len(book_ids) > MAX_BATCH_SIZE:
+        raise ValueError(f"At most {MAX_BATCH_SIZE} books can be processed at once.")
+    if not all(isinstance(book_id, int) and not isinstance(book_id, bool) for book_id in book_ids):
+        raise ValueError("Book IDs must be integers.")
+    return book_ids
+
+
+@timed
+def borrow_books_by_patron(patron_id: str, book_ids: List[int]) -> Dict:
+    """
+    Borrow a stack of books in one transaction (self-checkout kiosks).
+    Batch version of R3: Book Borrowing
+
+    The patron is validated once and the borrowing limit is checked for the
+    whole set: books are taken in order until the limit is reached.
+
+    Returns:
+        dict: {"borrowed": count, "results": [{"book_id", "success", "message"}, ...]}
+
+    Raises:
+        ValueError: if the patron ID or the list of book IDs is malformed.
+    """
+    book_ids = _validate_batch(patron_id, book_ids)
     borrow_date = datetime.now()
-    due_date = borrow_date + timedelta(days=14)
-    if not insert_borrow_record(patron_id, book_id, borrow_date, due_date):
-        return False, "Database error occurred while creating borrow record."
+    due_date = borrow_date + timedelta(days=LOAN_PERIOD_DAYS)
+    outcomes = borrow_books_batch_transaction(patron_id, book_ids, borrow_date, due_date, MAX_BORROWED_BOOKS)
 
-    if not update_book_availability(book_id, -1):
-        return False, "Database error occurred while updating book availability."
+    results = []
+    for book_id, (status, book) in zip(book_ids, outcomes):
+        if status == "ok":
+            message = f'Successfully borrowed "{book.get("title","")}". Due date: {due_date.strftime("%Y-%m-%d")}.'
+        else:
+            message = _BORROW_ERRORS[status]
+        results.append({"book_id": book_id, "success": status == "ok", "message": message})
+    return {"borrowed": sum(r["success"] for r in results), "results": results}
 
-    return True, f'Successfully borrowed "{book.get("title","")}". Due date: {due_date.strftime("%Y-%m-%d")}.'
+@timed
+def return_books_by_patron(patron_id: str, book_ids: List[int]) -> Dict:
+    """
+    Return a stack of books in one transaction (self-checkout kiosks).
+    Batch version of R4: Book Return Processing
 
-def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
-    
-    
-    try:
-        from database import get_active_borrow  
-        if not get_active_borrow(patron_id, book_id):
-            return False, "No active borrow record for this patron/book."
-    except Exception:
-        pass
-    
-    return_ok = update_borrow_record_return_date(patron_id, book_id, datetime.now())
-    if not return_ok:
-        return False, "Failed to update borrow record with return date."
-    book = get_book_by_id(book_id)
-    if book:
-        if not update_book_availability(book_id, +1):
-            return False, "Failed to update book availability after return."
+    Returns:
+        dict: {"returned": count, "results": [{"book_id", "success", "message"}, ...]}
 
-    return True, "Return successful."
+    Raises:
+        ValueError: if the patron ID or the list of book IDs is malformed.
+    """
+    book_ids = _validate_batch(patron_id, book_ids)
+    outcomes = return_books_batch_transaction(patron_id, book_ids, datetime.now())
 
+    results = [
+        {"book_id": book_id, "success": status == "ok",
+         "message": "Return successful." if status == "ok" else _RETURN_ERRORS[status]}
+        for book_id, status in zip(book_ids, outcomes)
+    ]
+    return {"returned": sum(r["success"] for r in results), "results": results}
 
-def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
-    rec = None
-    try:
-        from database import get_active_borrow  
-        rec = get_active_borrow(patron_id, book_id)
-    except Exception:
-        pass
-    if rec is None:
-        try:
-            from database import get_last_borrow  
-            rec = get_last_borrow(patron_id, book_id)
-        except Exception:
-            pass
 
+@timed
+def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
+    rec = get_active_borrow(patron_id, book_id) or get_last_borrow(patron_id, book_id)
     if not rec:
         return {"status": "not found", "fee": 0.0, "days_overdue": 0}
 
-    borrow_dt = rec.get("borrow_date")
-    if isinstance(borrow_dt, str):
-        borrow_dt = datetime.fromisoformat(borrow_dt)
-    due_dt = borrow_dt + timedelta(days=14)
+    # Dates are epoch seconds, so the due date is plain arithmetic
+    due = rec["borrow_date"] + LOAN_PERIOD_DAYS * SECONDS_PER_DAY
+    (days_over, fee), = calculate_late_fees([due], [rec.get("return_date")])
+    return {"status": "ok", "fee": fee, "days_overdue": days_over}
+
 
-    today_or_return = rec.get("return_date")
-    if isinstance(today_or_return, str):
-        today_or_return = datetime.fromisoformat(today_or_return)
-    if not today_or_return:
-        today_or_return = datetime.now()
+def _encode_cursor(*key) -> str:
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
 
-    days_over = (today_or_return.date() - due_dt.date()).days
-    if days_over <= 0:
-        return {"status": "ok", "fee": 0.0, "days_overdue": 0}
 
-    first7 = min(days_over, 7)
-    rest = max(0, days_over - 7)
-    fee = min(first7 * 0.50 + rest * 1.00, 15.00)
-    return {"status": "ok", "fee": round(fee, 2), "days_overdue": days_over}
+def _decode_cursor(token: Optional[str], types: Tuple[type, ...]) -> Optional[Tuple]:
+    if not token:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(key, list) or len(key) != len(types) or \
+            not all(isinstance(v, t) for v, t in zip(key, types)):
+        raise ValueError("Invalid cursor.")
+    return tuple(key)
+
+
+def _with_iso_dates(loans: List[Dict]) -> List[Dict]:
+    # Loan dates are stored as epoch seconds; reports show them as ISO strings
+    for loan in loans:
+        for field in ("borrow_date", "due_date", "return_date"):
+            if loan.get(field) is not None:
+                loan[field] = from_epoch(loan[field]).isoformat()
+    return loans
+
+
+def encode_catalog_cursor(book: Dict) -> str:
+    """Encode a book's (title, id) sort key as an opaque URL-safe cursor token."""
+    return _encode_cursor(book["title"], book["id"])
+
+
+def decode_catalog_cursor(token: Optional[str]) -> Optional[Tuple[str, int]]:
+    """
+    Decode a cursor token from encode_catalog_cursor().
+
+    Raises:
+        ValueError: if the token is malformed.
+    """
+    return _decode_cursor(token, (str, int))
+
+
+@timed
+def get_catalog_page(cursor: Optional[str] = None, limit: int = CATALOG_PAGE_SIZE) -> Dict:
+    """
+    Get one page of the catalog ordered by title.
+    Implements R2: Book Catalog Display (paginated)
+
+    Args:
+        cursor: token from a previous page's next_cursor, or None for the first page
+        limit: page size, clamped to 1..MAX_CATALOG_PAGE_SIZE
+
+    Returns:
+        dict: {"books": [...], "next_cursor": str or None}
+
+    Raises:
+        ValueError: if the cursor is malformed.
+    """
+    after = decode_catalog_cursor(cursor)
+    limit = max(1, min(int(limit), MAX_CATALOG_PAGE_SIZE))
+    # Fetch one extra row to know whether another page exists
+    snapshot = get_snapshot()
+    books = snapshot.page(after, limit + 1) if snapshot else get_books_page(after, limit + 1)
+    next_cursor = encode_catalog_cursor(books[limit - 1]) if len(books) > limit else None
+    return {"books": books[:limit], "next_cursor": next_cursor}
 
 
+@timed
 def search_books_in_catalog(search_term: str, search_type: Optional[str] = None) -> List[Dict]:
 
     q = (search_term or "").strip()
     if not q:
         return []
 
-    books = get_all_books() or []
     t = (search_type or "").strip().lower()
 
-    out: List[Dict] = []
-    for b in books:
-        title = (b.get("title") or "").lower()
-        author = (b.get("author") or "").lower()
-        isbn = (b.get("isbn") or "").strip()
-
-        if t in ("", "title"):
-            if q.lower() in title:
-                out.append(b)
-        elif t == "author":
-            if q.lower() in author:
-                out.append(b)
-        elif t == "isbn":
-            if q == isbn:  
-                out.append(b)
-        else:
-            if q.lower() in title or q.lower() in author:
-                out.append(b)
-    return out
-
-
-def get_patron_status_report(patron_id: str) -> Dict:
-    import database as db
-    from datetime import datetime, timedelta
-
-    current = getattr(db, "get_active_borrows_for_patron", lambda *_: [])(patron_id)
-    history = getattr(db, "get_borrows_for_patron", lambda *_: [])(patron_id)
-
-    total_fees = 0.0
-    for rec in current:
-        borrow_dt = rec["borrow_date"]
-        if isinstance(borrow_dt, str):
-            borrow_dt = datetime.fromisoformat(borrow_dt)
-        due_dt = borrow_dt + timedelta(days=14)
-        days_over = (datetime.now().date() - due_dt.date()).days
-        if days_over > 0:
-            first7 = min(days_over, 7)
-            rest = max(0, days_over - 7)
-            fee = min(first7 * 0.50 + rest * 1.00, 15.00)
-            total_fees += fee
+    # ISBN is an exact match, served straight from the unique index
+    if t == "isbn":
+        book = get_book_by_isbn(q)
+        return [book] if book else []
+
+    # Typo-tolerant, ranked by similarity (see fuzzy_index)
+    if t == "fuzzy":
+        return fuzzy_search(q)
+
+    if t in ("", "title"):
+        fields = ("title",)
+    elif t == "author":
+        fields = ("author",)
+    else:
+        fields = ("title", "author")
+    snapshot = get_snapshot()
+    return snapshot.search(q, fields) if snapshot else search_books(q, fields)
+
+
+@timed
+def get_patron_status_report(patron_id: str, history_cursor: Optional[str] = None,
+                             history_limit: int = PATRON_HISTORY_PAGE_SIZE) -> Dict:
+    """
+    Build a patron's status report.
+    Implements R7: Patron Status Report
+
+    Open loans, their late fees and the fee total come from one aggregated
+    query; borrowing history is a keyset-paginated page, newest first.
+
+    Args:
+        patron_id: 6-digit library card ID
+        history_cursor: next_history_cursor from a previous report, or None
+        history_limit: history page size, clamped to 1..MAX_PATRON_HISTORY_PAGE_SIZE
+
+    Returns:
+        dict: current, count_current, total_fees, history, next_history_cursor
+
+    Raises:
+        ValueError: if the patron ID or cursor is malformed.
+    """
+    if not re.fullmatch(r"\d{6}", str(patron_id or "")):
+        raise ValueError("Invalid patron ID (must be exactly 6 digits).")
+    before = _decode_cursor(history_cursor, (int, int))
+    history_limit = max(1, min(int(history_limit), MAX_PATRON_HISTORY_PAGE_SIZE))
+
+    current, total_fees = get_patron_active_loans(patron_id, epoch_day(date.today()), fee_schedule())
+    history = get_patron_borrow_history(patron_id, history_limit + 1, before)
+    next_cursor = None
+    if len(history) > history_limit:
+        last = history[history_limit - 1]
+        next_cursor = _encode_cursor(last["borrow_date"], last["id"])
 
     return {
-        "current": current,
+        "current": _with_iso_dates(current),
         "count_current": len(current),
-        "history": history,
-        "total_fees": round(total_fees, 2),
+        "history": _with_iso_dates(history[:history_limit]),
+        "next_history_cursor": next_cursor,
+        "total_fees": total_fees,
     }
     
+
+@timed
+def get_overdue_report(cursor: Optional[str] = None, limit: int = OVERDUE_PAGE_SIZE,
+                       patron_id: Optional[str] = None) -> Dict:
+    """
+    Get the totals and one page of overdue loans from the last overdue sweep
+    (see services.overdue_service), for dashboards and overdue notices.
+
+    Args:
+        cursor: next_cursor from a previous page, or None for the first page
+        limit: page size, clamped to 1..MAX_OVERDUE_PAGE_SIZE
+        patron_id: only this patron's overdue loans
+
+    Returns:
+        dict: swept_on, overdue_loans, patrons, total_fees, loans, next_cursor
+
+    Raises:
+        ValueError: if the cursor is malformed.
+    """
+    after = _decode_cursor(cursor, (int,))
+    limit = max(1, min(int(limit), MAX_OVERDUE_PAGE_SIZE))
+    loans: List[Dict] = get_overdue_loans(after[0] if after else 0, limit + 1, patron_id)
+    next_cursor = _encode_cursor(loans[limit - 1]["loan_id"]) if len(loans) > limit else None
+    report = get_overdue_summary()
+    report.update(loans=_with_iso_dates(loans[:limit]), next_cursor=next_cursor)
+    return report
+
+
+@timed
+def get_suggestions(text: str, limit: int = SUGGEST_LIMIT) -> List[Dict]:
+    """
+    Search-as-you-type suggestions for the catalog search box (see suggest_index).
+
+    Args:
+        text: what has been typed so far; the last word counts as a prefix
+        limit: number of suggestions, clamped to 0..SUGGEST_LIMIT
+
+    Returns:
+        list: books whose title/author words or ISBN match, most borrowed first
+    """
+    text = (text or "").lstrip()
+    limit = max(0, min(int(limit), SUGGEST_LIMIT))
+    if not text or not limit:
+        return []
+    return suggest_books(text[:200], limit)
+
     # --- NEW FOR A3 ---
 
+@timed
 def pay_late_fees(patron_id: str, book_id: int, payment_gateway) -> tuple[bool, str]:
     
     if not patron_id or not str(patron_id).isdigit():
@@ -226,6 +415,7 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway) -> tuple[bool,
     except Exception as e:
         return False, f"Error: {e}"
 
+@timed
 def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway) -> tuple[bool, str]:
     """
     Call payment_gateway.refund_payment(transaction_id, amount) with basic guards.
@@ -244,3 +434,68 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway)
     except Exception as e:
         return False, f"Error: {e}"
 
+
+def _fees_covered(items: List[Dict], amount: float) -> List[Dict]:
+    covered = []
+    for item in items:
+        paid = round(min(item["amount"], amount), 2)
+        if paid <= 0:
+            break
+        covered.append(dict(item, amount=paid))
+        amount = round(amount - paid, 2)
+    return covered
+
+
+@timed
+def pay_all_late_fees(patron_id: str, payment_gateway, idempotency_key: Optional[str] = None) -> Dict:
+    """
+    Pay all of a patron's outstanding late fees in one gateway transaction.
+
+    Covers open overdue loans and loans that were returned late and still
+    owe their fee.
+    Only what is still owed is charged: amounts already paid towards each
+    loan's fee are recorded with the payment and subtracted. Without an
+    idempotency key one is derived from the patron, the day and the fees
+    being paid, so a payment resubmitted that day before it was recorded is
+    still charged once. Callers that may retry later (background jobs) pass
+    their own key; if the gateway then answers with an earlier, smaller
+    charge, only that amount is recorded as paid.
+
+    Returns:
+        dict: status ("paid", "nothing_due", "declined", "unavailable" when
+            the gateway could not be reached, or "error"), message,
+            amount, loans and, when paid, transaction_id
+
+    Raises:
+        ValueError: if the patron ID is malformed.
+    """
+    if not re.fullmatch(r"\d{6}", str(patron_id or "")):
+        raise ValueError("Invalid patron ID (must be exactly 6 digits).")
+    today = date.today()
+    loans = get_patron_loan_fees(patron_id, epoch_day(today), fee_schedule())
+    paid = get_paid_fees([loan["id"] for loan in loans])
+    items = [{"loan_id": loan["id"], "book_id": loan["book_id"],
+              "amount": round(loan["fee"] - paid.get(loan["id"], 0.0), 2)} for loan in loans]
+    items = [item for item in items if item["amount"] > 0]
+    summary = {"amount": round(sum(item["amount"] for item in items), 2), "loans": len(items)}
+    if not items:
+        return dict(summary, status="nothing_due", message="No late fee to pay.")
+
+    key = idempotency_key or \
+        hashlib.sha256(json.dumps([patron_id, today.isoformat(), items]).encode("utf-8")).hexdigest()[:32]
+    try:
+        result = payment_gateway.settle_fees(patron_id, items, idempotency_key=key)
+    except TransientPaymentError as e:
+        return dict(summary, status="unavailable", message=f"Error: {e}")
+    except Exception as e:
+        return dict(summary, status="error", message=f"Error: {e}")
+    if result and result.get("status") == "success":
+        charged = result.get("amount")
+        if charged is not None and charged < summary["amount"]:
+            # A replayed charge covers the fees in loan order up to its amount
+            items = _fees_covered(items, charged)
+            summary = {"amount": round(charged, 2), "loans": len(items)}
+        record_fee_payments(items, result.get("transaction_id") or key, datetime.now())
+        return dict(summary, status="paid", message="Payment successful.",
+                    transaction_id=result.get("transaction_id"))
+    return dict(summary, status="declined", message="Payment declined.")
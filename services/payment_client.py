@@ -0,0 +1,273 @@
+"""
+Payment Client - Talks to the payment gateway over HTTP
+
+PaymentClient has the same process_payment/refund_payment interface as the
+PaymentGateway stub, plus settle_fees, which pays several late fees for one
+patron in a single gateway request. Requests go through a Transport; the
+HTTP transport keeps one keep-alive connection per thread, so calls after
+the first skip the TCP (and TLS) handshake.
+
+Every call carries an Idempotency-Key header, reused on each retry, so the
+gateway charges at most once however many attempts it takes. Timeouts,
+dropped connections, 429 and 5xx responses are retried with exponential
+backoff and jitter (honouring Retry-After) until the attempts or the time
+budget run out; other 4xx responses fail straight away. A decline (402)
+is an answer, not an error: its body is returned like a success.
+
+Configuration (environment variables):
+    PAYMENT_GATEWAY_URL=URL      gateway base URL (unset: use the in-process stub)
+    PAYMENT_TIMEOUT=SECONDS      connect/read timeout per attempt (default 5)
+    PAYMENT_RETRIES=N            attempts per call (default 3)
+    PAYMENT_DEADLINE=SECONDS     time budget per call, retries included (default 15)
+"""
+
+import http.client
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from services.payment_service import PaymentGateway
+
+PAYMENT_GATEWAY_URL = os.getenv('PAYMENT_GATEWAY_URL', '')
+PAYMENT_TIMEOUT = float(os.getenv('PAYMENT_TIMEOUT', '5'))
+PAYMENT_RETRIES = int(os.getenv('PAYMENT_RETRIES', '3'))
+PAYMENT_DEADLINE = float(os.getenv('PAYMENT_DEADLINE', '15'))
+
+# Gateway statuses worth another attempt: rate limited or temporarily broken
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class PaymentError(Exception):
+    """The gateway rejected the request or could not be reached."""
+
+
+class TransientPaymentError(PaymentError):
+    """A failure that may succeed on retry (timeout, dropped connection, 5xx)."""
+
+
+class GatewayResponse(NamedTuple):
+    status: int
+    body: Dict
+    retry_after: Optional[float] = None
+
+
+class Transport(ABC):
+    """Sends one JSON request to the gateway and returns its JSON response."""
+
+    @abstractmethod
+    def request(self, method: str, path: str, body: Dict, headers: Dict[str, str]) -> GatewayResponse:
+        """Send one request; network failures raise TransientPaymentError."""
+
+    @abstractmethod
+    def close(self) -> None:
+        """Release any connections held."""
+
+
+class HttpTransport(Transport):
+    """HTTP(S) transport with one persistent keep-alive connection per thread."""
+
+    def __init__(self, base_url: str, timeout: float = PAYMENT_TIMEOUT):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ValueError(f'Invalid payment gateway URL: {base_url!r}')
+        self._connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                                  else http.client.HTTPConnection)
+        self._host = parts.hostname
+        self._port = parts.port
+        self._prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[http.client.HTTPConnection] = []
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connection_class(self._host, self._port, timeout=self.timeout)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _discard(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+
+    def request(self, method: str, path: str, body: Dict, headers: Dict[str, str]) -> GatewayResponse:
+        payload = json.dumps(body).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Accept': 'application/json', **headers}
+        # A reused connection may have been closed by the server while idle;
+        # that shows up as a reset before any response, so resend once on a
+        # fresh connection (safe: the idempotency key is unchanged)
+        for attempt in range(2):
+            reused = getattr(self._local, 'conn', None) is not None
+            conn = self._connection()
+            try:
+                if conn.sock is None:
+                    # http.client writes headers and body separately; without
+                    # TCP_NODELAY the body waits on the server's delayed ACK
+                    conn.connect()
+                    conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                conn.request(method, self._prefix + path, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                self._discard()
+                if reused and attempt == 0:
+                    continue
+                raise TransientPaymentError(f'Connection to payment gateway lost: {e}') from e
+            except (socket.timeout, OSError, http.client.HTTPException) as e:
+                # The connection may still deliver a late response; never reuse it
+                self._discard()
+                raise TransientPaymentError(f'Payment gateway request failed: {e}') from e
+            if response.will_close:
+                self._discard()
+            return GatewayResponse(response.status, _decode(data), _retry_after(response.getheader('Retry-After')))
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class StubTransport(Transport):
+    """Serves gateway requests from an in-process PaymentGateway (no network)."""
+
+    def __init__(self, gateway: Optional[PaymentGateway] = None):
+        self.gateway = gateway or PaymentGateway()
+
+    def request(self, method: str, path: str, body: Dict, headers: Dict[str, str]) -> GatewayResponse:
+        try:
+            if path == '/payments':
+                result = self.gateway.process_payment(body['patron_id'], body['amount'])
+            elif path == '/payments/batch':
+                result = self.gateway.settle_fees(body['patron_id'], body['items'])
+            elif path == '/refunds':
+                result = self.gateway.refund_payment(body['transaction_id'], body['amount'])
+            else:
+                return GatewayResponse(404, {'error': f'Unknown path {path}'})
+        except ValueError as e:
+            return GatewayResponse(400, {'error': str(e)})
+        return GatewayResponse(200, result)
+
+    def close(self) -> None:
+        # No connections: requests are served in-process
+        return None
+
+
+def _decode(data: bytes) -> Dict:
+    try:
+        body = json.loads(data) if data else {}
+    except ValueError:
+        return {'error': data[:200].decode('utf-8', 'replace')}
+    return body if isinstance(body, dict) else {'result': body}
+
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by attempts and a time budget."""
+
+    def __init__(self, attempts: int = PAYMENT_RETRIES, base_delay: float = 0.1,
+                 max_delay: float = 2.0, deadline: float = PAYMENT_DEADLINE):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def delays(self) -> Iterator[float]:
+        """Delay before each retry (attempts - 1 of them)."""
+        for attempt in range(self.attempts - 1):
+            yield random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+
+class PaymentClient:
+    """Payment gateway client with timeouts, retries and idempotency keys."""
+
+    def __init__(self, transport: Transport, retry: Optional[RetryPolicy] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.transport = transport
+        self.retry = retry or RetryPolicy()
+        self._sleep = sleep
+
+    def process_payment(self, patron_id: str, amount: float, idempotency_key: Optional[str] = None) -> Dict:
+        """Charge a patron; returns the gateway's {"status", "transaction_id"}."""
+        return self._send('/payments', {'patron_id': str(patron_id), 'amount': amount}, idempotency_key)
+
+    def settle_fees(self, patron_id: str, items: List[Dict], idempotency_key: Optional[str] = None) -> Dict:
+        """
+        Pay several late fees for one patron as one gateway transaction.
+
+        Args:
+            items: [{"loan_id", "book_id", "amount"}, ...]
+
+        Returns:
+            dict: the gateway's {"status", "transaction_id", "amount"}
+        """
+        amount = round(sum(item['amount'] for item in items), 2)
+        body = {'patron_id': str(patron_id), 'amount': amount, 'items': items}
+        return self._send('/payments/batch', body, idempotency_key)
+
+    def refund_payment(self, transaction_id: str, amount: float, idempotency_key: Optional[str] = None) -> Dict:
+        """Refund (part of) a payment; returns the gateway's {"status"}."""
+        return self._send('/refunds', {'transaction_id': transaction_id, 'amount': amount}, idempotency_key)
+
+    def _send(self, path: str, body: Dict, idempotency_key: Optional[str]) -> Dict:
+        headers = {'Idempotency-Key': idempotency_key or uuid.uuid4().hex}
+        give_up_at = time.monotonic() + self.retry.deadline
+        delays = self.retry.delays()
+        while True:
+            try:
+                response = self.transport.request('POST', path, body, headers)
+            except TransientPaymentError as e:
+                error, wait = e, None
+            else:
+                if response.status not in RETRY_STATUSES:
+                    if response.status < 400 or response.status == 402:
+                        return response.body
+                    raise PaymentError(response.body.get('error') or f'Payment gateway returned {response.status}')
+                error = TransientPaymentError(f'Payment gateway returned {response.status}')
+                wait = response.retry_after
+            delay = next(delays, None)
+            if delay is None:
+                raise error
+            delay = max(delay, wait or 0.0)
+            if time.monotonic() + delay >= give_up_at:
+                raise error
+            self._sleep(delay)
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+_client: Optional[PaymentClient] = None
+_client_lock = threading.Lock()
+
+
+def get_payment_client() -> PaymentClient:
+    """The process-wide client, built from PAYMENT_GATEWAY_URL on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            transport = HttpTransport(PAYMENT_GATEWAY_URL) if PAYMENT_GATEWAY_URL else StubTransport()
+            _client = PaymentClient(transport)
+        return _client
@@ -14,3 +14,11 @@ class PaymentGateway:
         if amount is None or amount <= 0 or amount > 15:
             raise ValueError("Invalid refund amount")
         return {"status": "refund_success"}
+
+    def settle_fees(self, patron_id, items):
+        if not str(patron_id).isdigit():
+            raise ValueError("Invalid patron ID")
+        if not items or any(item.get("amount") is None or item["amount"] <= 0 for item in items):
+            raise ValueError("Invalid amount")
+        amount = round(sum(item["amount"] for item in items), 2)
+        return {"status": "success", "transaction_id": "TX12346", "amount": amount}
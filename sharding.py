@@ -0,0 +1,229 @@
+"""
+Sharded database access for Library Management System
+Routes catalog and loan operations to one SQLite file per library branch
+
+Each branch's books and borrow_records live in their own database file (a
+shard), so borrows and returns at different branches no longer queue for
+one file's write lock. An operation at one branch runs the ordinary
+database and service helpers with that branch's file swapped in for the
+calling thread (see database.use_database). Catalog search and patron loan
+reports run on every shard at once on a thread pool and merge the results,
+each tagged with its branch. Book ids are per shard, so a book is
+identified by its branch and id.
+
+A patron may borrow at any branch, up to MAX_BORROWED_BOOKS in total. A
+borrow counts the patron's open loans at the other branches and borrows
+with the allowance left, holding a lock for that patron throughout: a
+thread lock in this process and, across processes (e.g. gunicorn workers),
+an fcntl lock on one byte of a lock file chosen by the patron ID. Returns
+take no lock, since they only lower the count.
+
+Configuration (environment variables):
+    LIBRARY_SHARDS=branch=path,...   branch shards (unset: the app uses LIBRARY_DB only)
+    SHARD_THREADS=N                  scatter/gather threads (default: one per shard)
+"""
+
+import os
+import re
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+import database
+from services import library_service
+from services.fee_engine import fee_schedule
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+LIBRARY_SHARDS = os.getenv('LIBRARY_SHARDS', '')
+SHARD_THREADS = int(os.getenv('SHARD_THREADS', '0'))
+# Patrons share a lock when their IDs hash to the same stripe
+PATRON_LOCK_STRIPES = 4096
+
+_SEARCH_FIELDS = {'': ('title',), 'title': ('title',), 'author': ('author',)}
+
+
+def parse_shards(spec: str) -> Dict[str, str]:
+    """
+    Parse a "branch=path,branch=path" shard list.
+
+    Raises:
+        ValueError: if an entry is not branch=path.
+    """
+    shards = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        branch, _, path = (part.strip() for part in item.partition('='))
+        if not branch or not path:
+            raise ValueError(f'Shards must be given as branch=path, not {item!r}')
+        shards[branch] = path
+    return shards
+
+
+class ShardRouter:
+    """Routes operations to per-branch database files and gathers results from all of them."""
+
+    def __init__(self, shards: Dict[str, str], threads: Optional[int] = None,
+                 lock_file: Optional[str] = None):
+        if not shards:
+            raise ValueError('At least one shard is required')
+        self.shards = dict(shards)
+        self.threads = threads or SHARD_THREADS or len(self.shards)
+        self.lock_file = lock_file or f'{next(iter(self.shards.values()))}.patrons.lock'
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock_fd: Optional[IO] = None
+        self._setup_lock = threading.Lock()
+        self._patron_locks = [threading.Lock() for _ in range(PATRON_LOCK_STRIPES)]
+
+    @property
+    def branches(self) -> List[str]:
+        return list(self.shards)
+
+    def run(self, branch: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run `fn(*args, **kwargs)` against one branch's shard.
+
+        Raises:
+            ValueError: if the branch is unknown.
+        """
+        path = self.shards.get(branch)
+        if path is None:
+            raise ValueError(f'Unknown branch: {branch}')
+        with database.use_database(path):
+            return fn(*args, **kwargs)
+
+    def scatter(self, fn: Callable[..., Any], *args, branches: Optional[Iterable[str]] = None,
+                **kwargs) -> Dict[str, Any]:
+        """Run `fn(*args, **kwargs)` on every shard (or the given branches) in parallel, keyed by branch."""
+        branches = self.branches if branches is None else list(branches)
+        if len(branches) <= 1:
+            return {branch: self.run(branch, fn, *args, **kwargs) for branch in branches}
+        with self._setup_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.threads, thread_name_prefix='shard')
+        futures = {branch: self._executor.submit(self.run, branch, fn, *args, **kwargs) for branch in branches}
+        return {branch: future.result() for branch, future in futures.items()}
+
+    def prepare(self) -> None:
+        """Create or upgrade the schema of every shard."""
+        self.scatter(database.prepare_database, sample_data=False)
+
+    @contextmanager
+    def _patron_lock(self, patron_id: str) -> Iterator[None]:
+        stripe = zlib.crc32(str(patron_id).encode('utf-8')) % PATRON_LOCK_STRIPES
+        with self._patron_locks[stripe]:
+            if fcntl is None:
+                yield
+                return
+            with self._setup_lock:
+                # One descriptor for the router's lifetime: closing any
+                # descriptor of a file drops every fcntl lock the process holds on it
+                if self._lock_fd is None:
+                    self._lock_fd = open(self.lock_file, 'a')
+            fcntl.lockf(self._lock_fd, fcntl.LOCK_EX, 1, stripe)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._lock_fd, fcntl.LOCK_UN, 1, stripe)
+
+    def add_book(self, branch: str, title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
+        """Add a book to one branch's catalog (ISBNs are unique per branch)."""
+        return self.run(branch, library_service.add_book_to_catalog, title, author, isbn, total_copies)
+
+    def search(self, term: str, search_type: Optional[str] = None) -> List[Dict]:
+        """
+        Search every branch's catalog, as search_books_in_catalog does for one.
+
+        Each shard ranks its own matches; the merged list takes books whose
+        field starts with the term first, then alternates between branches
+        in their own rank order.
+
+        Raises:
+            ValueError: for fuzzy search, which has no index across shards.
+        """
+        q = (term or '').strip()
+        if not q:
+            return []
+        t = (search_type or '').strip().lower()
+        if t == 'fuzzy':
+            raise ValueError('Fuzzy search is not available across branches.')
+        if t == 'isbn':
+            found = self.scatter(database.get_book_by_isbn, q)
+            return [dict(book, branch=branch) for branch, book in found.items() if book]
+
+        fields = _SEARCH_FIELDS.get(t, ('title', 'author'))
+        needle = q.lower()
+        ranked = []
+        for order, (branch, books) in enumerate(self.scatter(database.search_books, q, fields).items()):
+            for rank, book in enumerate(books):
+                prefix = any(book[field].lower().startswith(needle) for field in fields)
+                ranked.append(((not prefix, rank, order), dict(book, branch=branch)))
+        ranked.sort(key=lambda entry: entry[0])
+        return [book for _, book in ranked]
+
+    def open_loan_counts(self, patron_id: str, branches: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """A patron's open loans at each branch."""
+        return self.scatter(database.get_patron_borrow_count, patron_id, branches=branches)
+
+    def borrow(self, branch: str, patron_id: str, book_id: int) -> Tuple[bool, str]:
+        """
+        Borrow a book at a branch, with the borrowing limit counted over all branches.
+
+        Raises:
+            ValueError: if the branch is unknown.
+        """
+        if branch not in self.shards:
+            raise ValueError(f'Unknown branch: {branch}')
+        with self._patron_lock(patron_id):
+            # One index lookup per shard: cheaper in turn here than handed to the pool
+            open_elsewhere = sum(self.run(other, database.get_patron_borrow_count, patron_id)
+                                 for other in self.branches if other != branch)
+            return self.run(branch, library_service.borrow_book_by_patron, patron_id, book_id, open_elsewhere)
+
+    def return_book(self, branch: str, patron_id: str, book_id: int) -> Tuple[bool, str]:
+        """Return a book to the branch it was borrowed from."""
+        return self.run(branch, library_service.return_book_by_patron, patron_id, book_id)
+
+    def patron_loans(self, patron_id: str) -> Dict:
+        """
+        A patron's open loans and late fees at every branch.
+
+        Returns:
+            dict: current (loans ordered by due date, each with its branch),
+                  count_current and total_fees
+
+        Raises:
+            ValueError: if the patron ID is malformed.
+        """
+        if not re.fullmatch(r'\d{6}', str(patron_id or '')):
+            raise ValueError('Invalid patron ID (must be exactly 6 digits).')
+        found = self.scatter(database.get_patron_active_loans, patron_id,
+                             database.epoch_day(date.today()), fee_schedule())
+        current = sorted((dict(loan, branch=branch) for branch, (loans, _) in found.items() for loan in loans),
+                         key=lambda loan: loan['due_date'])
+        for loan in current:
+            loan['borrow_date'] = database.from_epoch(loan['borrow_date']).isoformat()
+            loan['due_date'] = database.from_epoch(loan['due_date']).isoformat()
+        return {
+            'current': current,
+            'count_current': len(current),
+            'total_fees': round(sum(fees for _, fees in found.values()), 2),
+        }
+
+    def close(self) -> None:
+        """Stop the scatter threads and release the lock file."""
+        with self._setup_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            if self._lock_fd is not None:
+                self._lock_fd.close()
+                self._lock_fd = None
+
+
+router: Optional[ShardRouter] = ShardRouter(parse_shards(LIBRARY_SHARDS)) if LIBRARY_SHARDS else None
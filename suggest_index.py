@@ -0,0 +1,410 @@
+"""
+Autocomplete index for Library Management System
+Search-as-you-type suggestions from title/author words and ISBN prefixes
+
+Titles and authors are split into normalised words (lowercased, accents
+removed). The distinct words are kept in one sorted list and the ISBNs as
+numbers in a sorted array, so the words or ISBNs starting with what has been
+typed form one contiguous range, found by bisection. Suggestions are the
+books in that range borrowed most often (then the oldest first).
+
+Every word lists its books most borrowed first. A prefix covering a few
+words merges the heads of their lists; a wider one ("s", "978") merges the
+top books of the prefixes one character longer, kept from the last build,
+so no prefix costs more than a few short merges. Borrow counts only grow: a
+borrow moves the book up the lists it is in, and deleting or retitling a
+book drops just the kept lists it was part of. In a multi-word query the
+earlier words must match whole words of the book; the books of the rarest
+of them (or of the prefix, if fewer) are read best first until enough match.
+
+Like the fuzzy index, the index is held per process and brought up to date
+before each request from the book_changes counter and the borrow records
+added since.
+
+Configuration (environment variables):
+    SUGGEST_LIMIT=N    maximum number of suggestions (default 10)
+"""
+
+import heapq
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import database
+
+SUGGEST_LIMIT = int(os.getenv('SUGGEST_LIMIT', '10'))
+
+_WORD = re.compile(r'\w+')
+_ISBN_DIGITS = 13
+# Typed ISBNs may be grouped with hyphens or spaces
+_ISBN_SEPARATORS = re.compile(r'[\s-]')
+# Ranges of at most this many words / ISBNs are merged per request; wider ones are kept
+_MERGE_WORDS = 32
+_MERGE_ISBNS = 64
+# Sorts after every word that starts with a given prefix
+_END = '\U0010ffff'
+
+
+def normalise(text: str) -> str:
+    """Lowercase `text` and strip accents ("Émile" -> "emile")."""
+    text = text.lower()
+    if text.isascii():
+        return text
+    return ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+
+
+def tokens(text: str) -> List[str]:
+    """Distinct normalised words of `text`."""
+    return list(dict.fromkeys(_WORD.findall(normalise(text))))
+
+
+def _isbn_number(isbn: Optional[str]) -> int:
+    # A 13-digit ISBN as a number, or -1 for anything else
+    if isbn and len(isbn) == _ISBN_DIGITS and isbn.isascii() and isbn.isdigit():
+        return int(isbn)
+    return -1
+
+
+class SuggestIndex:
+    """Prefix index over title/author words and ISBNs, ranked by borrows, for one database file."""
+
+    def __init__(self, database_path: Optional[str] = None, limit: int = SUGGEST_LIMIT):
+        self.database = database_path
+        self.limit = limit
+        self.version = 0
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.version = 0
+        self.last_borrow = 0
+        # Books by position, ids ascending; text_hash tells indexed changes from copy count changes
+        self.ids = array('q')
+        self.text_hash = array('q')
+        self.live = bytearray()
+        self.borrows = array('q')
+        # Per position, its slice of book_tokens (word ids), and its ISBN number (-1 if none)
+        self.token_start = array('q')
+        self.token_count = array('H')
+        self.book_tokens = array('i')
+        self.isbns = array('q')
+        # Vocabulary: word -> word id; per word id the positions of its books, best ranked first
+        self.word_ids: Dict[str, int] = {}
+        self.vocabulary: List[str] = []
+        self.sorted_words: List[str] = []
+        self.postings: List[array] = []
+        # ISBN numbers ascending, with the position of each
+        self.isbn_keys = array('q')
+        self.isbn_positions = array('i')
+        # Kept top positions of wide word prefixes and ISBN prefixes
+        self.prefix_top: Dict[str, List[int]] = {}
+        self.isbn_top: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.live.count(0)
+
+    def _rank(self, pos: int) -> int:
+        # Sort key: most borrowed first, then lowest position
+        return pos - (self.borrows[pos] << 32)
+
+    def _add_word(self, word: str) -> int:
+        word_id = self.word_ids[word] = len(self.vocabulary)
+        self.vocabulary.append(word)
+        self.postings.append(array('i'))
+        return word_id
+
+    def _index(self, pos: int, title: str, author: str, isbn: str) -> None:
+        start = len(self.book_tokens)
+        for word in tokens(f'{title} {author}'):
+            word_id = self.word_ids.get(word)
+            if word_id is None:
+                word_id = self._add_word(word)
+            self.book_tokens.append(word_id)
+        count = min(len(self.book_tokens) - start, 0xFFFF)
+        if pos == len(self.token_start):
+            self.token_start.append(start)
+            self.token_count.append(count)
+            self.isbns.append(_isbn_number(isbn))
+        else:
+            self.token_start[pos] = start
+            self.token_count[pos] = count
+            self.isbns[pos] = _isbn_number(isbn)
+
+    def _append(self, book_id: int, title: str, author: str, isbn: str) -> int:
+        self.ids.append(book_id)
+        self.text_hash.append(hash((title, author, isbn)))
+        self.live.append(1)
+        self.borrows.append(0)
+        pos = len(self.ids) - 1
+        self._index(pos, title, author, isbn)
+        return pos
+
+    def _words_of(self, pos: int) -> array:
+        start = self.token_start[pos]
+        return self.book_tokens[start:start + self.token_count[pos]]
+
+    def _position(self, book_id: int) -> int:
+        pos = bisect_left(self.ids, book_id)
+        return pos if pos < len(self.ids) and self.ids[pos] == book_id else -1
+
+    def refresh(self) -> int:
+        """
+        Bring the index up to date with the database.
+
+        Returns:
+            int: the number of changed books applied
+        """
+        with self._lock:
+            if self.database != database.DATABASE:
+                self.database = database.DATABASE
+                self._reset()
+            latest = database.get_catalog_version()
+            changed = 0
+            if latest != self.version:
+                if self.version == 0 or latest < self.version:
+                    return self._load()
+                changed = self._apply_changes()
+            last, counts = database.get_borrow_counts(self.last_borrow)
+            if last < self.last_borrow:
+                return self._load()
+            self.last_borrow = last
+            for book_id, count in counts.items():
+                pos = self._position(book_id)
+                if pos >= 0:
+                    self._borrowed(pos, count)
+            return changed
+
+    def _borrowed(self, pos: int, count: int) -> None:
+        # Move a book up its words' posting lists after `count` more borrows
+        if not self.live[pos]:
+            self.borrows[pos] += count
+            return
+        postings = [self.postings[word_id] for word_id in self._words_of(pos)]
+        for positions in postings:
+            del positions[bisect_left(positions, self._rank(pos), key=self._rank)]
+        self.borrows[pos] += count
+        for positions in postings:
+            insort(positions, pos, key=self._rank)
+        self._promote(pos)
+
+    def _load(self) -> int:
+        self._reset()
+        for seq, book_id, title, author, isbn, total, available in database.iter_book_changes(0):
+            self._append(book_id, title, author, isbn)
+            self.version = max(self.version, seq)
+        self.last_borrow, counts = database.get_borrow_counts()
+        for book_id, count in counts.items():
+            pos = self._position(book_id)
+            if pos >= 0:
+                self.borrows[pos] = count
+        self.sorted_words = sorted(self.vocabulary)
+        pairs = sorted((isbn, pos) for pos, isbn in enumerate(self.isbns) if isbn >= 0)
+        self.isbn_keys = array('q', (isbn for isbn, _ in pairs))
+        self.isbn_positions = array('i', (pos for _, pos in pairs))
+        # Fill the posting lists in rank order: borrowed books, then the rest
+        borrowed = sorted((pos for pos in range(len(self.ids)) if self.borrows[pos]), key=self._rank)
+        rest = (pos for pos in range(len(self.ids)) if not self.borrows[pos])
+        postings = self.postings
+        for ranked in (borrowed, rest):
+            for pos in ranked:
+                for word_id in self._words_of(pos):
+                    postings[word_id].append(pos)
+        # Keep the top books of every wide prefix now rather than on a first keystroke
+        self._word_prefix_top('')
+        self._isbn_prefix_top('')
+        return len(self.ids)
+
+    def _apply_changes(self) -> int:
+        changes = list(database.iter_book_changes(self.version))
+        known_words = len(self.vocabulary)
+        added = []
+        for seq, book_id, title, author, isbn, total, available in changes:
+            pos = self._position(book_id)
+            if pos >= 0:
+                if title is None:
+                    if self.live[pos]:
+                        self._remove(pos)
+                        self.live[pos] = 0
+                elif hash((title, author, isbn)) != self.text_hash[pos] or not self.live[pos]:
+                    if self.live[pos]:
+                        self._remove(pos)
+                    self.text_hash[pos] = hash((title, author, isbn))
+                    self.live[pos] = 1
+                    self._index(pos, title, author, isbn)
+                    added.append(pos)
+            elif title is not None:
+                if self.ids and book_id < self.ids[-1]:
+                    # New ids are appended in ascending order; an older one needs a full reload
+                    return self._load()
+                added.append(self._append(book_id, title, author, isbn))
+        for word in self.vocabulary[known_words:]:
+            insort(self.sorted_words, word)
+        for pos in added:
+            for word_id in self._words_of(pos):
+                insort(self.postings[word_id], pos, key=self._rank)
+            if self.isbns[pos] >= 0:
+                i = bisect_left(self.isbn_keys, self.isbns[pos])
+                self.isbn_keys.insert(i, self.isbns[pos])
+                self.isbn_positions.insert(i, pos)
+            self._promote(pos)
+        self.version = changes[-1][0] if changes else self.version
+        return len(changes)
+
+    def _remove(self, pos: int) -> None:
+        # Take a live book out of its words' postings, the kept lists and the ISBN array
+        for word_id in self._words_of(pos):
+            positions = self.postings[word_id]
+            del positions[bisect_left(positions, self._rank(pos), key=self._rank)]
+            self._forget(self.prefix_top, self.vocabulary[word_id], pos)
+        isbn = self.isbns[pos]
+        if isbn >= 0:
+            i = bisect_left(self.isbn_keys, isbn)
+            while self.isbn_positions[i] != pos:
+                i += 1
+            del self.isbn_keys[i]
+            del self.isbn_positions[i]
+            self._forget(self.isbn_top, f'{isbn:013d}', pos)
+            self.isbns[pos] = -1
+
+    def _forget(self, kept: Dict[str, List[int]], key: str, pos: int) -> None:
+        # Drop the kept lists of the prefixes of `key` that hold `pos` (rebuilt when next asked for)
+        for n in range(len(key) + 1):
+            top = kept.get(key[:n])
+            if top is not None and pos in top:
+                del kept[key[:n]]
+
+    def _promote(self, pos: int) -> None:
+        # Offer a new or more borrowed book to every kept list it may belong in
+        for word_id in self._words_of(pos):
+            word = self.vocabulary[word_id]
+            for n in range(len(word) + 1):
+                top = self.prefix_top.get(word[:n])
+                if top is not None:
+                    self._offer(top, pos)
+        if self.isbns[pos] >= 0 and self.isbn_top:
+            isbn = f'{self.isbns[pos]:013d}'
+            for n in range(len(isbn) + 1):
+                top = self.isbn_top.get(isbn[:n])
+                if top is not None:
+                    self._offer(top, pos)
+
+    def _offer(self, top: List[int], pos: int) -> None:
+        if pos in top:
+            top.remove(pos)
+        elif len(top) >= self.limit and self._rank(top[-1]) < self._rank(pos):
+            return
+        insort(top, pos, key=self._rank)
+        del top[self.limit:]
+
+    def _merge(self, lists: Iterable[List[int]]) -> List[int]:
+        merged, seen = [], set()
+        for pos in heapq.merge(*lists, key=self._rank):
+            if pos not in seen:
+                seen.add(pos)
+                merged.append(pos)
+                if len(merged) == self.limit:
+                    break
+        return merged
+
+    def _word_prefix_top(self, prefix: str) -> List[int]:
+        words = self.sorted_words
+        lo = bisect_left(words, prefix)
+        hi = bisect_left(words, prefix + _END, lo)
+        if hi - lo <= _MERGE_WORDS:
+            return self._merge(self.postings[self.word_ids[word]][:self.limit] for word in words[lo:hi])
+        top = self.prefix_top.get(prefix)
+        if top is None:
+            lists = []
+            if words[lo] == prefix:
+                lists.append(self.postings[self.word_ids[prefix]][:self.limit])
+                lo += 1
+            while lo < hi:
+                child = words[lo][:len(prefix) + 1]
+                lists.append(self._word_prefix_top(child))
+                lo = bisect_left(words, child + _END, lo, hi)
+            top = self.prefix_top[prefix] = self._merge(lists)
+        return top
+
+    def _isbn_prefix_top(self, digits: str) -> List[int]:
+        scale = 10 ** (_ISBN_DIGITS - len(digits))
+        low = int(digits or 0) * scale
+        lo = bisect_left(self.isbn_keys, low)
+        hi = bisect_left(self.isbn_keys, low + scale, lo)
+        if hi - lo <= _MERGE_ISBNS:
+            return heapq.nsmallest(self.limit, self.isbn_positions[lo:hi], key=self._rank)
+        top = self.isbn_top.get(digits)
+        if top is None:
+            top = self.isbn_top[digits] = self._merge(self._isbn_prefix_top(digits + d) for d in '0123456789')
+        return top
+
+    def _containing(self, words: List[str], prefix: str) -> List[int]:
+        # Books with all of `words` and another word starting with `prefix`, best first
+        word_ids = [self.word_ids.get(word) for word in words]
+        if None in word_ids:
+            return []
+        required = set(word_ids)
+        candidates: Iterable[int] = min((self.postings[word_id] for word_id in required), key=len)
+        if prefix:
+            lo = bisect_left(self.sorted_words, prefix)
+            hi = bisect_left(self.sorted_words, prefix + _END, lo)
+            if hi - lo <= _MERGE_WORDS:
+                lists = [self.postings[self.word_ids[word]] for word in self.sorted_words[lo:hi]]
+                if sum(map(len, lists)) < len(candidates):
+                    candidates = heapq.merge(*lists, key=self._rank)
+        vocabulary = self.vocabulary
+        matches: List[int] = []
+        for pos in candidates:
+            book = self._words_of(pos)
+            if required.issubset(book) and pos not in matches and (not prefix or any(
+                    vocabulary[word_id].startswith(prefix) for word_id in book if word_id not in required)):
+                matches.append(pos)
+                if len(matches) == self.limit:
+                    break
+        return matches
+
+    def suggest(self, text: str, limit: int = SUGGEST_LIMIT) -> List[Tuple[int, int]]:
+        """
+        (book id, borrows) of up to `limit` books matching what has been
+        typed, most borrowed first. The last word is a prefix unless the
+        text ends in a space or punctuation.
+        """
+        typed = _WORD.findall(normalise(text))
+        limit = min(limit, self.limit)
+        if not typed or limit <= 0:
+            return []
+        words, prefix = (typed[:-1], typed[-1]) if text[-1].isalnum() else (typed, '')
+        digits = _ISBN_SEPARATORS.sub('', text)
+        with self._lock:
+            ranked = self._containing(words, prefix) if words else self._word_prefix_top(prefix)
+            if len(digits) <= _ISBN_DIGITS and digits.isascii() and digits.isdigit():
+                ranked = self._merge([ranked, self._isbn_prefix_top(digits)])
+            return [(self.ids[pos], self.borrows[pos]) for pos in ranked[:limit]]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'books': len(self), 'words': len(self.vocabulary), 'version': self.version,
+                    'kept_prefixes': len(self.prefix_top) + len(self.isbn_top)}
+
+
+index = SuggestIndex()
+
+
+def suggest_books(text: str, limit: Optional[int] = None) -> List[Dict]:
+    """
+    Autocomplete suggestions for a search box.
+
+    Returns:
+        list: up to `limit` books whose title/author words or ISBN start with
+              the text typed so far, most borrowed first, each with its 'borrows'
+    """
+    limit = SUGGEST_LIMIT if limit is None else limit
+    index.refresh()
+    borrows = dict(index.suggest(text, limit))
+    books = database.get_books_by_ids(list(borrows))
+    for book in books:
+        book['borrows'] = borrows[book['id']]
+    return books
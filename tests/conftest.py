@@ -11,6 +11,14 @@ def client():
     with app.test_client() as c:
         yield c
 
+@pytest.fixture()
+def tmp_db(monkeypatch, tmp_path):
+    """An empty database in a temporary file in place of library.db; yields the temporary directory."""
+    monkeypatch.setattr(database, "DATABASE", str(tmp_path / "library.db"))
+    database.init_database()
+    yield tmp_path
+    database.close_all_connections()
+
 @pytest.fixture(autouse=True)
 def reset_state():
     reload(database)
@@ -0,0 +1,128 @@
+"""
+Fake payment gateway: a local HTTP/1.1 keep-alive server speaking the
+gateway's JSON protocol, with injectable latency, error statuses, stalls and
+dropped connections. Used by the payment client tests and benchmark.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Charges above this are declined, like a card over its limit
+DECLINE_OVER = 100.0
+
+
+class FakeGateway:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = []          # (path, idempotency key, body), in arrival order
+        self.charges = {}           # idempotency key -> response body
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0          # most requests being processed at once
+        self._faults = []
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def fail_next(self, *statuses: int, retry_after: float = None):
+        """Answer the next requests with these error statuses."""
+        self._faults += [("status", status, retry_after) for status in statuses]
+
+    def drop_next(self, count: int = 1):
+        """Close the connection without answering the next requests."""
+        self._faults += [("drop", None, None)] * count
+
+    def stall_next(self, seconds: float):
+        """Hold the next request for `seconds` (past a client's timeout) before processing it."""
+        self._faults.append(("stall", seconds, None))
+
+    def paths(self):
+        return [path for path, _, _ in self.requests]
+
+    def start(self) -> "FakeGateway":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(self))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handle(self, path, key, body):
+        with self._lock:
+            self.requests.append((path, key, body))
+            fault = self._faults.pop(0) if self._faults else None
+        if fault and fault[0] == "drop":
+            return None
+        if fault and fault[0] == "status":
+            return fault[1], {"error": "Injected failure"}, fault[2]
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.latency + (fault[1] if fault else 0))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        amount = body.get("amount")
+        if path != "/refunds" and (not str(body.get("patron_id", "")).isdigit() or not amount or amount <= 0):
+            return 400, {"error": "Invalid payment"}, None
+        with self._lock:
+            # A repeated idempotency key gets the first answer, without a new charge
+            if key not in self.charges:
+                if path == "/refunds":
+                    self.charges[key] = {"status": "refund_success"}
+                elif amount > DECLINE_OVER:
+                    self.charges[key] = {"status": "declined"}
+                else:
+                    self.charges[key] = {"status": "success", "transaction_id": f"TX{len(self.charges) + 1:06d}",
+                                         "amount": amount}
+            response = self.charges[key]
+        return (402 if response["status"] == "declined" else 200), response, None
+
+
+def _handler(gateway: FakeGateway):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; don't let Nagle delay the body
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with gateway._lock:
+                gateway.connections += 1
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            answer = gateway._handle(self.path, self.headers.get("Idempotency-Key"), body)
+            if answer is None:
+                self.close_connection = True
+                return
+            status, payload, retry_after = answer
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            if retry_after is not None:
+                self.send_header("Retry-After", str(retry_after))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+import async_database
+from app import create_app
+from asgi import create_asgi_app
+from routes import async_api_routes
+
+
+async def call(app, path, query="", method="GET", headers=()):
+    scope = {"type": "http", "method": method, "path": path, "query_string": query.encode(),
+             "headers": list(headers), "http_version": "1.1", "scheme": "http", "root_path": "",
+             "server": ("testserver", 80), "client": ("127.0.0.1", 1234)}
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    body = b"".join(m.get("body", b"") for m in sent[1:])
+    return start["status"], dict(start["headers"]), body
+
+
+@pytest.fixture()
+def apps(tmp_db, monkeypatch):
+    monkeypatch.setattr(async_database, "executor", async_database.AsyncExecutor(threads=4))
+    flask_app = create_app()
+    yield create_asgi_app(flask_app), flask_app.test_client()
+    async_database.executor.shutdown()
+
+
+@pytest.mark.parametrize("path, query", [
+    ("/api/search", "q=gatsby&type=title"),
+    ("/api/search", "q="),
+    ("/api/late_fee/123456/3", ""),
+    ("/api/books", "limit=2"),
+    ("/api/books", "cursor=bogus"),
+    ("/api/patron/123456/status", "limit=1"),
+    ("/api/patron/12ab/status", ""),
+])
+def test_async_endpoints_match_sync_api(apps, path, query):
+    asgi_app, client = apps
+    status, headers, body = asyncio.run(call(asgi_app, path, query))
+    expected = client.get(f"{path}?{query}")
+    assert status == expected.status_code
+    assert headers[b"content-type"] == b"application/json"
+    assert json.loads(body) == expected.get_json()
+
+
+def test_concurrent_requests_share_the_executor(apps):
+    asgi_app, _ = apps
+
+    async def burst():
+        return await asyncio.gather(*(call(asgi_app, "/api/search", "q=orwell&type=author") for _ in range(50)))
+
+    results = asyncio.run(burst())
+    assert {status for status, _, _ in results} == {200}
+    assert all(json.loads(body)["count"] == 1 for _, _, body in results)
+
+
+def test_full_executor_sheds_load(apps, monkeypatch):
+    asgi_app, _ = apps
+    monkeypatch.setattr(async_database, "executor", async_database.AsyncExecutor(threads=1, max_pending=1))
+    release = threading.Event()
+    monkeypatch.setattr(async_api_routes, "search_books_in_catalog", lambda term, kind: release.wait(5) and [])
+
+    async def two_requests():
+        first = asyncio.ensure_future(call(asgi_app, "/api/search", "q=slow"))
+        await asyncio.sleep(0.05)
+        second = await call(asgi_app, "/api/search", "q=slow")
+        release.set()
+        return await first, second
+
+    first, second = asyncio.run(two_requests())
+    assert first[0] == 200
+    assert second[0] == 503 and second[1][b"retry-after"] == b"1"
+
+
+def test_other_routes_fall_back_to_flask(apps):
+    asgi_app, _ = apps
+    status, headers, body = asyncio.run(call(asgi_app, "/catalog"))
+    assert status == 200 and b"The Great Gatsby" in body
+    status, _, body = asyncio.run(call(asgi_app, "/api/books", "stream=1"))
+    assert status == 200 and body.count(b"\n") >= 3
@@ -0,0 +1,66 @@
+import pytest
+
+import database
+from app import create_app
+from services.library_service import borrow_books_by_patron, return_books_by_patron
+
+
+@pytest.fixture()
+def kiosk(tmp_db):
+    app = create_app()
+    ids = []
+    for i in range(1, 8):
+        copies = 0 if i == 7 else 2
+        database.insert_book(f"Kiosk {i}", "A", f"97800000020{i:02d}", 2, copies)
+        ids.append(database.get_book_by_isbn(f"97800000020{i:02d}")["id"])
+    with app.test_client() as c:
+        yield c, ids
+
+
+def test_batch_borrow_reports_each_book(kiosk):
+    _, ids = kiosk
+    report = borrow_books_by_patron("333333", [ids[0], ids[1], ids[6], 99999, ids[0]])
+    assert report["borrowed"] == 2
+    assert [r["success"] for r in report["results"]] == [True, True, False, False, False]
+    assert [r["message"] for r in report["results"][2:]] == [
+        "This book is currently not available.", "Book not found.", "You already have this book borrowed."]
+    assert database.get_book_by_id(ids[0])["available_copies"] == 1
+    assert database.get_patron_borrow_count("333333") == 2
+
+
+def test_batch_borrow_applies_limit_to_whole_set(kiosk):
+    _, ids = kiosk
+    borrow_books_by_patron("333333", ids[:3])
+    report = borrow_books_by_patron("333333", ids[3:6])
+    assert [r["success"] for r in report["results"]] == [True, True, False]
+    assert "maximum borrowing limit" in report["results"][2]["message"]
+    assert database.get_book_by_id(ids[5])["available_copies"] == 2
+
+
+def test_batch_return(kiosk):
+    _, ids = kiosk
+    borrow_books_by_patron("333333", ids[:2])
+    report = return_books_by_patron("333333", [ids[0], ids[1], ids[2], ids[0]])
+    assert report["returned"] == 2
+    assert [r["success"] for r in report["results"]] == [True, True, False, False]
+    assert database.get_patron_borrow_count("333333") == 0
+    assert database.get_book_by_id(ids[0])["available_copies"] == 2
+
+
+@pytest.mark.parametrize("patron_id, book_ids", [
+    ("12ab", [1]), ("333333", []), ("333333", "1,2"), ("333333", ["1"]), ("333333", list(range(1, 30))),
+])
+def test_batch_rejects_malformed_requests(kiosk, patron_id, book_ids):
+    with pytest.raises(ValueError):
+        borrow_books_by_patron(patron_id, book_ids)
+
+
+def test_batch_api_endpoints(kiosk):
+    client, ids = kiosk
+    r = client.post("/api/borrow/batch", json={"patron_id": "333333", "book_ids": ids[:3]})
+    assert r.status_code == 200 and r.get_json()["borrowed"] == 3
+    r = client.post("/api/return/batch", json={"patron_id": "333333", "book_ids": ids[:3]})
+    assert r.status_code == 200 and r.get_json()["returned"] == 3
+
+    assert client.post("/api/borrow/batch", json=[1, 2]).status_code == 400
+    assert client.post("/api/return/batch", json={"patron_id": "1", "book_ids": [1]}).status_code == 400
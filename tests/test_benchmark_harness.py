@@ -0,0 +1,26 @@
+from benchmarks import harness
+
+
+def test_summarize_percentiles():
+    result = harness.summarize([i / 1000 for i in range(1, 101)], elapsed=2.0)
+    assert result["requests"] == 100 and result["req_per_s"] == 50.0
+    assert result["p50_ms"] < result["p95_ms"] < result["p99_ms"] <= 100
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"/catalog": {"p95_ms": 10.0, "req_per_s": 100.0},
+                "/search": {"p95_ms": 10.0, "req_per_s": 100.0}}
+    results = {"/catalog": {"p95_ms": 11.0, "req_per_s": 95.0},
+               "/search": {"p95_ms": 20.0, "req_per_s": 50.0}}
+    regressions = harness.compare(results, baseline, tolerance=0.2)
+    assert len(regressions) == 2 and all(r.startswith("/search") for r in regressions)
+
+
+def test_small_run_through_test_client(tmp_path, capsys):
+    out = tmp_path / "results.json"
+    code = harness.main(["--books", "50", "--patrons", "10", "--history", "100", "--requests", "5",
+                         "--db", str(tmp_path / "bench.db"), "--output", str(out)])
+    assert code == 0
+    assert "/api/late_fee" in out.read_text()
+    assert harness.main(["--requests", "5", "--db", str(tmp_path / "bench.db"),
+                         "--endpoints", "/catalog", "--baseline", str(out), "--tolerance", "1000"]) == 0
@@ -0,0 +1,74 @@
+import sqlite3
+
+import pytest
+
+import database
+from services.library_service import borrow_book_by_patron
+
+
+@pytest.fixture()
+def cached(tmp_db):
+    database.insert_book("Cached", "A", "9780000001101", 2, 2)
+
+
+def test_repeated_lookups_hit_cache(cached):
+    database.get_book_by_id(1)
+    database.get_book_by_id(1)
+    database.get_book_by_isbn("9780000001101")
+    stats = database.get_book_cache_stats()
+    assert stats["misses"] == 1 and stats["hits"] == 2
+
+
+def test_cached_copies_are_not_shared(cached):
+    database.get_book_by_id(1)["title"] = "Mutated"
+    assert database.get_book_by_id(1)["title"] == "Cached"
+
+
+@pytest.mark.parametrize("write", [
+    lambda: database.update_book_availability(1, -1),
+    lambda: borrow_book_by_patron("123456", 1),
+])
+def test_writes_invalidate_both_keys(cached, write):
+    assert database.get_book_by_id(1)["available_copies"] == 2
+    assert database.get_book_by_isbn("9780000001101")["available_copies"] == 2
+    write()
+    assert database.get_book_by_id(1)["available_copies"] == 1
+    assert database.get_book_by_isbn("9780000001101")["available_copies"] == 1
+
+
+def test_lru_eviction(cached, monkeypatch):
+    monkeypatch.setattr(database, "book_cache", database.BookCache(max_size=4))
+    database.insert_book("Second", "A", "9780000001102", 1, 1)
+    database.insert_book("Third", "A", "9780000001103", 1, 1)
+    for book_id in (1, 2, 3):
+        database.get_book_by_id(book_id)
+    assert database.get_book_cache_stats()["evictions"] == 2
+    database.get_book_by_id(1)
+    assert database.get_book_cache_stats()["misses"] == 4
+
+
+def test_entries_expire_after_ttl(cached, monkeypatch):
+    monkeypatch.setattr(database, "book_cache", database.BookCache(ttl=-1))
+    database.get_book_by_id(1)
+    database.get_book_by_id(1)
+    assert database.get_book_cache_stats()["hits"] == 0
+
+
+def _external_update():
+    other = sqlite3.connect(database.DATABASE)
+    other.execute("UPDATE books SET available_copies = 0 WHERE id = 1")
+    other.commit()
+    other.close()
+
+
+def test_external_writes_are_seen_with_cross_worker_check(cached, monkeypatch):
+    monkeypatch.setattr(database, "BOOK_CACHE_CROSS_WORKER", True)
+    database.get_book_by_id(1)
+    _external_update()
+    assert database.get_book_by_id(1)["available_copies"] == 0
+
+
+def test_external_writes_are_cached_until_ttl_without_check(cached):
+    database.get_book_by_id(1)
+    _external_update()
+    assert database.get_book_by_id(1)["available_copies"] == 2
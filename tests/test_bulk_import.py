@@ -0,0 +1,65 @@
+import io
+import json
+
+import database
+from app import create_app
+from services import import_service
+
+
+CSV_FEED = """title,author,isbn,total_copies
+Bulk One,Author A,9780000000501,2
+Bulk Two,Author B,9780000000502,1
+,Author C,9780000000503,1
+Bulk Four,Author D,12345,1
+Bulk Five,Author E,9780000000505,zero
+Bulk One Again,Author A,9780000000501,1
+Bulk Six,Author F,9780743273565,1
+"""
+
+
+def test_csv_import_reports_each_rejected_row(tmp_db):
+    database.insert_book("Existing", "X", "9780743273565", 1, 1)
+    report = import_service.import_books(import_service.read_book_rows(io.StringIO(CSV_FEED), "csv"), chunk_size=2)
+
+    assert report["total_rows"] == 7
+    assert report["imported"] == 2
+    assert [(e["line"], e["error"]) for e in report["errors"]] == [
+        (4, "Title is required."),
+        (5, "ISBN must be exactly 13 digits."),
+        (6, "Total copies must be a positive integer."),
+        (7, "Duplicate ISBN in import feed."),
+        (8, "A book with this ISBN already exists."),
+    ]
+    assert database.get_book_by_isbn("9780000000501")["available_copies"] == 2
+
+
+def test_jsonl_import_skips_unparseable_lines(tmp_db):
+    feed = io.StringIO('{"title": "J1", "author": "A", "isbn": "9780000000601", "total_copies": 1}\n'
+                       'not json\n\n[1, 2]\n'
+                       '{"title": "J2", "author": "A", "isbn": "9780000000602", "total_copies": "3"}\n')
+    report = import_service.import_books(import_service.read_book_rows(feed, "jsonl"))
+    assert report["imported"] == 2
+    assert [(e["line"], e["isbn"], e["error"]) for e in report["errors"]] == [
+        (2, None, "Invalid JSON on this line."), (4, None, "Expected a JSON object.")]
+
+
+def test_cli_imports_file(tmp_db, capsys):
+    path = tmp_db / "feed.jsonl"
+    path.write_text("\n".join(json.dumps({"title": f"C{i}", "author": "A", "isbn": f"97800000007{i:02d}",
+                                          "total_copies": 1}) for i in range(5)))
+    assert import_service.main([str(path)]) == 0
+    assert "Imported 5 of 5 rows" in capsys.readouterr().out
+    assert database.get_book_by_isbn("9780000000704")["title"] == "C4"
+
+
+def test_bulk_endpoint_accepts_csv_and_json(tmp_db):
+    app = create_app()
+    with app.test_client() as c:
+        r = c.post("/api/books/bulk", data=CSV_FEED, content_type="text/csv")
+        assert r.status_code == 200 and r.get_json()["imported"] == 2
+
+        r = c.post("/api/books/bulk", json=[{"title": "Json", "author": "A", "isbn": "9780000000801", "total_copies": 1}])
+        assert r.get_json()["imported"] == 1
+
+        r = c.post("/api/books/bulk", data="x", content_type="application/octet-stream")
+        assert r.status_code == 415
@@ -0,0 +1,64 @@
+import pytest
+
+import database
+from app import create_app
+from services.library_service import get_catalog_page
+
+
+@pytest.fixture()
+def paged_client(tmp_db):
+    app = create_app()
+    app.config.update(TESTING=True)
+    for i in range(1, 8):
+        database.insert_book(f"Paged {i:02d}", "A", f"97800000003{i:02d}", 1, 1)
+    database.insert_book("Paged 01", "B", "9780000000399", 1, 1)  # duplicate title
+    with app.test_client() as c:
+        yield c
+
+
+def _walk(limit):
+    titles, cursor = [], None
+    while True:
+        page = get_catalog_page(cursor, limit)
+        titles += [(b["title"], b["id"]) for b in page["books"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            return titles
+
+
+def test_keyset_pages_cover_catalog_once_in_order(paged_client):
+    everything = [(b["title"], b["id"]) for b in database.get_all_books()]
+    walked = _walk(3)
+    assert walked == sorted(everything)
+    assert len(walked) == len(set(walked)) == 11
+
+
+def test_invalid_cursor_is_rejected(paged_client):
+    with pytest.raises(ValueError):
+        get_catalog_page("not-a-cursor")
+    r = paged_client.get("/api/books?cursor=not-a-cursor")
+    assert r.status_code == 400
+
+
+def test_catalog_page_links_to_next_page(paged_client):
+    for i in range(60):
+        database.insert_book(f"Filler {i:02d}", "A", f"97800000004{i:02d}", 1, 1)
+    r = paged_client.get("/catalog")
+    assert r.status_code == 200 and b"Next Page" in r.data and b"Paged 07" not in r.data
+
+
+def test_api_books_pages_with_cursor(paged_client):
+    first = paged_client.get("/api/books?limit=5").get_json()
+    assert first["count"] == 5 and first["next_cursor"]
+    second = paged_client.get(f"/api/books?limit=5&cursor={first['next_cursor']}").get_json()
+    assert second["books"][0]["title"] >= first["books"][-1]["title"]
+    assert not {b["id"] for b in first["books"]} & {b["id"] for b in second["books"]}
+
+
+def test_api_books_stream_yields_json_lines(paged_client):
+    import json
+
+    r = paged_client.get("/api/books?stream=1")
+    assert r.mimetype == "application/x-ndjson"
+    books = [json.loads(line) for line in r.data.decode().splitlines()]
+    assert [b["id"] for b in books] == [b["id"] for b in sorted(database.get_all_books(), key=lambda b: (b["title"], b["id"]))]
@@ -0,0 +1,81 @@
+import pytest
+
+import catalog_snapshot
+import database
+from services.library_service import borrow_book_by_patron, get_catalog_page, search_books_in_catalog
+
+
+@pytest.fixture()
+def snapshot(tmp_db, monkeypatch):
+    for i, (title, author) in enumerate([("River Song", "Ann Lee"), ("Glass City", "Bo Ray"),
+                                         ("Silent River", "Ann Lee"), ("Glass City", "Cy Oh"),
+                                         ("Winter Night", "Dee River")]):
+        database.insert_book(title, author, f"97800000040{i:02d}", 2, 2)
+    snap = catalog_snapshot.CatalogSnapshot()
+    monkeypatch.setattr(catalog_snapshot, "snapshot", snap)
+    monkeypatch.setattr(catalog_snapshot, "ENABLED", True)
+    yield snap
+
+
+def _pages(snap, limit):
+    books, after = [], None
+    while True:
+        page = snap.page(after, limit)
+        if not page:
+            return books
+        books += page
+        after = (page[-1]["title"], page[-1]["id"])
+
+
+def test_pages_match_database(snapshot):
+    assert snapshot.refresh() == 5
+    for limit in (1, 2, 50):
+        assert _pages(snapshot, limit) == database.get_books_page(None, 100)
+
+
+def test_refresh_applies_only_changes(snapshot):
+    snapshot.refresh()
+    assert snapshot.refresh() == 0
+
+    database.insert_book("Amber Glass", "Ann Lee", "9780000004099", 1, 1)
+    conn = database.get_db_connection()
+    conn.execute("UPDATE books SET title = 'Zebra River' WHERE id = 1")
+    conn.execute("DELETE FROM books WHERE id = 2")
+    conn.commit()
+    borrow_book_by_patron("444444", 3)
+
+    assert snapshot.refresh() == 4
+    assert _pages(snapshot, 2) == database.get_books_page(None, 100)
+    assert len(snapshot) == 5
+    assert snapshot.page(None, 1)[0]["title"] == "Amber Glass"
+    assert [b["available_copies"] for b in snapshot.page() if b["id"] == 3] == [1]
+
+
+@pytest.mark.parametrize("term, fields", [
+    ("river", ("title",)), ("river", ("title", "author")), ("ann", ("author",)),
+    ("GLASS", ("title",)), ("zzz", ("title",)), ("ri", ("title", "author")),
+])
+def test_search_matches_database(snapshot, term, fields):
+    snapshot.refresh()
+    found = snapshot.search(term, fields)
+    assert [b["id"] for b in found] == [b["id"] for b in database.search_books(term, fields)]
+    prefixes = [any(b[f].lower().startswith(term.lower()) for f in fields) for b in found]
+    assert prefixes == sorted(prefixes, reverse=True)
+
+
+def test_search_order_does_not_depend_on_the_index(snapshot):
+    # bm25 relevance would put the title repeating "river" first
+    for i, title in enumerate(["Old River River River", "Down River", "A Tale of Rivers and a River"]):
+        database.insert_book(title, "Fay Gill", f"97800000040{50 + i}", 1, 1)
+    snapshot.refresh()
+    expected = ["River Song", "A Tale of Rivers and a River", "Down River", "Old River River River", "Silent River"]
+    assert [b["title"] for b in database.search_books("river", ("title",))] == expected
+    assert [b["title"] for b in snapshot.search("river", ("title",))] == expected
+
+
+def test_services_read_from_snapshot(snapshot):
+    assert [b["title"] for b in get_catalog_page(None, 2)["books"]] == ["Glass City", "Glass City"]
+    assert [b["title"] for b in search_books_in_catalog("river", "title")] == ["River Song", "Silent River"]
+    database.insert_book("Riverbank", "Eve Fox", "9780000004098", 1, 1)
+    assert len(search_books_in_catalog("river", "title")) == 3
+    assert snapshot.stats()["books"] == 6
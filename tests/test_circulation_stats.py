@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from app import create_app
+from services import analytics_service
+
+MARCH = datetime(2026, 3, 2, 10)
+
+
+@pytest.fixture()
+def stats_db(tmp_db, monkeypatch):
+    monkeypatch.setenv("SKIP_SAMPLE_DATA", "1")
+    app = create_app()
+    for i, (title, author) in enumerate([("Dune", "Frank Herbert"), ("Children of Dune", "Frank Herbert"),
+                                         ("Emma", "Jane Austen")]):
+        database.insert_book(title, author, f"97800000060{i:02d}", 4, 4)
+    # Book 1 three times, book 2 once and book 3 twice in March; book 3 once in April
+    for n, (book_id, day, returned_after) in enumerate([(1, 0, 3), (1, 1, 20), (1, 2, None), (2, 2, 5),
+                                                        (3, 3, 14), (3, 4, None), (3, 31, None)]):
+        borrowed = MARCH + timedelta(days=day)
+        patron = f"{100000 + n}"
+        database.insert_borrow_record(patron, book_id, borrowed, borrowed + timedelta(days=14))
+        if returned_after is None:
+            database.update_book_availability(book_id, -1)
+        else:
+            database.update_borrow_record_return_date(patron, book_id, borrowed + timedelta(days=returned_after))
+    with app.test_client() as c:
+        yield c
+
+
+def _rollups():
+    conn = database.get_db_connection()
+    return {table: [tuple(row) for row in conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2")]
+            for table in database.CIRCULATION_ROLLUPS}
+
+
+def test_loans_are_counted_as_they_are_written(stats_db):
+    report = analytics_service.get_daily_circulation("2026-03-01", "2026-03-07")
+    assert [day["borrows"] for day in report["days"]] == [0, 1, 1, 2, 1, 1, 0]
+    # Book 1's first loan came back on 5 March after 3 days, book 2's on 9 March
+    assert report["days"][4] == {"date": "2026-03-05", "borrows": 1, "returns": 1, "overdue_returns": 0, "loan_days": 3}
+    assert report["totals"]["borrows"] == 6
+    book = analytics_service.get_daily_circulation("2026-03-01", "2026-03-31", book_id=1)
+    assert book["totals"] == {"borrows": 3, "returns": 2, "overdue_returns": 1, "loan_days": 23}
+    author = analytics_service.get_daily_circulation("2026-03-01", "2026-04-30", author="Jane Austen")
+    assert (author["author"], author["totals"]["borrows"], author["totals"]["returns"]) == ("Jane Austen", 3, 1)
+
+
+def test_backfill_recounts_the_same_rollups(stats_db):
+    counted = _rollups()
+    conn = database.get_db_connection()
+    for table in database.CIRCULATION_ROLLUPS:
+        conn.execute(f"DELETE FROM {table}")
+    conn.commit()
+    result = analytics_service.backfill_rollups()
+    assert result["loans"] == 7 and _rollups() == counted
+    assert analytics_service.main([]) == 0 and _rollups() == counted
+
+
+def test_most_borrowed_books_and_authors_of_a_month(stats_db):
+    top = stats_db.get("/api/stats/top-books?month=2026-03").get_json()
+    assert top["month"] == "2026-03"
+    assert [(book["title"], book["borrows"]) for book in top["books"]] == [("Dune", 3), ("Emma", 2),
+                                                                            ("Children of Dune", 1)]
+    authors = stats_db.get("/api/stats/top-authors?month=2026-03&limit=1").get_json()["authors"]
+    assert [(a["author"], a["borrows"]) for a in authors] == [("Frank Herbert", 4)]
+    april = stats_db.get("/api/stats/top-books?month=2026-04").get_json()["books"]
+    assert [book["book_id"] for book in april] == [3]
+    assert stats_db.get("/api/stats/top-books?month=March").status_code == 400
+
+
+def test_title_utilisation(stats_db):
+    stats = stats_db.get("/api/stats/books/1?month=2026-03").get_json()
+    assert (stats["borrows"], stats["month_borrows"], stats["on_loan"]) == (3, 3, 1)
+    assert (stats["utilisation"], stats["borrows_per_copy"], stats["average_loan_days"]) == (0.25, 0.75, 11.5)
+    assert stats_db.get("/api/stats/books/99").status_code == 404
+
+
+def test_daily_api_validates_the_range(stats_db):
+    data = stats_db.get("/api/stats/daily?from=2026-03-01&to=2026-03-31&book_id=3").get_json()
+    assert data["book_id"] == 3 and len(data["days"]) == 31 and data["totals"]["borrows"] == 2
+    assert len(stats_db.get("/api/stats/daily").get_json()["days"]) == analytics_service.STATS_DAYS
+    assert stats_db.get("/api/stats/daily?from=2026-03-05&to=2026-03-01").status_code == 400
+    assert stats_db.get("/api/stats/daily?from=2024-01-01&to=2026-01-01").status_code == 400
+    assert stats_db.get("/api/stats/daily?from=yesterday").status_code == 400
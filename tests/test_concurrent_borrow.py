@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+import database
+from services import library_service
+
+
+def _run_concurrently(fn, args_list):
+    barrier = threading.Barrier(len(args_list))
+    results = [None] * len(args_list)
+
+    def worker(i, args):
+        barrier.wait()
+        try:
+            results[i] = fn(*args)
+        finally:
+            database.close_db_connection()
+
+    threads = [threading.Thread(target=worker, args=(i, a)) for i, a in enumerate(args_list)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def _available(book_id):
+    return database.get_book_by_id(book_id)["available_copies"]
+
+
+def _active_loans(book_id):
+    conn = database.get_db_connection()
+    return conn.execute(
+        "SELECT COUNT(*) FROM borrow_records WHERE book_id = ? AND return_date IS NULL", (book_id,)
+    ).fetchone()[0]
+
+
+def test_no_oversell_under_concurrent_borrows(tmp_db):
+    database.insert_book("Hot Title", "A", "9780000000001", 10, 10)
+    patrons = [(f"{100000 + i}", 1) for i in range(300)]
+
+    results = _run_concurrently(library_service.borrow_book_by_patron, patrons)
+
+    assert sum(ok for ok, _ in results) == 10
+    assert _available(1) == 0
+    assert _active_loans(1) == 10
+
+
+def test_borrow_limit_holds_under_concurrent_borrows(tmp_db):
+    for i in range(1, 21):
+        database.insert_book(f"Bk{i}", "A", f"97800000001{i:02d}", 3, 3)
+
+    results = _run_concurrently(library_service.borrow_book_by_patron, [("123456", i) for i in range(1, 21)])
+
+    assert sum(ok for ok, _ in results) == library_service.MAX_BORROWED_BOOKS
+    assert database.get_patron_borrow_count("123456") == library_service.MAX_BORROWED_BOOKS
+
+
+def test_concurrent_returns_only_restore_one_copy(tmp_db):
+    database.insert_book("Once", "A", "9780000000002", 1, 1)
+    assert library_service.borrow_book_by_patron("123456", 1)[0]
+
+    results = _run_concurrently(library_service.return_book_by_patron, [("123456", 1)] * 50)
+
+    assert sum(ok for ok, _ in results) == 1
+    assert _available(1) == 1
+
+
+def test_return_without_borrow_is_rejected(tmp_db):
+    database.insert_book("Never", "A", "9780000000003", 1, 1)
+    ok, msg = library_service.return_book_by_patron("123456", 1)
+    assert not ok and "No active borrow" in msg
+    assert _available(1) == 1
+
+
+def test_same_book_cannot_be_borrowed_twice(tmp_db):
+    database.insert_book("Twice", "A", "9780000000004", 2, 2)
+    assert library_service.borrow_book_by_patron("123456", 1)[0]
+    ok, msg = library_service.borrow_book_by_patron("123456", 1)
+    assert not ok and "already" in msg
+    assert _available(1) == 1
+
+
+def test_transaction_refuses_to_commit_an_open_transaction(tmp_db):
+    conn = database.get_db_connection()
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                 "VALUES ('Pending', 'A', '9780000000005', 1, 1)")
+    with pytest.raises(RuntimeError):
+        with database.transaction():
+            pass
+    conn.rollback()
+    assert database.get_book_by_isbn("9780000000005") is None
@@ -0,0 +1,44 @@
+import threading
+
+import database
+
+
+def test_same_thread_reuses_connection(tmp_db):
+    assert database.get_db_connection() is database.get_db_connection()
+    database.get_book_by_id(1)
+    database.get_patron_borrow_count("123456")
+    assert database.get_pool().created == 1
+
+
+def test_released_connection_is_handed_out_again(tmp_db):
+    first = database.get_db_connection()
+    database.close_db_connection()
+    assert database.get_db_connection() is first
+
+
+def test_unhealthy_connection_is_replaced(tmp_db):
+    first = database.get_db_connection()
+    database.close_db_connection()
+    first.close()
+    second = database.get_db_connection()
+    assert second is not first
+    assert second.execute("SELECT 1").fetchone()[0] == 1
+
+
+def test_threads_get_their_own_connection(tmp_db):
+    seen = []
+
+    def worker():
+        seen.append(database.get_db_connection())
+        database.close_db_connection()
+
+    main_conn = database.get_db_connection()
+    t = threading.Thread(target=worker)
+    t.start()
+    t.join()
+    assert seen and seen[0] is not main_conn
+
+
+def test_request_teardown_releases_connection(client):
+    client.get("/catalog")
+    assert getattr(database._local, "conn", None) is None
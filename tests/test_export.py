@@ -0,0 +1,87 @@
+import ast
+import os
+import struct
+import zipfile
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from app import create_app
+from services import export_service
+
+BORROWED = datetime(2026, 3, 2, 10)
+
+
+@pytest.fixture()
+def export_db(tmp_db, monkeypatch):
+    monkeypatch.setenv("SKIP_SAMPLE_DATA", "1")
+    create_app()
+    for i, title in enumerate(["Dune", "Émile, ou De l’éducation", "Emma", "Solaris", "Ubik"]):
+        database.insert_book(title, f"Author {i}", f"97800000070{i:02d}", 2, 2)
+    for book_id in (1, 2, 3):
+        database.insert_borrow_record("123456", book_id, BORROWED, BORROWED + timedelta(days=14))
+    database.update_borrow_record_return_date("123456", 2, BORROWED + timedelta(days=3))
+    yield tmp_db / "export"
+
+
+def _exported(out_dir, table):
+    manifest = export_service.load_manifest(str(out_dir))
+    entry = manifest["tables"][table]
+    columns = [tuple(column) for column in entry["columns"]]
+    rows = []
+    for name in entry["files"]:
+        part = export_service.read_export_file(str(out_dir / name), columns)
+        rows.extend(zip(*(part[column] for column, _, _ in columns)))
+    return entry, rows
+
+
+def _table(table):
+    return [tuple(row) for row in database.get_db_connection().execute(f"SELECT * FROM {table} ORDER BY id")]
+
+
+def test_export_round_trips_both_tables_in_chunks(export_db):
+    books = export_service.export_table(str(export_db), "books", chunk_size=2)
+    assert (books["rows"], books["files"], books["last_id"]) == (5, 3, 5)
+    entry, rows = _exported(export_db, "books")
+    assert rows == _table("books")
+    assert entry["files"][0] == "books/000000000001-000000000002.npz"
+
+    export_service.export_table(str(export_db), "borrow_records")
+    entry, rows = _exported(export_db, "borrow_records")
+    assert rows == _table("borrow_records")
+    assert [row[5] is None for row in rows] == [True, False, True]
+    assert ["return_date", "INTEGER", True] in entry["columns"]
+
+
+def test_files_are_npz_archives_of_npy_arrays(export_db):
+    export_service.export_table(str(export_db), "borrow_records")
+    with zipfile.ZipFile(export_db / "borrow_records" / "000000000001-000000000003.npz") as archive:
+        assert {info.compress_type for info in archive.infolist()} == {zipfile.ZIP_DEFLATED}
+        assert "patron_id.offsets.npy" in archive.namelist() and "return_date.valid.npy" in archive.namelist()
+        data = archive.read("book_id.npy")
+    (size,) = struct.unpack_from("<H", data, 8)
+    assert data[:8] == b"\x93NUMPY\x01\x00" and (10 + size) % 64 == 0
+    assert ast.literal_eval(data[10:10 + size].decode()) == {"descr": "<i8", "fortran_order": False, "shape": (3,)}
+    assert struct.unpack("<3q", data[10 + size:]) == (1, 2, 3)
+
+
+def test_later_exports_only_add_new_rows(export_db):
+    export_service.export_table(str(export_db), "borrow_records")
+    assert export_service.export_table(str(export_db), "borrow_records")["rows"] == 0
+    database.insert_borrow_record("654321", 4, BORROWED, BORROWED + timedelta(days=14))
+    result = export_service.export_table(str(export_db), "borrow_records")
+    assert (result["rows"], result["last_id"]) == (1, 4)
+    entry, rows = _exported(export_db, "borrow_records")
+    assert entry["rows"] == 4 and len(entry["files"]) == 2 and rows == _table("borrow_records")
+
+
+def test_full_export_replaces_the_earlier_files(export_db):
+    assert export_service.main([str(export_db), "--table", "books", "--chunk-size", "2"]) == 0
+    old_files = export_service.load_manifest(str(export_db))["tables"]["books"]["files"]
+    assert export_service.main([str(export_db), "--full", "--table", "books"]) == 0
+    entry, rows = _exported(export_db, "books")
+    assert entry["files"] == ["books/000000000001-000000000005.npz"] and rows == _table("books")
+    assert not any(os.path.exists(export_db / name) for name in old_files)
+    with pytest.raises(ValueError):
+        database.get_table_columns("patron_payments")
@@ -0,0 +1,46 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import database
+from services import fee_engine
+from services.library_service import calculate_late_fee_for_book
+
+
+@pytest.mark.parametrize("days, fee", [
+    (-3, 0.0), (0, 0.0), (1, 0.5), (7, 3.5), (8, 4.5), (14, 10.5), (19, 15.0), (60, 15.0),
+])
+def test_fee_schedule(days, fee):
+    assert fee_engine.late_fee_for_days(days) == fee
+
+
+def test_batch_mixes_open_and_returned_loans():
+    as_of = date(2025, 3, 31)
+    results = fee_engine.calculate_late_fees(
+        ["2025-03-30T12:00:00", datetime(2025, 3, 1), date(2025, 4, 5), "2025-03-01T09:00:00"],
+        [None, None, None, "2025-03-04T18:30:00"],
+        as_of=as_of,
+    )
+    assert results == [(1, 0.5), (30, 15.0), (0, 0.0), (3, 1.5)]
+
+
+def test_sql_side_fees_match_python(tmp_db):
+    as_of = datetime(2025, 6, 1)
+    database.insert_book("Fees", "A", "9780000000901", 100, 100)
+    dues = [as_of - timedelta(days=d, hours=3) for d in range(-5, 40)]
+    for i, due in enumerate(dues):
+        database.insert_borrow_record(f"{200000 + i}", 1, due - timedelta(days=14), due)
+
+    sql = {row["patron_id"]: (row["days_overdue"], row["fee"]) for row in fee_engine.iter_open_loan_fees(as_of)}
+    python = fee_engine.calculate_late_fees(dues, as_of=as_of)
+    expected = {f"{200000 + i}": r for i, r in enumerate(python) if r[0] > 0}
+    assert sql == expected
+    assert fee_engine.summarize_open_loan_fees(as_of)["overdue_loans"] == len(expected)
+
+
+def test_per_book_fee_uses_active_loan(tmp_db):
+    database.insert_book("Late", "A", "9780000000902", 1, 1)
+    borrowed = datetime.now() - timedelta(days=24)
+    database.insert_borrow_record("123456", 1, borrowed, borrowed + timedelta(days=14))
+    assert calculate_late_fee_for_book("123456", 1) == {"status": "ok", "fee": 6.5, "days_overdue": 10}
+    assert calculate_late_fee_for_book("654321", 1)["status"] == "not found"
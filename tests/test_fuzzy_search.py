@@ -0,0 +1,79 @@
+import pytest
+
+import database
+import fuzzy_index
+from services.library_service import search_books_in_catalog
+
+
+@pytest.fixture()
+def index(tmp_db, monkeypatch):
+    for i, (title, author) in enumerate([("The Great Gatsby", "F. Scott Fitzgerald"), ("1984", "George Orwell"),
+                                         ("Animal Farm", "George Orwell"), ("Great Expectations", "Charles Dickens"),
+                                         ("The Grapes of Wrath", "John Steinbeck")]):
+        database.insert_book(title, author, f"97800000050{i:02d}", 2, 2)
+    idx = fuzzy_index.FuzzyIndex()
+    monkeypatch.setattr(fuzzy_index, "index", idx)
+    yield idx
+
+
+def _titles(books):
+    return [book["title"] for book in books]
+
+
+def test_trigram_similarity():
+    assert fuzzy_index.similarity(fuzzy_index.trigrams("gatsbey"), fuzzy_index.trigrams("gatsby")) == 0.5
+    assert fuzzy_index.similarity(fuzzy_index.trigrams("orwel"), fuzzy_index.trigrams("orwell")) == 0.625
+    assert fuzzy_index.words("Catch-22, catch 1984") == ["catch"]
+
+
+def test_misspelled_title_and_author_are_found(index):
+    assert _titles(search_books_in_catalog("Gatsbey", "fuzzy")) == ["The Great Gatsby"]
+    assert _titles(search_books_in_catalog("orwel", "fuzzy")) == ["1984", "Animal Farm"]
+    assert search_books_in_catalog("Gatsby", "title")[0]["title"] == "The Great Gatsby"
+    assert search_books_in_catalog("xyzzy", "fuzzy") == []
+
+
+def test_results_are_ranked_by_similarity(index):
+    results = search_books_in_catalog("great expectatons", "fuzzy")
+    assert _titles(results)[:2] == ["Great Expectations", "The Great Gatsby"]
+    assert results[0]["similarity"] > results[1]["similarity"] >= fuzzy_index.FUZZY_THRESHOLD
+    assert len(fuzzy_index.fuzzy_search("great", limit=1)) == 1
+    assert fuzzy_index.fuzzy_search("grate", threshold=0.9) == []
+
+
+def test_index_is_updated_incrementally(index):
+    search_books_in_catalog("gatsby", "fuzzy")
+    assert index.stats()["books"] == 5
+    database.insert_book("Brave New World", "Aldous Huxley", "9780000005099", 1, 1)
+    database.update_book_availability(1, -1)
+    assert index.refresh() == 2 and not index.retitled
+    assert _titles(search_books_in_catalog("Huxly", "fuzzy")) == ["Brave New World"]
+
+
+def test_retitled_and_deleted_books_are_not_returned(index):
+    index.refresh()
+    conn = database.get_db_connection()
+    conn.execute("UPDATE books SET title = 'Tender Is the Night' WHERE title = 'The Great Gatsby'")
+    conn.execute("DELETE FROM books WHERE title = 'Animal Farm'")
+    conn.commit()
+    assert search_books_in_catalog("gatsbey", "fuzzy") == []
+    assert _titles(search_books_in_catalog("tendr night", "fuzzy")) == ["Tender Is the Night"]
+    assert _titles(search_books_in_catalog("orwel", "fuzzy")) == ["1984"]
+    assert len(index.retitled) == 1
+
+
+def test_fuzzy_type_on_routes(index, client):
+    api = client.get("/api/search?q=Orwel&type=fuzzy").get_json()
+    assert api["search_type"] == "fuzzy" and api["count"] == 2
+    assert api["results"][0]["similarity"] == 0.625
+
+    page = client.get("/search?q=Gatsbey&type=fuzzy")
+    assert b"The Great Gatsby" in page.data
+    empty = client.get("/search?q=zzzz")
+    assert b"No results found" in empty.data and b"not yet implemented" not in empty.data
+
+
+def test_common_words_are_scored_from_each_books_words(index, monkeypatch):
+    monkeypatch.setattr(fuzzy_index, "_LOOKUP_POSTINGS", 0)
+    assert _titles(search_books_in_catalog("great gatsbey", "fuzzy"))[:2] == ["The Great Gatsby", "Great Expectations"]
+    assert _titles(fuzzy_index.fuzzy_search("georg", fields=("title",))) == []
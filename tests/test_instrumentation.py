@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+import instrumentation
+from app import create_app
+
+
+@pytest.fixture()
+def metrics_client(tmp_db, monkeypatch):
+    monkeypatch.setenv("METRICS_ENABLED", "1")
+    instrumentation.metrics.reset()
+    app = create_app()
+    with app.test_client() as c:
+        yield c
+
+
+def test_server_timing_breaks_down_request(metrics_client):
+    r = metrics_client.get("/catalog")
+    assert r.status_code == 200
+    timing = r.headers["Server-Timing"]
+    for part in ("db;dur=", "svc;dur=", "tpl;dur=", "total;dur="):
+        assert part in timing
+    assert 'desc="0 statements"' not in timing
+
+
+def test_metrics_endpoint_exposes_prometheus_series(metrics_client):
+    metrics_client.get("/catalog")
+    metrics_client.get("/api/search?q=gatsby&type=title")
+    body = metrics_client.get("/metrics").get_data(as_text=True)
+    assert 'library_request_duration_seconds_count{endpoint="catalog.catalog",method="GET",status="200"} 1' in body
+    assert 'le="+Inf"' in body
+    assert "library_sql_statement_duration_seconds_sum{statement=\"SELECT" in body
+    assert 'function="services.library_service.search_books_in_catalog"' in body
+    assert 'template="catalog.html"' in body
+    assert "library_book_cache_hits_total" in body
+
+
+def test_slow_requests_are_profiled(metrics_client, monkeypatch, tmp_path):
+    monkeypatch.setenv("PROFILE_SLOW_REQUESTS_MS", "0")
+    monkeypatch.setenv("PROFILE_DIR", str(tmp_path / "profiles"))
+    metrics_client.get("/catalog")
+    profiles = list((tmp_path / "profiles").glob("*.prof"))
+    assert len(profiles) == 1 and "catalog.catalog" in profiles[0].name
+    assert instrumentation.metrics.snapshot().profiled == 1
+
+
+def test_placeholder_lists_share_one_statement_label():
+    short = instrumentation._normalize_sql("SELECT * FROM books WHERE id IN (?, ?)")
+    long = instrumentation._normalize_sql("SELECT * FROM books\n WHERE id IN (?,?,?,?,?)")
+    assert short == long == "SELECT * FROM books WHERE id IN (?, ...)"
+    assert instrumentation._normalize_sql("VALUES (?)") == "VALUES (?)"
+
+
+def test_timings_from_every_thread_are_merged(metrics_client):
+    threads = [threading.Thread(target=instrumentation.observe_request, args=("api.search", "GET", 200, 0.01))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    instrumentation.observe_request("api.search", "GET", 200, 0.01)
+    body = metrics_client.get("/metrics").get_data(as_text=True)
+    assert 'library_request_duration_seconds_count{endpoint="api.search",method="GET",status="200"} 4' in body
+    # The exited threads' totals are kept
+    assert 'endpoint="api.search",method="GET",status="200"} 4' in metrics_client.get("/metrics").get_data(as_text=True)
+
+
+def test_metrics_are_off_by_default(tmp_db, monkeypatch):
+    monkeypatch.delenv("METRICS_ENABLED", raising=False)
+    app = create_app()
+    with app.test_client() as c:
+        assert "Server-Timing" not in c.get("/catalog").headers
@@ -0,0 +1,131 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import database
+from app import create_app
+from services import job_queue, library_service, payment_client
+from services.payment_client import HttpTransport, PaymentClient, RetryPolicy
+from tests.fake_gateway import FakeGateway
+
+
+@pytest.fixture()
+def gateway():
+    with FakeGateway() as gw:
+        yield gw
+
+
+@pytest.fixture()
+def jobs_app(tmp_db, monkeypatch, gateway):
+    monkeypatch.setattr(job_queue, "JOB_RETRY_DELAY", 0)
+    monkeypatch.setattr(job_queue, "workers", job_queue.WorkerPool(2, poll_interval=0.05))
+    client = PaymentClient(HttpTransport(gateway.url), RetryPolicy(attempts=2, base_delay=0), lambda s: None)
+    monkeypatch.setattr(payment_client, "_client", client)
+    app = create_app()
+    now = datetime.now()
+    for i in range(3):
+        database.insert_book(f"Late {i}", "A", f"97800000080{i:02d}", 1, 1)
+        book_id = database.get_book_by_isbn(f"97800000080{i:02d}")["id"]
+        due = now - timedelta(days=4 + i)
+        database.insert_borrow_record("800001", book_id, due - timedelta(days=14), due)
+    with app.test_client() as c:
+        yield c
+    job_queue.workers.stop()
+    client.close()
+
+
+def _run_queued(c, response):
+    assert response.status_code == 202
+    assert job_queue.workers.drain(10)
+    return c.get(response.headers["Location"]).get_json()
+
+
+def test_fee_payment_is_queued_and_transaction_id_persisted(jobs_app, gateway):
+    response = jobs_app.post("/api/patron/800001/fees/pay")
+    assert response.get_json()["status"] == "queued"
+    assert response.headers["Location"].endswith(f"/api/jobs/{response.get_json()['job_id']}")
+
+    job = _run_queued(jobs_app, response)
+    assert job["status"] == "done" and job["attempts"] == 1
+    assert job["result"]["status"] == "paid" and job["result"]["loans"] == 3
+    assert job["transaction_id"] == job["result"]["transaction_id"] == "TX000001"
+    assert gateway.paths() == ["/payments/batch"]
+
+
+def test_request_only_inserts_the_job(jobs_app, gateway, monkeypatch):
+    monkeypatch.setattr(job_queue, "workers", job_queue.WorkerPool(0))
+    response = jobs_app.post("/api/patron/800001/fees/pay")
+    job_id = response.get_json()["job_id"]
+    assert gateway.requests == []
+    job = jobs_app.get(f"/api/jobs/{job_id}").get_json()
+    assert job["status"] == "queued"
+    # Job times are stored like loan dates, so they read back as the local time
+    assert abs(datetime.fromisoformat(job["created_at"]) - datetime.now()) < timedelta(seconds=5)
+
+    job_queue.run_job(database.claim_job(60))
+    assert jobs_app.get(f"/api/jobs/{job_id}").get_json()["status"] == "done"
+
+
+def test_refund_job(jobs_app):
+    job = _run_queued(jobs_app, jobs_app.post("/api/refunds", json={"transaction_id": "TX000001", "amount": 5.0}))
+    assert job["status"] == "done" and job["result"]["status"] == "refunded"
+    assert jobs_app.post("/api/refunds", json={"transaction_id": "TX1", "amount": 20}).status_code == 400
+    assert jobs_app.post("/api/patron/12/fees/pay").status_code == 400
+    assert jobs_app.get("/api/jobs/999").status_code == 404
+
+
+def test_transient_gateway_failure_is_requeued(jobs_app, gateway):
+    gateway.fail_next(503, 503)
+    job = _run_queued(jobs_app, jobs_app.post("/api/patron/800001/fees/pay"))
+    assert job["status"] == "done" and job["attempts"] == 2
+    assert job["error"] is None
+    assert len(gateway.requests) == 3 and len(gateway.charges) == 1
+
+
+def test_job_fails_after_max_attempts(jobs_app, gateway, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_MAX_ATTEMPTS", 2)
+    gateway.fail_next(*[503] * 4)
+    job = _run_queued(jobs_app, jobs_app.post("/api/patron/800001/fees/pay"))
+    assert job["status"] == "failed" and job["attempts"] == 2
+    assert gateway.charges == {}
+
+
+def test_workers_bound_gateway_concurrency(jobs_app, gateway):
+    gateway.latency = 0.05
+    responses = [jobs_app.post("/api/refunds", json={"transaction_id": f"TX{i}", "amount": 1.0}) for i in range(6)]
+    assert job_queue.workers.drain(10)
+    assert gateway.max_in_flight == 2
+    assert all(jobs_app.get(r.headers["Location"]).get_json()["status"] == "done" for r in responses)
+
+
+def test_job_of_a_dead_worker_is_taken_over_after_its_lease(jobs_app, monkeypatch):
+    monkeypatch.setattr(job_queue, "workers", job_queue.WorkerPool(0))
+    job_id = jobs_app.post("/api/patron/800001/fees/pay").get_json()["job_id"]
+    assert database.claim_job(-1)["id"] == job_id     # claimed, then the worker "died"
+    assert database.get_job(job_id)["status"] == "running"
+
+    taken = database.claim_job(60)
+    assert taken["id"] == job_id and taken["attempts"] == 2
+    assert database.claim_job(60) is None
+    assert job_queue.run_job(taken) == "done"
+
+
+def test_job_rerun_on_a_later_day_is_charged_once(jobs_app, gateway, monkeypatch):
+    monkeypatch.setattr(job_queue, "workers", job_queue.WorkerPool(0))
+    job_id = jobs_app.post("/api/patron/800001/fees/pay").get_json()["job_id"]
+    job = database.claim_job(60)
+    # The worker dies after the gateway charged but before the payment was recorded
+    record = library_service.record_fee_payments
+    monkeypatch.setattr(library_service, "record_fee_payments", lambda *args: None)
+    job_queue.run_job(job)
+    charged = gateway.requests[-1][2]["amount"]
+    monkeypatch.setattr(library_service, "record_fee_payments", record)
+
+    # Another worker takes the job over the next day, when the fees have grown
+    tomorrow = date.today() + timedelta(days=1)
+    monkeypatch.setattr(library_service, "date", type("FakeDate", (date,), {"today": lambda: tomorrow}))
+    job_queue.run_job(dict(job, attempts=2))
+    assert len(gateway.charges) == 1 and gateway.requests[-1][2]["amount"] > charged
+    paid = database.get_db_connection().execute("SELECT SUM(amount) FROM fee_payments").fetchone()[0]
+    assert paid == charged
+    assert jobs_app.get(f"/api/jobs/{job_id}").get_json()["result"]["amount"] == charged
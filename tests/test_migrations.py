@@ -0,0 +1,189 @@
+import sqlite3
+
+import pytest
+
+import database
+
+
+@pytest.fixture()
+def db_path(monkeypatch, tmp_path):
+    path = str(tmp_path / "schema.db")
+    monkeypatch.setattr(database, "DATABASE", path)
+    yield path
+    database.close_all_connections()
+
+
+def _index_names(conn):
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_fresh_database_is_at_latest_version(db_path):
+    database.init_database()
+    conn = database.get_db_connection()
+    assert database.get_schema_version(conn) == database.SCHEMA_VERSION
+    assert {"idx_borrow_records_active", "idx_borrow_records_book"} <= _index_names(conn)
+
+
+def test_wal_and_connection_pragmas(db_path):
+    database.init_database()
+    conn = database.get_db_connection()
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT COUNT(*) FROM borrow_records WHERE patron_id = ? AND return_date IS NULL",
+    "UPDATE borrow_records SET return_date = 'x' WHERE patron_id = ? AND book_id = 1 AND return_date IS NULL",
+])
+def test_active_loan_queries_use_partial_index(db_path, sql):
+    database.init_database()
+    conn = database.get_db_connection()
+    plan = " ".join(r[-1] for r in conn.execute("EXPLAIN QUERY PLAN " + sql, ("123456",)))
+    assert "idx_borrow_records_active" in plan
+
+
+def test_legacy_database_is_upgraded_in_place(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, "
+                 "author TEXT NOT NULL, isbn TEXT UNIQUE NOT NULL, total_copies INTEGER NOT NULL, "
+                 "available_copies INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE borrow_records (id INTEGER PRIMARY KEY AUTOINCREMENT, patron_id TEXT NOT NULL, "
+                 "book_id INTEGER NOT NULL, borrow_date TEXT NOT NULL, due_date TEXT NOT NULL, return_date TEXT)")
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                 "VALUES ('Kept', 'A', '9780000000021', 1, 1)")
+    conn.commit()
+    conn.close()
+
+    database.init_database()
+    assert database.get_schema_version() == database.SCHEMA_VERSION
+    assert database.get_book_by_isbn("9780000000021")["title"] == "Kept"
+
+
+def test_migrations_run_once(db_path, monkeypatch):
+    database.init_database()
+    calls = []
+    monkeypatch.setattr(database, "MIGRATIONS", database.MIGRATIONS + [lambda conn: calls.append(1)])
+    monkeypatch.setattr(database, "SCHEMA_VERSION", database.SCHEMA_VERSION + 1)
+    database.migrate_database()
+    database.migrate_database()
+    assert calls == [1]
+
+
+def test_failed_migration_rolls_back(db_path, monkeypatch):
+    database.init_database()
+    version = database.get_schema_version()
+
+    def broken(conn):
+        conn.execute("CREATE TABLE half_done (x)")
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(database, "MIGRATIONS", database.MIGRATIONS + [broken])
+    monkeypatch.setattr(database, "SCHEMA_VERSION", version + 1)
+    with pytest.raises(RuntimeError):
+        database.migrate_database()
+    conn = database.get_db_connection()
+    assert database.get_schema_version(conn) == version
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+
+
+def _legacy_database_with_iso_dates(path, return_date="2025-03-05T09:00:00"):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, "
+                 "author TEXT NOT NULL, isbn TEXT UNIQUE NOT NULL, total_copies INTEGER NOT NULL, "
+                 "available_copies INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE borrow_records (id INTEGER PRIMARY KEY AUTOINCREMENT, patron_id TEXT NOT NULL, "
+                 "book_id INTEGER NOT NULL, borrow_date TEXT NOT NULL, due_date TEXT NOT NULL, return_date TEXT)")
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                 "VALUES ('Dated', 'A', '9780000000022', 2, 1)")
+    conn.executemany("INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date) "
+                     "VALUES (?, 1, ?, ?, ?)", [
+                         ("123456", "2025-03-01T10:30:00.123456", "2025-03-15T10:30:00.123456", return_date),
+                         ("654321", "2025-03-02T08:00:00", "2025-03-16T08:00:00", None),
+                     ])
+    conn.commit()
+    conn.close()
+
+
+def test_iso_dates_are_backfilled_as_epoch_seconds(db_path):
+    from datetime import datetime
+    from services.date_backfill import backfill
+
+    _legacy_database_with_iso_dates(db_path)
+    result = backfill()
+    assert (result["from_version"], result["to_version"], result["loans"]) == (0, database.SCHEMA_VERSION, 2)
+
+    conn = database.get_db_connection()
+    rows = conn.execute("SELECT borrow_date, due_date, return_date FROM borrow_records ORDER BY id").fetchall()
+    assert [tuple(r) for r in rows] == [
+        (database.to_epoch(datetime(2025, 3, 1, 10, 30)), database.to_epoch(datetime(2025, 3, 15, 10, 30)),
+         database.to_epoch(datetime(2025, 3, 5, 9))),
+        (database.to_epoch(datetime(2025, 3, 2, 8)), database.to_epoch(datetime(2025, 3, 16, 8)), None),
+    ]
+    assert {"idx_borrow_records_active", "idx_borrow_records_history", "idx_borrow_records_due"} <= _index_names(conn)
+    assert database.from_epoch(rows[1]["due_date"]) == datetime(2025, 3, 16, 8)
+    assert database.get_open_loan_fee_totals(database.epoch_day(datetime(2025, 3, 20).date()),
+                                             {"first_days": 7, "first_rate": 0.5, "daily_rate": 1.0,
+                                              "max_fee": 15.0})["total_fees"] == 2.0
+
+
+def test_backfill_refuses_unparseable_dates(db_path):
+    from services.date_backfill import backfill
+
+    _legacy_database_with_iso_dates(db_path, return_date="last tuesday")
+    with pytest.raises(ValueError):
+        backfill()
+    conn = database.get_db_connection()
+    assert database.get_schema_version(conn) == 0
+
+
+def test_prepare_database_sets_up_once(db_path, monkeypatch):
+    assert database.prepare_database() is True
+    assert database.get_schema_version() == database.SCHEMA_VERSION
+    assert database.get_db_connection().execute("SELECT COUNT(*) FROM books").fetchone()[0] == 3
+
+    calls = []
+    monkeypatch.setattr(database, "init_database", lambda: calls.append(1))
+    assert database.prepare_database() is False
+    assert calls == []
+
+
+def test_prepare_database_runs_setup_in_one_of_many_starting_workers(db_path):
+    import threading
+
+    barrier = threading.Barrier(4)
+    results = []
+
+    def start_worker():
+        barrier.wait()
+        results.append(database.prepare_database())
+        database.close_db_connection()
+
+    threads = [threading.Thread(target=start_worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [False, False, False, True]
+    assert database.get_db_connection().execute("SELECT COUNT(*) FROM books").fetchone()[0] == 3
+
+
+def test_create_app_adds_sample_data_once(db_path, monkeypatch):
+    from app import create_app
+
+    monkeypatch.setenv("SKIP_SAMPLE_DATA", "1")
+    create_app()
+    assert database.get_db_connection().execute("SELECT COUNT(*) FROM books").fetchone()[0] == 0
+    monkeypatch.delenv("SKIP_SAMPLE_DATA")
+    create_app()
+    create_app()
+    assert database.get_db_connection().execute("SELECT COUNT(*) FROM books").fetchone()[0] == 3
+
+
+def test_migrations_refuse_an_open_transaction(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE scratch (x)")
+    conn.execute("INSERT INTO scratch VALUES (1)")
+    with pytest.raises(RuntimeError):
+        database.migrate_database(conn)
+    assert database.get_schema_version(conn) == 0
+    conn.close()
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from app import create_app
+from services import fee_engine, overdue_service
+from services.library_service import get_overdue_report, return_book_by_patron
+
+AS_OF = datetime(2025, 6, 1)
+
+
+@pytest.fixture()
+def overdue_db(tmp_db):
+    app = create_app()
+    database.insert_book("Overdue", "A", "9780000005001", 50, 50)
+    book_id = database.get_book_by_isbn("9780000005001")["id"]
+    # Patron 5000xx has a loan due i days before AS_OF; i <= 0 is not overdue yet
+    for i in range(-3, 12):
+        due = AS_OF - timedelta(days=i) + timedelta(hours=2)
+        database.insert_borrow_record(f"{500010 + i}", book_id, due - timedelta(days=14), due)
+    with app.test_client() as c:
+        yield c, book_id
+
+
+def test_sweep_materialises_overdue_loans_with_engine_fees(overdue_db):
+    result = overdue_service.run_overdue_sweep(AS_OF, chunk_size=4)
+    assert result["as_of"] == "2025-06-01"
+    assert result["overdue_loans"] == result["patrons"] == 11
+
+    loans = get_overdue_report(limit=1000)["loans"]
+    assert [(loan["days_overdue"], loan["fee"]) for loan in loans] == [
+        (d, fee_engine.late_fee_for_days(d)) for d in range(1, 12)]
+    assert result["total_fees"] == round(sum(loan["fee"] for loan in loans), 2)
+
+
+def test_sweep_replaces_previous_results(overdue_db):
+    overdue_service.run_overdue_sweep(AS_OF)
+    assert overdue_service.run_overdue_sweep(AS_OF - timedelta(days=5))["overdue_loans"] == 6
+    assert get_overdue_report()["swept_on"] == "2025-05-27"
+
+
+def test_returned_loans_leave_table_before_next_sweep(overdue_db):
+    overdue_service.run_overdue_sweep(AS_OF)
+    success, _ = return_book_by_patron("500015", overdue_db[1])
+    assert success
+    report = get_overdue_report()
+    assert report["overdue_loans"] == 10
+    assert "500015" not in {loan["patron_id"] for loan in report["loans"]}
+
+
+def test_overdue_lookup_uses_due_date_index(overdue_db):
+    conn = database.get_db_connection()
+    plan = " ".join(row[3] for row in conn.execute(
+        "EXPLAIN QUERY PLAN " + database._OPEN_LOAN_FEES_SQL,
+        dict(fee_engine.fee_schedule(), as_of_day="2025-06-01")))
+    assert "idx_borrow_records_due" in plan
+
+
+def test_overdue_api_pages(overdue_db):
+    client, _ = overdue_db
+    overdue_service.run_overdue_sweep(AS_OF)
+    seen, cursor = [], ""
+    while True:
+        data = client.get(f"/api/overdue?limit=4&cursor={cursor}").get_json()
+        seen += data["loans"]
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+    assert len(seen) == data["overdue_loans"] == 11
+    one = client.get("/api/overdue?patron_id=500013").get_json()
+    assert [loan["days_overdue"] for loan in one["loans"]] == [3]
+    assert client.get("/api/overdue?cursor=bogus").status_code == 400
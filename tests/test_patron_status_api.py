@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+from app import create_app
+from services.library_service import get_patron_status_report
+
+
+@pytest.fixture()
+def status_client(tmp_db):
+    app = create_app()
+    ids = []
+    for i in range(1, 6):
+        database.insert_book(f"Status {i}", "A", f"97800000010{i:02d}", 2, 2)
+        ids.append(database.get_book_by_isbn(f"97800000010{i:02d}")["id"])
+    now = datetime.now()
+    # 12 returned loans, then two open loans: one 20 days overdue, one on time
+    for i in range(12):
+        borrowed = now - timedelta(days=200 - i)
+        database.insert_borrow_record("222222", ids[i % 5], borrowed, borrowed + timedelta(days=14))
+        database.update_borrow_record_return_date("222222", ids[i % 5], borrowed + timedelta(days=3))
+    database.insert_borrow_record("222222", ids[0], now - timedelta(days=34), now - timedelta(days=20))
+    database.insert_borrow_record("222222", ids[1], now - timedelta(days=2), now + timedelta(days=12))
+    with app.test_client() as c:
+        yield c
+
+
+def test_report_has_open_loans_and_sql_fee_total(status_client):
+    report = get_patron_status_report("222222")
+    assert report["count_current"] == 2
+    assert [loan["title"] for loan in report["current"]] == ["Status 1", "Status 2"]
+    assert [loan["fee"] for loan in report["current"]] == [15.0, 0.0]
+    assert report["total_fees"] == 15.0
+
+
+def test_history_pages_cover_every_loan_newest_first(status_client):
+    seen, cursor = [], None
+    while True:
+        report = get_patron_status_report("222222", cursor, 5)
+        seen += report["history"]
+        cursor = report["next_history_cursor"]
+        if not cursor:
+            break
+    assert len(seen) == 14
+    dates = [loan["borrow_date"] for loan in seen]
+    assert dates == sorted(dates, reverse=True)
+    assert seen[0]["return_date"] is None
+
+
+def test_status_api_endpoint(status_client):
+    r = status_client.get("/api/patron/222222/status?limit=3")
+    data = r.get_json()
+    assert r.status_code == 200
+    assert data["count_current"] == 2 and len(data["history"]) == 3 and data["next_history_cursor"]
+
+    assert status_client.get("/api/patron/12ab/status").status_code == 400
+    assert status_client.get("/api/patron/222222/status?cursor=bogus").status_code == 400
+
+
+def test_unknown_patron_has_empty_report(status_client):
+    report = get_patron_status_report("999999")
+    assert report["current"] == [] and report["history"] == [] and report["total_fees"] == 0.0
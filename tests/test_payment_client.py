@@ -0,0 +1,175 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import database
+from services.library_service import pay_all_late_fees
+from services.payment_client import (
+    HttpTransport, PaymentClient, PaymentError, RetryPolicy, StubTransport, TransientPaymentError
+)
+from tests.fake_gateway import FakeGateway
+
+
+@pytest.fixture()
+def gateway():
+    with FakeGateway() as gw:
+        yield gw
+
+
+def _client(gw, attempts=3, timeout=2.0, deadline=10.0):
+    sleeps = []
+    client = PaymentClient(HttpTransport(gw.url, timeout=timeout),
+                           RetryPolicy(attempts=attempts, base_delay=0.01, deadline=deadline), sleeps.append)
+    client.sleeps = sleeps
+    return client
+
+
+def test_calls_reuse_one_keep_alive_connection(gateway):
+    client = _client(gateway)
+    results = [client.process_payment("123456", 5.0) for _ in range(5)]
+    assert all(r["status"] == "success" for r in results)
+    assert len({r["transaction_id"] for r in results}) == 5
+    assert gateway.connections == 1
+    client.close()
+
+
+def test_transient_errors_are_retried_with_the_same_idempotency_key(gateway):
+    gateway.fail_next(503, 502)
+    client = _client(gateway)
+    result = client.process_payment("123456", 5.0, idempotency_key="abc")
+    assert result["status"] == "success"
+    assert [key for _, key, _ in gateway.requests] == ["abc"] * 3
+    assert len(client.sleeps) == 2
+    assert len(gateway.charges) == 1
+
+
+def test_retry_after_is_honoured(gateway):
+    gateway.fail_next(429, retry_after=0.5)
+    client = _client(gateway)
+    assert client.process_payment("123456", 5.0)["status"] == "success"
+    assert client.sleeps == [0.5]
+
+
+def test_gives_up_after_the_last_attempt(gateway):
+    gateway.fail_next(503, 503, 503)
+    client = _client(gateway)
+    with pytest.raises(TransientPaymentError, match="503"):
+        client.process_payment("123456", 5.0)
+    assert len(gateway.requests) == 3
+
+
+def test_gives_up_when_the_deadline_would_pass(gateway):
+    gateway.fail_next(503, retry_after=30)
+    client = _client(gateway, deadline=5.0)
+    with pytest.raises(TransientPaymentError):
+        client.process_payment("123456", 5.0)
+    assert len(gateway.requests) == 1 and client.sleeps == []
+
+
+def test_client_errors_and_declines_are_not_retried(gateway):
+    client = _client(gateway)
+    with pytest.raises(PaymentError, match="Invalid payment"):
+        client.process_payment("abc", 5.0)
+    assert client.process_payment("123456", 500.0) == {"status": "declined"}
+    assert len(gateway.requests) == 2 and client.sleeps == []
+
+
+def test_timed_out_request_is_retried_and_charged_once(gateway):
+    gateway.stall_next(0.5)
+    client = _client(gateway, timeout=0.1)
+    result = client.process_payment("123456", 5.0)
+    assert result["status"] == "success"
+    assert len(gateway.requests) == 2
+    assert len(gateway.charges) == 1
+
+
+def test_connection_closed_while_idle_is_replaced_transparently(gateway):
+    client = _client(gateway)
+    client.process_payment("123456", 5.0)
+    gateway.drop_next()
+    assert client.process_payment("123456", 5.0)["status"] == "success"
+    assert gateway.connections == 2
+    assert client.sleeps == []
+
+
+def test_settle_fees_sends_one_request_for_all_items(gateway):
+    client = _client(gateway)
+    items = [{"loan_id": i, "book_id": i, "amount": 1.5} for i in range(1, 6)]
+    result = client.settle_fees("123456", items)
+    assert result["status"] == "success" and result["amount"] == 7.5
+    assert gateway.paths() == ["/payments/batch"]
+    assert gateway.requests[0][2]["items"] == items
+
+
+def test_stub_transport_serves_the_in_process_gateway():
+    client = PaymentClient(StubTransport())
+    assert client.settle_fees("123456", [{"loan_id": 1, "book_id": 1, "amount": 2.0}])["status"] == "success"
+    with pytest.raises(PaymentError, match="Invalid patron ID"):
+        client.process_payment("abc", 1.0)
+
+
+@pytest.fixture()
+def overdue_patron(tmp_db, gateway):
+    now = datetime.now()
+    for i in range(5):
+        database.insert_book(f"Late {i}", "A", f"97800000070{i:02d}", 1, 1)
+        book_id = database.get_book_by_isbn(f"97800000070{i:02d}")["id"]
+        due = now - timedelta(days=3 + i)
+        database.insert_borrow_record("700001", book_id, due - timedelta(days=14), due)
+    yield _client(gateway)
+
+
+def test_pay_all_late_fees_settles_in_one_gateway_request(overdue_patron, gateway):
+    result = pay_all_late_fees("700001", overdue_patron)
+    assert result["status"] == "paid" and result["loans"] == 5 and result["transaction_id"]
+    assert gateway.paths() == ["/payments/batch"]
+    assert gateway.requests[0][2]["amount"] == result["amount"] > 0
+
+
+def test_resubmitted_fee_payment_is_charged_once(overdue_patron, gateway):
+    first = pay_all_late_fees("700001", overdue_patron)
+    assert first["status"] == "paid"
+    assert pay_all_late_fees("700001", overdue_patron)["status"] == "nothing_due"
+    assert len(gateway.charges) == 1
+
+
+def test_later_payment_only_charges_fees_accrued_since(overdue_patron, gateway, monkeypatch):
+    first = pay_all_late_fees("700001", overdue_patron)
+    # A day later every loan is one more day overdue
+    tomorrow = date.today() + timedelta(days=1)
+    monkeypatch.setattr("services.library_service.date", type("FakeDate", (date,), {"today": lambda: tomorrow}))
+    second = pay_all_late_fees("700001", overdue_patron)
+    assert second["status"] == "paid" and second["loans"] == 5
+    assert 0 < second["amount"] < first["amount"]
+    items = gateway.requests[-1][2]["items"]
+    assert sum(item["amount"] for item in items) == second["amount"]
+
+
+def test_fees_of_books_returned_late_are_paid(overdue_patron, gateway, monkeypatch):
+    returned = datetime.now() - timedelta(days=1)
+    # Due 7 days ago and returned yesterday: 6 days late
+    database.update_borrow_record_return_date("700001", 5, returned)
+    result = pay_all_late_fees("700001", overdue_patron)
+    assert result["status"] == "paid" and result["loans"] == 5
+    assert {"loan_id": 5, "book_id": 5, "amount": 3.0} in gateway.requests[-1][2]["items"]
+    # The returned loan's fee no longer grows, so the next day only the open loans owe more
+    tomorrow = date.today() + timedelta(days=1)
+    monkeypatch.setattr("services.library_service.date", type("FakeDate", (date,), {"today": lambda: tomorrow}))
+    assert pay_all_late_fees("700001", overdue_patron)["loans"] == 4
+
+
+def test_fee_payment_outcomes(overdue_patron, gateway):
+    with pytest.raises(ValueError):
+        pay_all_late_fees("12", overdue_patron)
+    assert pay_all_late_fees("700002", overdue_patron)["status"] == "nothing_due"
+    gateway.fail_next(503, 503, 503)
+    assert pay_all_late_fees("700001", overdue_patron)["status"] == "unavailable"
+    assert gateway.charges == {}
+
+
+def test_declined_fee_payment(monkeypatch, gateway):
+    monkeypatch.setattr("services.library_service.get_patron_loan_fees",
+                        lambda *args: [{"id": 1, "book_id": 1, "fee": 150.0}])
+    monkeypatch.setattr("services.library_service.get_paid_fees", lambda loan_ids: {})
+    result = pay_all_late_fees("700001", _client(gateway))
+    assert result["status"] == "declined" and result["amount"] == 150.0
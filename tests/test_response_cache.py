@@ -0,0 +1,116 @@
+import asyncio
+import time
+
+import pytest
+
+import async_database
+import database
+import response_cache
+from app import create_app
+from asgi import create_asgi_app
+from services import library_service
+from tests.test_async_api import call
+
+
+@pytest.fixture()
+def client(tmp_db, monkeypatch):
+    monkeypatch.setattr(response_cache, "response_cache", response_cache.ResponseCache(8))
+    app = create_app()
+    with app.test_client() as c:
+        yield c
+
+
+def _searches(monkeypatch):
+    calls = []
+
+    def counting(*args):
+        calls.append(args)
+        return library_service.search_books_in_catalog(*args)
+    monkeypatch.setattr("routes.api_routes.search_books_in_catalog", counting)
+    monkeypatch.setattr("routes.search_routes.search_books_in_catalog", counting)
+    return calls
+
+
+@pytest.mark.parametrize("url", ["/catalog", "/search?q=gatsby&type=title", "/api/search?q=gatsby&type=title"])
+def test_matching_etag_gets_304(client, url):
+    first = client.get(url)
+    assert first.status_code == 200 and first.headers["ETag"] and first.headers["Last-Modified"]
+    assert "no-cache" in first.headers["Cache-Control"]
+
+    again = client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304 and again.data == b""
+    assert again.headers["ETag"] == first.headers["ETag"]
+    assert client.get(url, headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_catalog_write_changes_etag(client):
+    etag = client.get("/api/search?q=gatsby").headers["ETag"]
+    database.insert_book("Gatsby Returns", "A", "9780000009001", 1, 1)
+    response = client.get("/api/search?q=gatsby", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["ETag"] != etag
+    assert response.get_json()["count"] == 2
+
+    database.update_book_availability(database.get_book_by_isbn("9780000009001")["id"], -1)
+    assert client.get("/api/search?q=gatsby", headers={"If-None-Match": response.headers["ETag"]}).status_code == 200
+
+
+def test_last_modified_is_the_time_of_the_latest_write(client):
+    database.insert_book("Gatsby Returns", "A", "9780000009001", 1, 1)
+    conn = database.get_db_connection()
+    latest = conn.execute("SELECT seq, changed_at FROM book_changes ORDER BY seq DESC LIMIT 1").fetchone()
+    assert abs(latest["changed_at"] - time.time()) < 60
+    # Every worker reads the same time from the database
+    conn.execute("UPDATE book_changes SET changed_at = 1700000000 WHERE seq = ?", (latest["seq"],))
+    conn.commit()
+    assert client.get("/catalog").headers["Last-Modified"] == "Tue, 14 Nov 2023 22:13:20 GMT"
+
+
+def test_repeat_search_is_served_from_the_cache(client, monkeypatch):
+    calls = _searches(monkeypatch)
+    first = client.get("/api/search?q=gatsby&type=title")
+    assert client.get("/api/search?q=gatsby&type=title").data == first.data
+    client.get("/api/search?q=gatsby&type=author")
+    assert len(calls) == 2
+    assert response_cache.get_response_cache_stats()["hits"] == 1
+
+    database.insert_book("Gatsby Returns", "A", "9780000009001", 1, 1)
+    assert client.get("/api/search?q=gatsby&type=title").get_json()["count"] == 2
+    assert len(calls) == 3
+
+
+def test_cache_is_bounded():
+    cache = response_cache.ResponseCache(2)
+    for i in range(3):
+        cache.put(("k", i), 1, i)
+    assert cache.get(("k", 0), 1) is None and cache.get(("k", 2), 1) == 2
+    assert cache.get(("k", 2), 2) is None
+    assert cache.stats()["size"] == 1 and cache.stats()["evictions"] == 1
+
+
+def test_pages_with_flashed_messages_bypass_the_cache(client):
+    client.get("/catalog")
+    client.post("/add_book", data={"title": "New", "author": "A", "isbn": "9780000009002", "total_copies": "1"})
+    page = client.get("/catalog")
+    assert b"successfully added" in page.data and "ETag" not in page.headers
+    assert b"successfully added" not in client.get("/catalog").data
+
+    invalid = client.get("/catalog?cursor=bogus")
+    assert b"Invalid catalog page" in invalid.data and "ETag" not in invalid.headers
+    assert "private" in client.get("/catalog").headers["Cache-Control"]
+
+
+def test_errors_are_not_cached(client):
+    assert client.get("/api/search?q=").status_code == 400
+    assert response_cache.get_response_cache_stats()["size"] == 0
+
+
+def test_async_search_sends_etag_and_304(client, monkeypatch):
+    monkeypatch.setattr(async_database, "executor", async_database.AsyncExecutor(threads=2))
+    asgi_app = create_asgi_app(client.application)
+    status, headers, body = asyncio.run(call(asgi_app, "/api/search", "q=gatsby"))
+    assert status == 200 and headers[b"etag"] == client.get("/api/search?q=gatsby").headers["ETag"].encode()
+
+    conditional = [(b"if-none-match", headers[b"etag"])]
+    status, _, body = asyncio.run(call(asgi_app, "/api/search", "q=gatsby", headers=conditional))
+    assert status == 304 and body == b""
+    async_database.executor.shutdown()
@@ -0,0 +1,73 @@
+import pytest
+
+import database
+from services.library_service import search_books_in_catalog
+
+
+@pytest.fixture()
+def catalog(tmp_db):
+    database.insert_book("The Great Gatsby", "F. Scott Fitzgerald", "9780743273565", 3, 3)
+    database.insert_book("Gatsby Revisited", "Some Critic", "9780000000011", 1, 1)
+    database.insert_book("Animal Farm", "George Orwell", "9780451526342", 2, 2)
+    database.insert_book('The "Quoted" Book', "Q. Author", "9780000000012", 1, 1)
+
+
+def _titles(books):
+    return [b["title"] for b in books]
+
+
+def test_title_substring_is_case_insensitive(catalog):
+    assert set(_titles(search_books_in_catalog("GATSBY", "title"))) == {"The Great Gatsby", "Gatsby Revisited"}
+    assert _titles(search_books_in_catalog("nimal fa", "title")) == ["Animal Farm"]
+
+
+def test_prefix_matches_rank_first(catalog):
+    assert _titles(search_books_in_catalog("gatsby", "title"))[0] == "Gatsby Revisited"
+
+
+def test_author_search_does_not_match_titles(catalog):
+    assert _titles(search_books_in_catalog("orwell", "author")) == ["Animal Farm"]
+    assert search_books_in_catalog("gatsby", "author") == []
+
+
+def test_short_terms_fall_back_to_scan(catalog):
+    assert _titles(search_books_in_catalog("fa", "title")) == ["Animal Farm"]
+
+
+def test_isbn_is_exact_match_only(catalog):
+    assert _titles(search_books_in_catalog("9780451526342", "isbn")) == ["Animal Farm"]
+    assert search_books_in_catalog("978045152", "isbn") == []
+
+
+def test_quotes_in_term_are_escaped(catalog):
+    assert _titles(search_books_in_catalog('"quoted"', "title")) == ['The "Quoted" Book']
+
+
+def test_index_stays_in_sync_with_writes(catalog):
+    database.insert_book("Brand New Title", "N. Author", "9780000000013", 1, 1)
+    assert _titles(search_books_in_catalog("brand new", "title")) == ["Brand New Title"]
+
+    conn = database.get_db_connection()
+    conn.execute("UPDATE books SET title = 'Renamed Title' WHERE isbn = '9780000000013'")
+    conn.commit()
+    assert search_books_in_catalog("brand new", "title") == []
+    assert _titles(search_books_in_catalog("renamed", "title")) == ["Renamed Title"]
+
+
+def test_index_is_built_for_existing_books(monkeypatch, tmp_path):
+    import sqlite3
+
+    path = tmp_path / "legacy.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, "
+                 "author TEXT NOT NULL, isbn TEXT UNIQUE NOT NULL, total_copies INTEGER NOT NULL, "
+                 "available_copies INTEGER NOT NULL)")
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                 "VALUES ('Old Book', 'Old Author', '9780000000014', 1, 1)")
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(database, "DATABASE", str(path))
+    database.init_database()
+    assert _titles(search_books_in_catalog("old boo", "title")) == ["Old Book"]
+    database.close_all_connections()
@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+import database
+import sharding
+from app import create_app
+from services.library_service import MAX_BORROWED_BOOKS
+
+BRANCHES = ("north", "south", "east")
+
+
+@pytest.fixture()
+def router(tmp_db, monkeypatch):
+    monkeypatch.setenv("SKIP_SAMPLE_DATA", "1")
+    router = sharding.ShardRouter({branch: str(tmp_db / f"{branch}.db") for branch in BRANCHES})
+    monkeypatch.setattr(sharding, "router", router)
+    app = create_app()
+    for n, branch in enumerate(BRANCHES):
+        for i, (title, author) in enumerate([("Dune", "Frank Herbert"), (f"Dune Atlas {branch}", "Anon"),
+                                             (f"The {branch} Dune Sea", "Anon")] +
+                                            [(f"Book {i}", "Anon") for i in range(3, 8)]):
+            assert router.add_book(branch, title, author, f"9780000008{n}{i:02d}", 2)[0]
+    with app.test_client() as c:
+        c.router = router
+        yield c
+    router.close()
+
+
+def _open_loans(router, patron_id):
+    return sum(router.open_loan_counts(patron_id).values())
+
+
+def test_use_database_leaves_the_outer_transaction_alone(router):
+    conn = database.get_db_connection()
+    with database.transaction():
+        conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                     "VALUES ('Main', 'A', '9780000009001', 1, 1)")
+        router.router.add_book("north", "Shard only", "A", "9780000009002", 1)
+        assert database.get_db_connection() is conn and conn.in_transaction
+        conn.rollback()
+    assert database.get_book_by_isbn("9780000009001") is None
+    assert database.get_book_by_isbn("9780000009002") is None
+    assert router.router.run("north", database.get_book_by_isbn, "9780000009002")["title"] == "Shard only"
+
+
+def test_search_gathers_every_branch(router):
+    books = router.router.search("dune")
+    assert len(books) == 9 and {book["branch"] for book in books} == set(BRANCHES)
+    # Titles starting with the term first, alternating between branches
+    assert [(book["title"], book["branch"]) for book in books[:3]] == [("Dune", "north"), ("Dune", "south"),
+                                                                         ("Dune", "east")]
+    assert all(not book["title"].startswith("Dune") for book in books[6:])
+    isbn = router.get("/api/branches/search?q=9780000008100&type=isbn").get_json()
+    assert [(book["branch"], book["title"]) for book in isbn["results"]] == [("south", "Dune")]
+    assert router.get("/api/branches/search?q=dune&type=fuzzy").status_code == 400
+    assert router.get("/api/branches").get_json() == {"branches": list(BRANCHES)}
+
+
+def test_borrowing_limit_counts_every_branch(router):
+    patron = "123456"
+    for book_id, branch in [(1, "north"), (2, "north"), (1, "south"), (2, "south"), (1, "east")]:
+        assert router.router.borrow(branch, patron, book_id)[0]
+    success, message = router.router.borrow("east", patron, 2)
+    assert not success and "maximum borrowing limit" in message
+    assert router.router.return_book("north", patron, 1)[0]
+    assert router.router.borrow("east", patron, 2)[0]
+    assert router.router.open_loan_counts(patron) == {"north": 1, "south": 2, "east": 2}
+
+    loans = router.get(f"/api/branches/patron/{patron}/loans").get_json()
+    assert loans["count_current"] == 5 and loans["total_fees"] == 0.0
+    assert sorted((loan["branch"], loan["book_id"]) for loan in loans["current"]) == [
+        ("east", 1), ("east", 2), ("north", 2), ("south", 1), ("south", 2)]
+    assert router.get("/api/branches/patron/12/loans").status_code == 400
+
+
+def test_concurrent_borrows_at_different_branches_respect_the_limit(router):
+    patron = "654321"
+    results = []
+
+    def borrow(branch, book_id):
+        results.append(router.router.borrow(branch, patron, book_id)[0])
+        database.close_db_connection()
+
+    threads = [threading.Thread(target=borrow, args=(branch, book_id))
+               for book_id in range(1, 5) for branch in BRANCHES]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(results) == MAX_BORROWED_BOOKS == _open_loans(router.router, patron)
+
+
+def test_branch_borrow_and_return_api(router):
+    body = {"patron_id": "111111", "book_id": 3}
+    response = router.post("/api/branches/south/borrow", json=body)
+    assert response.status_code == 200 and response.get_json()["success"]
+    assert router.router.run("south", database.get_book_by_id, 3)["available_copies"] == 1
+    assert router.router.run("north", database.get_book_by_id, 3)["available_copies"] == 2
+    assert router.post("/api/branches/north/return", json=body).status_code == 400
+    assert router.post("/api/branches/south/return", json=body).get_json()["success"]
+    assert router.post("/api/branches/west/borrow", json=body).status_code == 404
+    assert router.post("/api/branches/west/return", json=body).status_code == 404
+    assert router.post("/api/branches/south/borrow", json={"patron_id": "111111"}).status_code == 400
+
+
+def test_sharding_endpoints_need_configured_shards(client):
+    assert client.get("/api/branches").get_json() == {"branches": []}
+    assert client.get("/api/branches/search?q=dune").status_code == 404
+    assert sharding.parse_shards(" north = n.db, south=s.db ,") == {"north": "n.db", "south": "s.db"}
+    with pytest.raises(ValueError):
+        sharding.parse_shards("north")
@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+import suggest_index
+from services.library_service import get_suggestions
+
+
+@pytest.fixture()
+def index(tmp_db, monkeypatch):
+    for i, (title, author) in enumerate([("The Great Gatsby", "F. Scott Fitzgerald"), ("1984", "George Orwell"),
+                                         ("Animal Farm", "George Orwell"), ("Great Expectations", "Charles Dickens"),
+                                         ("Les Misérables", "Victor Hugo")]):
+        database.insert_book(title, author, f"97800000050{i:02d}", 3, 3)
+    idx = suggest_index.SuggestIndex(limit=3)
+    monkeypatch.setattr(suggest_index, "index", idx)
+    yield idx
+
+
+def _borrow(book_id, times=1):
+    now = datetime(2026, 1, 1)
+    for _ in range(times):
+        database.insert_borrow_record("123456", book_id, now, now + timedelta(days=14))
+
+
+def _titles(books):
+    return [book["title"] for book in books]
+
+
+def test_prefixes_of_title_author_and_isbn_words(index):
+    assert suggest_index.tokens("Les Misérables, VICTOR hugo") == ["les", "miserables", "victor", "hugo"]
+    assert _titles(get_suggestions("gre")) == ["The Great Gatsby", "Great Expectations"]
+    assert _titles(get_suggestions("gat")) == ["The Great Gatsby"]
+    assert _titles(get_suggestions("Misé")) == ["Les Misérables"]
+    assert _titles(get_suggestions("978-0000005-003")) == ["Great Expectations"]
+    assert _titles(get_suggestions("19")) == ["1984"]
+    assert get_suggestions("zz") == [] and get_suggestions("  ") == []
+
+
+def test_most_borrowed_first(index):
+    _borrow(4, 2)
+    _borrow(3)
+    books = get_suggestions("g", limit=10)
+    assert _titles(books) == ["Great Expectations", "Animal Farm", "The Great Gatsby"]
+    assert [book["borrows"] for book in books] == [2, 1, 0]
+    _borrow(1, 3)
+    assert _titles(get_suggestions("g"))[0] == "The Great Gatsby"
+    assert _titles(get_suggestions("9780", limit=2)) == ["The Great Gatsby", "Great Expectations"]
+
+
+def test_earlier_words_must_match_whole_words(index):
+    assert _titles(get_suggestions("great g")) == ["The Great Gatsby"]
+    assert _titles(get_suggestions("george orwell a")) == ["Animal Farm"]
+    assert _titles(get_suggestions("great ")) == ["The Great Gatsby", "Great Expectations"]
+    assert get_suggestions("grea g") == []
+
+
+def test_wide_prefixes_are_kept_and_updated(index, monkeypatch):
+    monkeypatch.setattr(suggest_index, "_MERGE_WORDS", 1)
+    monkeypatch.setattr(suggest_index, "_MERGE_ISBNS", 1)
+    assert _titles(get_suggestions("g")) == ["The Great Gatsby", "1984", "Animal Farm"]
+    assert _titles(get_suggestions("97800")) == ["The Great Gatsby", "1984", "Animal Farm"]
+    assert "g" in index.prefix_top and "97800" in index.isbn_top
+    _borrow(4)
+    database.insert_book("Go Set a Watchman", "Harper Lee", "9780000005099", 1, 1)
+    conn = database.get_db_connection()
+    conn.execute("DELETE FROM books WHERE title = '1984'")
+    conn.commit()
+    assert _titles(get_suggestions("g")) == ["Great Expectations", "The Great Gatsby", "Animal Farm"]
+    assert _titles(get_suggestions("97800")) == ["Great Expectations", "The Great Gatsby", "Animal Farm"]
+    assert _titles(get_suggestions("wat")) == ["Go Set a Watchman"]
+
+
+def test_index_is_updated_incrementally(index):
+    get_suggestions("gat")
+    database.update_book_availability(1, -1)
+    conn = database.get_db_connection()
+    conn.execute("UPDATE books SET title = 'Tender Is the Night' WHERE id = 1")
+    conn.commit()
+    assert index.refresh() == 1 and index.stats()["books"] == 5
+    assert get_suggestions("gat") == []
+    assert _titles(get_suggestions("tend")) == ["Tender Is the Night"]
+
+
+def test_suggest_api(index, client):
+    _borrow(3)
+    response = client.get("/api/suggest?q=orw")
+    data = response.get_json()
+    assert data["count"] == 2 and data["suggestions"][0]["title"] == "Animal Farm"
+    assert data["suggestions"][0]["borrows"] == 1
+    assert client.get("/api/suggest?q=orw", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+    assert client.get("/api/suggest?q=orw&limit=1").get_json()["count"] == 1
+    assert client.get("/api/suggest").get_json()["suggestions"] == []